@@ -0,0 +1,155 @@
+import asyncio
+import random
+import time
+
+from data_retrieval import YFinanceProvider, get_stock_data, normalize_ohlcv
+
+
+class TokenBucket:
+    """
+    Rate limiter allowing `rate` requests per second on average, with bursts of up to `capacity`.
+    Waiters are served in arrival order.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=asyncio.sleep):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await self.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class ThreadTransport:
+    """
+    Runs a blocking fetch(ticker, period, start, end) function in a worker thread.
+    """
+
+    def __init__(self, fetch):
+        self.fetch = fetch
+
+    async def __call__(self, ticker, period=None, start=None, end=None):
+        return await asyncio.to_thread(self.fetch, ticker, period, start, end)
+
+
+def cache_transport(cache, provider=None):
+    """
+    Transport reading through an OHLCVCache (or straight from `provider` when cache is None),
+    exactly as get_stock_data does.
+    """
+    def fetch(ticker, period, start, end):
+        return get_stock_data(ticker, period=period, start=start, end=end, cache=cache, provider=provider)
+    return ThreadTransport(fetch)
+
+
+class AsyncFetcher:
+    """
+    Concurrent OHLCV downloader.
+
+    - at most `max_concurrency` transport calls run at once
+    - a token bucket keeps the call rate under `rate` per second (bursts of `burst`)
+    - failed calls are retried up to `retries` times with exponential backoff and jitter;
+      errors in `give_up_on` (bad ticker or period) fail at once
+    - concurrent requests for the same ticker and range share one download
+
+    `transport` is an async callable (ticker, period, start, end) -> DataFrame; the default runs
+    YFinanceProvider.fetch in a thread. Pass a fake coroutine (or a client for a local stub server)
+    to run without the network. Results are normalized like the providers' and every caller gets
+    its own copy, so the frames can be modified like the ones get_stock_data returns.
+    """
+
+    def __init__(self, transport=None, max_concurrency=8, rate=5.0, burst=None, retries=3,
+                 backoff=0.5, max_backoff=30.0, jitter=0.1, give_up_on=(ValueError, LookupError, FileNotFoundError),
+                 clock=time.monotonic, sleep=asyncio.sleep):
+        self.transport = transport or ThreadTransport(YFinanceProvider().fetch)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.give_up_on = give_up_on
+        self.sleep = sleep
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._bucket = TokenBucket(rate, burst, clock=clock, sleep=sleep) if rate else None
+        self._inflight = {}
+        self.stats = {'requests': 0, 'calls': 0, 'coalesced': 0, 'retries': 0, 'failures': 0}
+
+    async def fetch(self, ticker, period="1y", start=None, end=None):
+        """
+        OHLCV frame for a period or a [start, end) range, as get_stock_data returns it.
+        """
+        if start is not None:
+            period = None
+        key = (ticker, period, str(start) if start is not None else None, str(end) if end is not None else None)
+        self.stats['requests'] += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._download(ticker, period, start, end))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats['coalesced'] += 1
+
+        # A cancelled caller must not cancel the download other callers are waiting on
+        df = await asyncio.shield(task)
+        return df.copy()
+
+    async def _download(self, ticker, period, start, end):
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                if self._bucket is not None:
+                    await self._bucket.acquire()
+                try:
+                    self.stats['calls'] += 1
+                    return normalize_ohlcv(await self.transport(ticker, period, start, end))
+                except self.give_up_on:
+                    self.stats['failures'] += 1
+                    raise
+                except Exception:
+                    if attempt >= self.retries:
+                        self.stats['failures'] += 1
+                        raise
+            # Back off outside the semaphore so other tickers keep downloading meanwhile
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+            attempt += 1
+            self.stats['retries'] += 1
+            await self.sleep(delay)
+
+    async def fetch_many(self, tickers, period="1y", start=None, end=None):
+        """
+        Fetches every ticker concurrently. Returns {ticker: DataFrame or the exception it raised}.
+        """
+        results = await asyncio.gather(
+            *(self.fetch(ticker, period, start, end) for ticker in tickers), return_exceptions=True,
+        )
+        return dict(zip(tickers, results))
+
+
+def download_many(tickers, period="1y", start=None, end=None, cache=None, provider=None, **fetcher_options):
+    """
+    Blocking helper: fetches `tickers` concurrently (through `cache` when one is given) and
+    returns {ticker: DataFrame or exception}. `fetcher_options` go to AsyncFetcher.
+    """
+    if 'transport' not in fetcher_options and (cache is not None or provider is not None):
+        fetcher_options['transport'] = cache_transport(cache, provider)
+
+    async def run():
+        return await AsyncFetcher(**fetcher_options).fetch_many(tickers, period, start, end)
+
+    return asyncio.run(run())
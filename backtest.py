@@ -0,0 +1,293 @@
+import argparse
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from data_retrieval import OHLCV_COLUMNS, OHLCVCache, get_stock_data
+from geometry import band_offsets, calculate_rolling_linear_regression
+from moving_averages import compute_moving_averages
+from signals import TOUCH_MAS, band_crossings, ma_touch_hits, signal_positions, spike_positions
+
+# Values tried for each detector parameter
+PARAM_GRID = {
+    'len_regression': [89, 144, 233],
+    'volume_std_threshold': [1.0, 1.5, 2.0],
+    'price_std_threshold': [1.5, 2.0, 2.5],
+    'rolling_window': [10, 20, 40],
+}
+
+# Parameters each trade rule depends on; the other parameters are not swept for it
+RULE_PARAMS = {
+    'buy_sell': (),
+    'wick_touch': ('len_regression',),
+    'ma_touch': (),
+    'spike': ('volume_std_threshold', 'price_std_threshold', 'rolling_window'),
+}
+
+# Bars a trade is held
+HORIZONS = (5, 10, 20)
+
+RESULT_COLUMNS = [
+    'rule', *PARAM_GRID, 'horizon', 'split', 'segment', 'start', 'end',
+    'trades', 'hit_rate', 'mean_return', 'total_return', 'max_drawdown',
+]
+
+# Per-process state of the pool workers: the shared OHLCV array and what every task reuses
+_worker = {}
+
+
+def parameter_grid(grid=PARAM_GRID, rules=RULE_PARAMS):
+    """
+    (rule, params) tasks: every combination of the grid values of the parameters each rule uses.
+    """
+    tasks = []
+    for rule, names in rules.items():
+        for values in itertools.product(*(grid[name] for name in names)):
+            tasks.append((rule, dict(zip(names, values))))
+    return tasks
+
+
+def walk_forward_splits(n_bars, train_bars, test_bars, step=None, anchored=False):
+    """
+    (train_start, train_stop, test_start, test_stop) bar positions of consecutive walk-forward
+    splits: each test window follows its training window, and the windows move by `step` bars
+    (default `test_bars`). With anchored=True every training window starts at bar 0.
+    """
+    step = step or test_bars
+    splits = []
+    train_start = 0
+    while train_start + train_bars + test_bars <= n_bars:
+        train_stop = train_start + train_bars
+        splits.append((0 if anchored else train_start, train_stop, train_stop, train_stop + test_bars))
+        train_start += step
+    return splits
+
+
+def _segments(n_bars, splits):
+    if not splits:
+        return [(0, 'all', 0, n_bars)]
+    segments = []
+    for split, (train_start, train_stop, test_start, test_stop) in enumerate(splits):
+        segments.append((split, 'train', train_start, train_stop))
+        segments.append((split, 'test', test_start, test_stop))
+    return segments
+
+
+def _frame(values):
+    # DataFrame over the columns of the OHLCV array without copying them
+    return pd.DataFrame({name: values[:, i] for i, name in enumerate(OHLCV_COLUMNS)}, copy=False)
+
+
+def trade_entries(rule, params, values, ma_values=None, mas=TOUCH_MAS):
+    """
+    Entry bars and directions (+1 long, -1 short) of one rule, entering on the close of the
+    signal bar:
+
+    - buy_sell: long on buy signals, short on sell signals
+    - wick_touch: fades a wick touch of a rolling deviation band (long at the lower bands, short
+      at the upper ones); touches of the regression line itself are skipped
+    - ma_touch: follows the candle whose body spans a moving average
+    - spike: follows the candle of a volume/price spike
+
+    Every input is computed from bars up to the entry, so the rules can be split in time.
+    """
+    df = _frame(values)
+    open_, close = values[:, 0], values[:, 3]
+    if rule == 'buy_sell':
+        buy_idx, sell_idx = signal_positions(df)
+        positions = np.concatenate([buy_idx, sell_idx])
+        directions = np.concatenate([np.ones(len(buy_idx)), -np.ones(len(sell_idx))])
+    elif rule == 'wick_touch':
+        bands = calculate_rolling_linear_regression(df, params['len_regression'])[3]
+        hits = band_crossings(values[1:, 1], values[1:, 2], values[:-1, 1], values[:-1, 2], bands[1:])
+        bar_idx, band_idx = np.nonzero(hits)
+        positions, directions = bar_idx + 1, -np.sign(band_offsets()[band_idx])
+    elif rule == 'ma_touch':
+        bar_idx = ma_touch_hits(df, mas, ma_values)[0]
+        positions = np.unique(bar_idx)
+        directions = np.sign(close[positions] - open_[positions])
+    elif rule == 'spike':
+        positions = spike_positions(df, **params)
+        directions = np.sign(close[positions] - open_[positions])
+    else:
+        raise ValueError(f"Unknown trade rule: {rule!r}")
+
+    keep = directions != 0
+    order = np.argsort(positions[keep], kind='stable')
+    return positions[keep][order], directions[keep][order]
+
+
+def trade_statistics(close, positions, directions, horizon, start=0, stop=None):
+    """
+    Hit rate, mean and total return and maximum drawdown of the trades entered in [start, stop)
+    and held `horizon` bars, exiting before `stop`. The total return and the drawdown compound the
+    trades one after another in entry order. Trades entering or exiting on a missing close are
+    left out.
+    """
+    stop = len(close) if stop is None else stop
+    keep = (positions >= start) & (positions + horizon < stop)
+    entries, directions = positions[keep], directions[keep]
+    valid = np.isfinite(close[entries]) & np.isfinite(close[entries + horizon])
+    entries, directions = entries[valid], directions[valid]
+    returns = directions * (close[entries + horizon] / close[entries] - 1)
+    if not len(returns):
+        return dict(trades=0, hit_rate=np.nan, mean_return=np.nan, total_return=np.nan, max_drawdown=np.nan)
+
+    equity = np.cumprod(1 + returns)
+    peak = np.maximum(np.maximum.accumulate(equity), 1.0)
+    return dict(
+        trades=len(returns),
+        hit_rate=float((returns > 0).mean()),
+        mean_return=float(returns.mean()),
+        total_return=float(equity[-1] - 1),
+        max_drawdown=float((1 - equity / peak).max()),
+    )
+
+
+def _init_worker(values, segments, horizons, mas, shm=None):
+    _worker.update(
+        values=values, segments=segments, horizons=horizons, mas=mas, shm=shm,
+        ma_values=compute_moving_averages(values[:, 3], mas),
+    )
+
+
+def _attach(name, shape, segments, horizons, mas):
+    # The OHLCV array stays in the parent's shared memory block; workers only map it
+    shm = shared_memory.SharedMemory(name=name)
+    values = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    values.flags.writeable = False
+    _init_worker(values, segments, horizons, mas, shm)
+
+
+def _run_task(task):
+    rule, params = task
+    values = _worker['values']
+    positions, directions = trade_entries(rule, params, values, _worker['ma_values'], _worker['mas'])
+    rows = []
+    for horizon in _worker['horizons']:
+        for split, segment, start, stop in _worker['segments']:
+            stats = trade_statistics(values[:, 3], positions, directions, horizon, start, stop)
+            rows.append(dict(rule=rule, **params, horizon=horizon, split=split, segment=segment,
+                             start=start, end=stop - 1, **stats))
+    return rows
+
+
+def run_backtest(df, grid=PARAM_GRID, horizons=HORIZONS, splits=None, workers=None, mas=TOUCH_MAS):
+    """
+    Evaluates every trade rule over the parameter grid and returns one row per (rule, parameters,
+    horizon, split segment) with the trade count, hit rate, mean and total return and drawdown.
+
+    `splits` are walk_forward_splits; each gives a 'train' and a 'test' row, otherwise the whole
+    history is one 'all' segment. The tasks run in a process pool of `workers` (all cores by
+    default, in-process with workers=1); the OHLCV data is placed once in shared memory, which the
+    workers read without copying it.
+    """
+    values = np.ascontiguousarray(df[OHLCV_COLUMNS].values, dtype=np.float64)
+    segments = _segments(len(values), splits)
+    tasks = parameter_grid(grid)
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+
+    if workers <= 1:
+        _init_worker(values, segments, horizons, mas)
+        try:
+            chunks = [_run_task(task) for task in tasks]
+        finally:
+            _worker.clear()
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        try:
+            shared = np.ndarray(values.shape, dtype=np.float64, buffer=shm.buf)
+            shared[:] = values
+            del shared
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_attach, initargs=(shm.name, values.shape, segments, horizons, mas),
+            ) as executor:
+                chunks = list(executor.map(_run_task, tasks))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    results = pd.DataFrame([row for chunk in chunks for row in chunk], columns=RESULT_COLUMNS)
+    # Segment bounds as dates
+    results['start'] = df.index[results['start'].values]
+    results['end'] = df.index[results['end'].values]
+    return results
+
+
+def walk_forward(results, metric='mean_return', min_trades=10):
+    """
+    For each split and rule, the parameters and horizon that scored best on `metric` in training
+    (among those with at least `min_trades` trades), with their scores on the following test window.
+    """
+    keys = ['rule', *PARAM_GRID, 'horizon', 'split']
+    train = results[(results['segment'] == 'train') & (results['trades'] >= min_trades)].dropna(subset=[metric])
+    best = train.loc[train.groupby(['split', 'rule'])[metric].idxmax()]
+    test = results[results['segment'] == 'test']
+    return best[keys + [metric, 'trades']].merge(
+        test.drop(columns='segment'), on=keys, suffixes=('_train', ''),
+    ).sort_values(['rule', 'split']).reset_index(drop=True)
+
+
+def _values(text, kind):
+    return [kind(value) for value in text.split(',')]
+
+
+def main(argv=None):
+    from main_plot import parse_date_range
+
+    parser = argparse.ArgumentParser(description="Backtest the signals over a parameter grid.")
+    parser.add_argument("ticker")
+    parser.add_argument("--period", default="5y",
+                        help="Time period (e.g. '5y') or date range (e.g. '2015-01-02,2021-06-22')")
+    parser.add_argument("--len-regression", default=','.join(map(str, PARAM_GRID['len_regression'])))
+    parser.add_argument("--volume-std-threshold", default=','.join(map(str, PARAM_GRID['volume_std_threshold'])))
+    parser.add_argument("--price-std-threshold", default=','.join(map(str, PARAM_GRID['price_std_threshold'])))
+    parser.add_argument("--rolling-window", default=','.join(map(str, PARAM_GRID['rolling_window'])))
+    parser.add_argument("--horizons", default=','.join(map(str, HORIZONS)), help="Holding periods in bars")
+    parser.add_argument("--train", type=int, default=None, help="Walk-forward training window in bars")
+    parser.add_argument("--test", type=int, default=None, help="Walk-forward test window in bars")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--output", default=None, help="CSV path (default: data/YYYY-MM-DD/TICKER_backtest.csv)")
+    args = parser.parse_args(argv)
+
+    grid = {
+        'len_regression': _values(args.len_regression, int),
+        'volume_std_threshold': _values(args.volume_std_threshold, float),
+        'price_std_threshold': _values(args.price_std_threshold, float),
+        'rolling_window': _values(args.rolling_window, int),
+    }
+    period, start_date, end_date = parse_date_range(args.period)
+    df = get_stock_data(args.ticker, period=period, start=start_date, end=end_date, cache=OHLCVCache())
+    splits = None
+    if args.train and args.test:
+        splits = walk_forward_splits(len(df), args.train, args.test)
+        if not splits:
+            parser.error(f"{len(df)} bars are too few for a {args.train} + {args.test} bar split")
+
+    results = run_backtest(df, grid, _values(args.horizons, int), splits, args.workers)
+    output = args.output or os.path.join('data', datetime.now().strftime('%Y-%m-%d'), f'{args.ticker}_backtest.csv')
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    results.to_csv(output, index=False)
+    print(f"{len(results)} results saved to {output}")
+
+    if splits:
+        report = walk_forward(results)
+        print(report[['rule', 'split', 'horizon', 'mean_return_train', 'trades', 'hit_rate', 'mean_return', 'max_drawdown']]
+              .to_string(index=False))
+    else:
+        enough = results[results['trades'] >= 10]
+        best = enough.sort_values('mean_return', ascending=False).groupby('rule').head(1)
+        print(best[['rule', *PARAM_GRID, 'horizon', 'trades', 'hit_rate', 'mean_return', 'max_drawdown']]
+              .to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,390 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from data_retrieval import add_moving_averages
+from geometry import calculate_linear_regression_and_deviations, find_two_high_peaks, find_two_low_troughs
+from signals import (
+    detect_signals, calculate_fibonacci_levels, detect_wick_touches, detect_fib_wick_touches,
+    detect_body_ma_touches, detect_consecutive_days, detect_volume_price_spikes, detect_events,
+)
+from events import EVENT_NAMES, MA_TOUCH, WICK_TOUCH, SignalEvents
+from signal_db import SignalDB
+from summary import SummaryWriter, generate_event_summary_output
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+SIGNAL_DB_EVENTS = 25_000_000
+
+# Wall time allowed for a fresh interpreter to run the summary-only path on 1000 cached bars
+STARTUP_TARGET_SECONDS = 1.0
+# Modules the summary-only path must not load
+HEAVY_MODULES = ('plotly', 'kaleido', 'yfinance', 'scipy')
+
+_LOADED_HEAVY = "import json, sys; print(json.dumps([m for m in %r if m in sys.modules]))" % (HEAVY_MODULES,)
+
+# Summary-only run: cached bars (read through CSVProvider), the detectors and the summary CSV
+_SUMMARY_ONLY_RUN = """
+import contextlib, io, os, sys
+from data_retrieval import CSVProvider, OHLCVCache
+from main_plot import compute_signals
+from summary import generate_event_summary_output
+directory = sys.argv[1]
+cache = OHLCVCache(os.path.join(directory, 'cache'), provider=CSVProvider(directory))
+with contextlib.redirect_stdout(io.StringIO()):
+    signals = compute_signals('BENCH', '2000-01-01,2003-01-01', ohlcv_cache=cache)
+    generate_event_summary_output('BENCH', signals['events'], directory)
+""" + _LOADED_HEAVY
+FREQUENCIES = {'daily': 'D', 'minute': 'min'}
+LEN_REGRESSION = 144
+
+
+def make_synthetic_ohlcv(n_bars, freq='daily', seed=0):
+    """
+    Deterministic random-walk OHLCV frame with `n_bars` daily or minute bars.
+    """
+    rng = np.random.default_rng(seed)
+    step = 0.01 if freq == 'daily' else 0.0005
+    close = 100 * np.exp(np.cumsum(rng.normal(0, step, n_bars)))
+    open_ = np.concatenate([[close[0]], close[:-1]]) * (1 + rng.normal(0, step / 4, n_bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, step / 2, n_bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, step / 2, n_bars)))
+    volume = rng.lognormal(13, 0.5, n_bars).round()
+
+    index = pd.date_range('2000-01-03', periods=n_bars, freq=FREQUENCIES[freq], name='Date')
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
+
+
+def _prepare(df):
+    """
+    Runs the analysis once so every stage can be timed with its real inputs.
+    """
+    df = add_moving_averages(df.copy())
+    fib_levels, _, _ = calculate_fibonacci_levels(df)
+    slope, intercept, _, _, deviations = calculate_linear_regression_and_deviations(df, LEN_REGRESSION)
+    buy_signals, sell_signals = detect_signals(df)
+    wick_touches, touched_devs = detect_wick_touches(df, deviations, LEN_REGRESSION)
+    fib_wick_touches, _ = detect_fib_wick_touches(df, fib_levels)
+    ma_touches, _ = detect_body_ma_touches(df)
+    sequence_stars = detect_consecutive_days(df)
+    spike_days = detect_volume_price_spikes(df.copy())
+    events = detect_events(df.copy(), deviations, LEN_REGRESSION, fib_levels)
+    return dict(
+        df=df, fib_levels=fib_levels, slope=slope, intercept=intercept, deviations=deviations,
+        buy_signals=buy_signals, sell_signals=sell_signals, wick_touches=wick_touches,
+        touched_devs=touched_devs, fib_wick_touches=fib_wick_touches, ma_touches=ma_touches,
+        sequence_stars=sequence_stars, spike_days=spike_days, events=events,
+    )
+
+
+def _summary(ctx):
+    # The summary path of the pipeline: the event store through a SummaryWriter
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        generate_event_summary_output('BENCH', ctx['events'], directory, SummaryWriter())
+
+
+def _figure(ctx):
+    # The chart of the pipeline (build_chart), before the trendlines and overlays
+    from plot_helpers import plot_signals_from_events
+    return plot_signals_from_events(
+        ctx['df'], ctx['events'], ctx['fib_levels'], ctx['slope'], ctx['intercept'], 'BENCH', ctx['deviations'],
+    )
+
+
+def _png_export(ctx):
+    from export import export_figure
+    if 'figure' not in ctx:
+        ctx['figure'] = _figure(ctx)
+    with tempfile.TemporaryDirectory() as directory:
+        export_figure(ctx['figure'], os.path.join(directory, 'bench'), formats=('png',))
+
+
+# Stage name -> (callable taking the prepared context, is a plotting stage)
+STAGES = {
+    'add_moving_averages': (lambda ctx: add_moving_averages(ctx['df'][['Open', 'High', 'Low', 'Close', 'Volume']].copy()), False),
+    'detect_signals': (lambda ctx: detect_signals(ctx['df']), False),
+    'calculate_fibonacci_levels': (lambda ctx: calculate_fibonacci_levels(ctx['df']), False),
+    'detect_wick_touches': (lambda ctx: detect_wick_touches(ctx['df'], ctx['deviations'], LEN_REGRESSION), False),
+    'detect_fib_wick_touches': (lambda ctx: detect_fib_wick_touches(ctx['df'], ctx['fib_levels']), False),
+    'detect_body_ma_touches': (lambda ctx: detect_body_ma_touches(ctx['df']), False),
+    'detect_consecutive_days': (lambda ctx: detect_consecutive_days(ctx['df']), False),
+    'detect_volume_price_spikes': (lambda ctx: detect_volume_price_spikes(ctx['df'].copy()), False),
+    'detect_events': (
+        lambda ctx: detect_events(ctx['df'].copy(), ctx['deviations'], LEN_REGRESSION, ctx['fib_levels']), False),
+    'calculate_linear_regression_and_deviations':
+        (lambda ctx: calculate_linear_regression_and_deviations(ctx['df'], LEN_REGRESSION), False),
+    'find_two_high_peaks': (lambda ctx: find_two_high_peaks(ctx['df']), False),
+    'find_two_low_troughs': (lambda ctx: find_two_low_troughs(ctx['df']), False),
+    'generate_event_summary_output': (_summary, False),
+    'plot_signals_from_events': (_figure, True),
+    'png_export': (_png_export, True),
+}
+
+
+def time_stage(func, ctx, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(ctx)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, freqs=('daily',), stages=None, repeat=3, max_plot_bars=100_000):
+    """
+    Times every stage on synthetic data of each size and frequency. Returns a list of result rows.
+    """
+    results = []
+    for freq in freqs:
+        for n_bars in sizes:
+            ctx = _prepare(make_synthetic_ohlcv(n_bars, freq=freq))
+            for name, (func, is_plot) in STAGES.items():
+                if stages and name not in stages:
+                    continue
+                row = {'stage': name, 'bars': n_bars, 'freq': freq}
+                if is_plot and n_bars > max_plot_bars:
+                    row['skipped'] = f'more than {max_plot_bars} bars'
+                else:
+                    try:
+                        timings = time_stage(func, ctx, repeat)
+                        row.update(
+                            repeat=repeat, seconds_min=min(timings), seconds_median=statistics.median(timings),
+                        )
+                    except Exception as e:  # e.g. no image export engine installed
+                        message = next((line for line in str(e).splitlines() if line.strip()), '')
+                        row['skipped'] = f"{type(e).__name__}: {message}"
+                results.append(row)
+                print(_format_row(row))
+    return results
+
+
+def make_synthetic_events(n_events, n_bars, seed=0):
+    """
+    Random SignalEvents over `n_bars` daily bars, with the level tables the detectors produce.
+    """
+    rng = np.random.default_rng(seed)
+    level_names = [f'{side}_{k / 4:g}' for k in range(9) for side in ('upper', 'lower')] + ['SMA_50', 'SMA_200']
+    kinds = rng.integers(0, len(EVENT_NAMES), n_events).astype(np.uint8)
+    levels = np.full(n_events, -1, dtype=np.int16)
+    is_wick, is_ma = kinds == WICK_TOUCH, kinds == MA_TOUCH
+    levels[is_wick] = rng.integers(0, 18, is_wick.sum())
+    levels[is_ma] = rng.integers(18, 20, is_ma.sum())
+    dates = pd.date_range('2000-01-03', periods=n_bars, freq='B')[rng.integers(0, n_bars, n_events)]
+    return SignalEvents(dates, kinds, rng.uniform(10, 500, n_events), levels, level_names=level_names)
+
+
+def benchmark_signal_db(n_events=SIGNAL_DB_EVENTS, n_tickers=None, repeat=3, path=None):
+    """
+    Loads `n_events` synthetic events spread over `n_tickers` tickers into a fresh SignalDB and
+    times the bulk load, a rerun upsert of one ticker and typical queries. Returns the result rows.
+    """
+    n_tickers = n_tickers or max(n_events // 5_000, 1)
+    per_ticker = -(-n_events // n_tickers)
+    with tempfile.TemporaryDirectory() as directory:
+        db = SignalDB(path or os.path.join(directory, 'signals.db'))
+        timings = {'bulk_ingest': [0.0]}
+        with db.bulk_load():
+            for i in range(n_tickers):
+                events = make_synthetic_events(per_ticker, 6_000, seed=i)
+                start = time.perf_counter()
+                db.ingest(f'T{i:05d}', events)
+                timings['bulk_ingest'][0] += time.perf_counter() - start
+            start = time.perf_counter()
+        timings['bulk_ingest'][0] += time.perf_counter() - start  # Index rebuild
+        start = time.perf_counter()
+        db.ingest('T00000', make_synthetic_events(per_ticker, 6_000, seed=0))
+        timings['upsert_rerun_one_ticker'] = [time.perf_counter() - start]
+
+        queries = {
+            'events_one_ticker': lambda: db.events('T00042'),
+            'events_signal_level_range': lambda: db.events(
+                signal='Wick Touch', level='lower_1.5', start='2010-01-01', end='2011-01-01'),
+            'same_week_wick_and_ma': lambda: db.same_week(('Wick Touch', 'lower_1.5'), ('MA Touch', 'SMA_200')),
+        }
+        for name, query in queries.items():
+            timings[name] = time_stage(lambda ctx: query(), None, repeat)
+        rows = db.count()
+        db.close()
+
+    results = []
+    for name, values in timings.items():
+        row = {'stage': f'signal_db_{name}', 'bars': rows, 'freq': 'events',
+               'repeat': len(values), 'seconds_min': min(values), 'seconds_median': statistics.median(values)}
+        results.append(row)
+        print(_format_row(row))
+    return results
+
+
+def _import_times(stderr):
+    """
+    (seconds, package) import times from `python -X importtime` output, summed per top-level package.
+    """
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '[us]' in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        totals[package] = totals.get(package, 0) + int(own) / 1e6
+    return sorted(((seconds, package) for package, seconds in totals.items()), reverse=True)
+
+
+def measure_startup(repeat=5, n_bars=1_000):
+    """
+    Times fresh interpreters importing main_plot (with -X importtime) and running the summary-only
+    path on `n_bars` cached bars, and records which HEAVY_MODULES they loaded.
+    """
+    package = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package, os.environ.get('PYTHONPATH')])))
+    runs = {
+        'startup_import_main_plot': ['-X', 'importtime', '-c', 'import main_plot; ' + _LOADED_HEAVY],
+        'startup_summary_only': ['-c', _SUMMARY_ONLY_RUN],
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        make_synthetic_ohlcv(n_bars).to_csv(os.path.join(directory, 'BENCH.csv'))
+        for name, args in runs.items():
+            timings = []
+            for _ in range(repeat):
+                # A fresh OHLCV cache for every run, so each one reads the bars the same way
+                shutil.rmtree(os.path.join(directory, 'cache'), ignore_errors=True)
+                start = time.perf_counter()
+                done = subprocess.run([sys.executable, *args, directory], capture_output=True, text=True, cwd=directory, env=env)
+                timings.append(time.perf_counter() - start)
+                if done.returncode:
+                    raise RuntimeError(f"{name} failed:\n{done.stderr[-2000:]}")
+            row = {'stage': name, 'bars': n_bars, 'freq': 'startup', 'repeat': repeat, 'seconds_min': min(timings),
+                   'seconds_median': statistics.median(timings), 'heavy_modules': json.loads(done.stdout.splitlines()[-1])}
+            if '-X' in args:
+                row['top_imports'] = [f"{package} {seconds * 1000:.0f} ms" for seconds, package in _import_times(done.stderr)[:5]]
+            results.append(row)
+            print(_format_row(row))
+            for key in ('heavy_modules', 'top_imports'):
+                if row.get(key):
+                    print(f"    {key}: {', '.join(row[key])}")
+    return results
+
+
+def startup_failures(results, target=STARTUP_TARGET_SECONDS):
+    """
+    Messages for startup rows that loaded a heavy module, or a summary-only run over `target`.
+    """
+    failures = []
+    for row in results:
+        if row.get('heavy_modules'):
+            failures.append(f"{row['stage']} loaded {', '.join(row['heavy_modules'])}")
+        if row['stage'] == 'startup_summary_only' and row['seconds_min'] > target:
+            failures.append(f"{row['stage']} took {row['seconds_min']:.2f}s (target {target:.2f}s)")
+    return failures
+
+
+def compare_to_baseline(results, baseline, threshold=0.25):
+    """
+    Rows whose best time is more than `threshold` (relative) slower than the baseline's.
+    """
+    reference = {(r['stage'], r['bars'], r['freq']): r for r in baseline['results'] if 'seconds_min' in r}
+    regressions = []
+    for row in results:
+        base = reference.get((row['stage'], row['bars'], row['freq']))
+        if base is None or 'seconds_min' not in row:
+            continue
+        ratio = row['seconds_min'] / base['seconds_min'] if base['seconds_min'] > 0 else float('inf')
+        if ratio > 1 + threshold:
+            regressions.append(dict(row, baseline_seconds=base['seconds_min'], ratio=ratio))
+    return regressions
+
+
+def _format_row(row):
+    label = f"{row['stage']:<45} {row['freq']:<7} {row['bars']:>9}"
+    if 'skipped' in row:
+        return f"{label}  skipped ({row['skipped']})"
+    return f"{label}  {row['seconds_min'] * 1000:10.2f} ms"
+
+
+def _environment():
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline on synthetic OHLCV data.")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="Comma separated bar counts (e.g. 1000,100000,5000000)")
+    parser.add_argument('--freqs', default='daily', help="Comma separated frequencies: daily, minute")
+    parser.add_argument('--stages', default=None, help="Comma separated stage names (default: all)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-plot-bars', type=int, default=100_000,
+                        help="Skip figure building and PNG export above this many bars")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=None, help="Baseline results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Allowed relative slowdown before a stage counts as a regression")
+    parser.add_argument('--update-baseline', action='store_true', help="Write the results to --baseline")
+    parser.add_argument('--signal-db', type=int, nargs='?', const=SIGNAL_DB_EVENTS, default=None, metavar='EVENTS',
+                        help=f"Benchmark the signal database with EVENTS events (default {SIGNAL_DB_EVENTS}) instead")
+    parser.add_argument('--startup', action='store_true',
+                        help=f"Measure interpreter startup and the summary-only path instead "
+                             f"(target {STARTUP_TARGET_SECONDS}s, without {', '.join(HEAVY_MODULES)})")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        results = measure_startup(repeat=args.repeat)
+    elif args.signal_db:
+        results = benchmark_signal_db(args.signal_db, repeat=args.repeat)
+    else:
+        results = run_benchmarks(
+            sizes=[int(size) for size in args.sizes.split(',')],
+            freqs=args.freqs.split(','),
+            stages=args.stages.split(',') if args.stages else None,
+            repeat=args.repeat,
+            max_plot_bars=args.max_plot_bars,
+        )
+    report = {'environment': _environment(), 'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.startup:
+        failures = startup_failures(results)
+        for message in failures:
+            print(f"STARTUP {message}")
+        if failures:
+            return 1
+        print(f"Summary-only startup within {STARTUP_TARGET_SECONDS:.2f}s without {', '.join(HEAVY_MODULES)}")
+
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        for row in regressions:
+            print(f"REGRESSION {row['stage']} {row['freq']} {row['bars']}: "
+                  f"{row['baseline_seconds'] * 1000:.2f} ms -> {row['seconds_min'] * 1000:.2f} ms ({row['ratio']:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions above {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
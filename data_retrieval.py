@@ -1,17 +1,380 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
 
-def get_stock_data(ticker, period="1y"):
-    stock = yf.Ticker(ticker)
-    return stock.history(period=period)
-
-def add_moving_averages(df):
-    df['SMA_10'] = df['Close'].rolling(window=10).mean()
-    df['SMA_20'] = df['Close'].rolling(window=20).mean()
-    df['SMA_50'] = df['Close'].rolling(window=50).mean()
-    df['SMA_100'] = df['Close'].rolling(window=100).mean()
-    df['SMA_200'] = df['Close'].rolling(window=200).mean()
-    df['SMA_300'] = df['Close'].rolling(window=300).mean()
+from moving_averages import DEFAULT_MAS, compute_moving_averages
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def normalize_ohlcv(df):
+    """
+    Reduces a downloaded frame to sorted float OHLCV columns with unique dates.
+    """
+    if isinstance(df.columns, pd.MultiIndex):
+        # yf.download returns (field, ticker) columns
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    df = df[OHLCV_COLUMNS].astype(float)
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    df.index.name = 'Date'
     return df
 
+
+def period_start(period, now):
+    """
+    First date covered by a yfinance style period ('5d', '6mo', '1y', 'ytd', ...); None for 'max'.
+    """
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        return now.normalize().replace(month=1, day=1)
+
+    match = re.fullmatch(r'(\d+)(d|wk|mo|y)', period)
+    if match is None:
+        raise ValueError(f"Unsupported period: {period!r}")
+    count, unit = int(match.group(1)), match.group(2)
+    offset = {
+        'd': pd.DateOffset(days=count),
+        'wk': pd.DateOffset(weeks=count),
+        'mo': pd.DateOffset(months=count),
+        'y': pd.DateOffset(years=count),
+    }[unit]
+    return now.normalize() - offset
+
+
+class YFinanceProvider:
+    """
+    Downloads bars from Yahoo Finance, daily by default or of another yfinance `interval`
+    ('1m', '5m', '1h', ...). Keep intraday bars in an OHLCVCache directory of their own.
+    """
+
+    def __init__(self, interval='1d'):
+        self.interval = interval
+
+    def fetch(self, ticker, period=None, start=None, end=None):
+        # yfinance takes long to import and is only needed when bars are actually downloaded
+        import yfinance as yf
+
+        stock = yf.Ticker(ticker)
+        if period is not None:
+            df = stock.history(period=period, interval=self.interval)
+        else:
+            df = stock.history(start=start, end=end, interval=self.interval)
+        return normalize_ohlcv(df)
+
+
+class CSVProvider:
+    """
+    Serves recorded `<ticker>.csv` files instead of downloading, so the cache can be exercised offline.
+    Every call is appended to `calls` for inspection.
+    """
+
+    def __init__(self, directory, now=None):
+        self.directory = directory
+        self.now = now
+        self.calls = []
+
+    def fetch(self, ticker, period=None, start=None, end=None):
+        self.calls.append((ticker, period, start, end))
+        df = pd.read_csv(os.path.join(self.directory, f"{ticker}.csv"), index_col=0)
+        try:
+            df.index = pd.to_datetime(df.index)
+        except ValueError:
+            # Timestamps recorded across DST changes carry mixed UTC offsets
+            df.index = pd.to_datetime(df.index, utc=True)
+        df = normalize_ohlcv(df)
+
+        if period is not None:
+            start = period_start(period, self.now or df.index[-1])
+        if start is not None:
+            df = df[df.index >= as_index_time(start, df.index)]
+        if end is not None:
+            df = df[df.index < as_index_time(end, df.index)]
+        return df
+
+
+def as_index_time(value, index):
+    """
+    Converts a date to a Timestamp comparable with `index` (matching its timezone).
+    """
+    value = pd.Timestamp(value)
+    if index.tz is not None and value.tzinfo is None:
+        return value.tz_localize(index.tz)
+    if index.tz is None and value.tzinfo is not None:
+        return value.tz_convert(None)
+    return value
+
+
+class OHLCVCache:
+    """
+    On-disk OHLCV store with one directory per ticker.
+
+    Each store holds the dates as int64 nanoseconds (`index-<version>.npy`), the OHLCV values as a
+    float64 (bars x 5) array (`ohlcv-<version>.npy`, read memory-mapped) and a small `meta.json`
+    describing which date range is covered, when it was last refreshed and which version of the
+    arrays is current. Requests already covered are answered from disk; otherwise only the missing
+    head or tail is fetched from the provider and merged in.
+
+    A write puts new arrays next to the old ones and then replaces meta.json in one rename, so
+    readers in other threads or processes see either the old or the new store. Threads sharing a
+    cache take a per-ticker lock, so concurrent requests for one ticker fetch and write in turn.
+    """
+
+    def __init__(self, directory='cache', provider=None, max_age=pd.Timedelta(hours=12),
+                 max_tickers=None, max_bytes=None, clock=None):
+        self.directory = directory
+        self.provider = provider or YFinanceProvider()
+        self.max_age = pd.Timedelta(max_age)
+        self.max_tickers = max_tickers
+        self.max_bytes = max_bytes
+        self.clock = clock or pd.Timestamp.now
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _lock(self, ticker):
+        with self._locks_lock:
+            return self._locks.setdefault(ticker.upper(), threading.Lock())
+
+    def get(self, ticker, period=None, start=None, end=None):
+        """
+        Returns the bars of `ticker` for a period or a [start, end) range, refreshing the store as needed.
+        """
+        if period is None and start is None:
+            period = '1y'
+        with self._lock(ticker):
+            now = pd.Timestamp(self.clock())
+            request_start = pd.Timestamp(start) if start is not None else period_start(period, now)
+            request_end = pd.Timestamp(end) if end is not None else None
+
+            store = self._load(ticker)
+            if store is None:
+                df = self.provider.fetch(ticker, period=period, start=start, end=end)
+                meta = {'covered_start': _to_ns(request_start), 'covered_until': _to_ns(_clip_end(request_end, now))}
+                self._save(ticker, df, meta, now)
+            else:
+                df, meta = store
+                df, meta = self._refresh(ticker, df, meta, period, request_start, request_end, now)
+
+            self._touch(ticker)
+        return _slice(df, request_start, request_end)
+
+    def _refresh(self, ticker, df, meta, period, request_start, request_end, now):
+        changed = False
+
+        # Missing head: the request reaches further back than anything fetched so far
+        covered_start = meta['covered_start']
+        if covered_start is not None and (request_start is None or _to_ns(request_start) < covered_start):
+            if request_start is None:
+                head = self.provider.fetch(ticker, period='max')
+            else:
+                head = self.provider.fetch(ticker, start=request_start, end=pd.Timestamp(covered_start))
+            df = _merge(df, head)
+            meta['covered_start'] = _to_ns(request_start)
+            changed = True
+
+        # Missing tail: the request runs past the stored range, by more than max_age for open-ended requests
+        wanted_until = _clip_end(request_end, now)
+        behind = pd.Timedelta(_to_ns(wanted_until) - meta['covered_until'])
+        closed_request = request_end is not None and pd.Timestamp(request_end) <= now
+        if behind > pd.Timedelta(0) and (closed_request or behind >= self.max_age):
+            # Refetch the last cached bar too, it may have been written while still in progress
+            tail_start = _naive(df.index[-1]).normalize() if len(df) else request_start
+            tail = self.provider.fetch(ticker, start=tail_start, end=request_end)
+            df = _merge(df, tail)
+            meta['covered_until'] = _to_ns(wanted_until)
+            changed = True
+
+        if changed:
+            self._save(ticker, df, meta, now)
+        return df, meta
+
+    def _path(self, ticker):
+        return os.path.join(self.directory, ticker.upper())
+
+    def _load(self, ticker, attempts=3):
+        path = self._path(ticker)
+        for _ in range(attempts):
+            try:
+                with open(os.path.join(path, 'meta.json')) as f:
+                    meta = json.load(f)
+                dates = np.load(os.path.join(path, _array_name('index', meta)), mmap_mode='r')
+                values = np.load(os.path.join(path, _array_name('ohlcv', meta)), mmap_mode='r')
+                break
+            except FileNotFoundError:
+                # No store yet, or another process replaced (or evicted) it between the two reads
+                if not os.path.exists(os.path.join(path, 'meta.json')):
+                    return None
+        else:
+            return None
+        index = pd.DatetimeIndex(np.asarray(dates).view('datetime64[ns]'), name='Date')
+        if meta.get('tz'):
+            index = index.tz_localize('UTC').tz_convert(meta['tz'])
+        return pd.DataFrame(np.asarray(values), index=index, columns=OHLCV_COLUMNS), meta
+
+    def _save(self, ticker, df, meta, now):
+        path = self._path(ticker)
+        os.makedirs(path, exist_ok=True)
+
+        index = df.index
+        meta = dict(
+            meta, tz=str(index.tz) if index.tz is not None else None, fetched_at=now.isoformat(),
+            version=uuid.uuid4().hex,
+        )
+        if index.tz is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+        np.save(os.path.join(path, _array_name('index', meta)), index.values.astype('datetime64[ns]').view(np.int64))
+        np.save(os.path.join(path, _array_name('ohlcv', meta)), np.ascontiguousarray(df[OHLCV_COLUMNS].values, dtype=np.float64))
+        meta_tmp = os.path.join(path, f"meta.json.{meta['version']}.tmp")
+        with open(meta_tmp, 'w') as f:
+            json.dump(meta, f)
+
+        previous = _read_version(os.path.join(path, 'meta.json'))
+        # The rename of meta.json switches readers to the new arrays at once
+        os.replace(meta_tmp, os.path.join(path, 'meta.json'))
+        self._remove_stale(path, meta['version'], previous)
+        self.evict(keep=ticker)
+
+    def _remove_stale(self, path, version, previous, grace_seconds=60):
+        # The arrays just replaced, and older leftovers; other recent files may belong to a write of
+        # another process that has not replaced meta.json yet. Open memory maps of removed files
+        # stay readable on POSIX.
+        current = {_array_name(name, {'version': version}) for name in ('index', 'ohlcv')}
+        replaced = {_array_name(name, {'version': previous}) for name in ('index', 'ohlcv')}
+        cutoff = time.time() - grace_seconds
+        for entry in os.scandir(path):
+            if entry.name in current or not (entry.name.endswith('.npy') or entry.name.endswith('.tmp')):
+                continue
+            try:
+                if entry.name in replaced or entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _touch(self, ticker):
+        # The meta file's modification time records the last access for the LRU eviction
+        try:
+            os.utime(os.path.join(self._path(ticker), 'meta.json'))
+        except FileNotFoundError:
+            pass
+
+    def evict(self, keep=None):
+        """
+        Removes the least recently used stores until the ticker count and size limits are met.
+        """
+        if self.max_tickers is None and self.max_bytes is None:
+            return []
+        if not os.path.isdir(self.directory):
+            return []
+
+        stores = []
+        for name in os.listdir(self.directory):
+            meta_path = os.path.join(self.directory, name, 'meta.json')
+            if name.endswith('.tmp') or not os.path.exists(meta_path):
+                continue
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(os.path.join(self.directory, name)))
+                stores.append((os.stat(meta_path).st_mtime, name, size))
+            except FileNotFoundError:  # Replaced or evicted by another process meanwhile
+                continue
+        stores.sort()  # Least recently used first
+
+        evicted = []
+        total = sum(size for _, _, size in stores)
+        while stores:
+            over_count = self.max_tickers is not None and len(stores) > self.max_tickers
+            over_size = self.max_bytes is not None and total > self.max_bytes
+            if not (over_count or over_size):
+                break
+            victim = next((s for s in stores if keep is None or s[1] != keep.upper()), None)
+            if victim is None:
+                break
+            stores.remove(victim)
+            total -= victim[2]
+            shutil.rmtree(os.path.join(self.directory, victim[1]), ignore_errors=True)
+            evicted.append(victim[1])
+        return evicted
+
+
+def _read_version(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f).get('version')
+    except (OSError, ValueError):
+        return None
+
+
+def _array_name(name, meta):
+    # Stores written before arrays were versioned have plain index.npy and ohlcv.npy
+    version = meta.get('version')
+    return f"{name}-{version}.npy" if version else f"{name}.npy"
+
+
+def _to_ns(value):
+    if value is None:
+        return None
+    return _naive(pd.Timestamp(value)).value
+
+
+def _naive(value):
+    return value.tz_localize(None) if value.tzinfo is not None else value
+
+
+def _clip_end(end, now):
+    return now if end is None else min(pd.Timestamp(end), now)
+
+
+def _merge(df, new):
+    """
+    Combines cached and freshly fetched bars; fetched values win on overlapping dates.
+    """
+    if len(new) == 0:
+        return df
+    if len(df) == 0:
+        return new
+    if (df.index.tz is None) != (new.index.tz is None):
+        new = new.set_axis(
+            new.index.tz_localize(None) if new.index.tz is not None else new.index.tz_localize(df.index.tz)
+        )
+    elif df.index.tz is not None:
+        new = new.set_axis(new.index.tz_convert(df.index.tz))
+    merged = pd.concat([df[~df.index.isin(new.index)], new[OHLCV_COLUMNS]])
+    return merged.sort_index()
+
+
+def _slice(df, start, end):
+    """
+    Rows in [start, end), located with a binary search over the sorted index.
+    """
+    lo = 0 if start is None else df.index.searchsorted(as_index_time(start, df.index), side='left')
+    hi = len(df) if end is None else df.index.searchsorted(as_index_time(end, df.index), side='left')
+    return df.iloc[lo:hi].copy()
+
+
+def get_stock_data(ticker, period="1y", start=None, end=None, cache=None, provider=None):
+    """
+    Fetches daily OHLCV bars for a period or a [start, end) range, through `cache` when one is given.
+    """
+    if start is not None:
+        period = None
+    if cache is not None:
+        return cache.get(ticker, period=period, start=start, end=end)
+    provider = provider or YFinanceProvider()
+    return provider.fetch(ticker, period=period, start=start, end=end)
+
+def add_moving_averages(df, mas=DEFAULT_MAS):
+    """
+    Adds a column per moving average in `mas` ('SMA_50', 'EMA_21', ...) in one pass of the MA engine.
+    """
+    values = compute_moving_averages(
+        df['Close'].values, mas, df['Volume'].values if 'Volume' in df.columns else None
+    )
+    for i, name in enumerate(mas):
+        df[name] = values[:, i]
+    return df
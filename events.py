@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+
+# Event type codes, in the order the detailed summary lists them
+BUY, SELL, GREEN_STAR, RED_STAR, WICK_TOUCH, FIB_WICK_TOUCH, MA_TOUCH, SPIKE = range(8)
+
+EVENT_NAMES = ['Buy', 'Sell', 'Green Star', 'Red Star', 'Wick Touch', 'Fib Wick Touch', 'MA Touch', 'Spike']
+STAR_KINDS = (GREEN_STAR, RED_STAR)
+# Spikes are plotted but have never been part of the summary CSV
+SUMMARY_KINDS = (BUY, SELL, GREEN_STAR, RED_STAR, WICK_TOUCH, FIB_WICK_TOUCH, MA_TOUCH)
+
+NO_LEVEL = -1
+
+
+class SignalEvents:
+    """
+    Columnar store of signal events: one NumPy array per field instead of one tuple per event.
+
+    - `dates`: DatetimeIndex of the bars the events fire on
+    - `kinds`: uint8 event type codes (BUY, SELL, ..., SPIKE)
+    - `levels`: int16 ids into the `level_names` table (band, MA or Fibonacci level), NO_LEVEL if none
+    - `prices`: float64 event prices
+    - `sizes`: int16 marker sizes (sequence stars), 0 otherwise
+    """
+
+    def __init__(self, dates, kinds, prices, levels=None, sizes=None, level_names=()):
+        n = len(kinds)
+        self.dates = pd.DatetimeIndex(dates)
+        self.kinds = np.asarray(kinds, dtype=np.uint8)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.levels = np.full(n, NO_LEVEL, dtype=np.int16) if levels is None else np.asarray(levels, dtype=np.int16)
+        self.sizes = np.zeros(n, dtype=np.int16) if sizes is None else np.asarray(sizes, dtype=np.int16)
+        self.level_names = list(level_names)
+
+    @classmethod
+    def empty(cls):
+        return cls(pd.DatetimeIndex([]), [], [])
+
+    @classmethod
+    def of_kind(cls, kind, dates, prices, levels=None, sizes=None, level_names=()):
+        """
+        Events that all share one type code.
+        """
+        return cls(dates, np.full(len(prices), kind, dtype=np.uint8), prices, levels, sizes, level_names)
+
+    @classmethod
+    def concat(cls, parts):
+        """
+        Joins stores in order, merging their level tables.
+        """
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls.empty()
+
+        level_names = []
+        positions = {}
+        remapped = []
+        for part in parts:
+            ids = []
+            for name in part.level_names:
+                key = _level_key(name)
+                if key not in positions:
+                    positions[key] = len(level_names)
+                    level_names.append(name)
+                ids.append(positions[key])
+            # NO_LEVEL (-1) picks the trailing NO_LEVEL entry
+            table = np.array(ids + [NO_LEVEL], dtype=np.int16)
+            remapped.append(table[part.levels])
+
+        dates = parts[0].dates.append([part.dates for part in parts[1:]])
+        return cls(
+            dates,
+            np.concatenate([part.kinds for part in parts]),
+            np.concatenate([part.prices for part in parts]),
+            np.concatenate(remapped),
+            np.concatenate([part.sizes for part in parts]),
+            level_names,
+        )
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __repr__(self):
+        counts = np.bincount(self.kinds, minlength=len(EVENT_NAMES))
+        summary = ', '.join(f"{name}={count}" for name, count in zip(EVENT_NAMES, counts) if count)
+        return f"SignalEvents({len(self)} events: {summary})"
+
+    @property
+    def nbytes(self):
+        return self.dates.nbytes + self.kinds.nbytes + self.levels.nbytes + self.prices.nbytes + self.sizes.nbytes
+
+    def mask(self, kinds):
+        return np.isin(self.kinds, np.atleast_1d(kinds))
+
+    def select(self, kinds):
+        """
+        Events of the given type code(s), sharing this store's level table.
+        """
+        return self.take(self.mask(kinds))
+
+    def take(self, keep):
+        """
+        Events at the positions, slice or boolean mask `keep`, sharing this store's level table.
+        """
+        return SignalEvents(
+            self.dates[keep], self.kinds[keep], self.prices[keep], self.levels[keep], self.sizes[keep], self.level_names,
+        )
+
+    def level_labels(self):
+        """
+        Object array with each event's level name (None where there is none).
+        """
+        table = np.empty(len(self.level_names) + 1, dtype=object)
+        table[:-1] = self.level_names
+        table[-1] = None
+        return table[self.levels]
+
+    def touched_levels(self, kinds):
+        """
+        Set of level names hit by events of the given type(s), like the touched_* sets of the detectors.
+        """
+        ids = np.unique(self.levels[self.mask(kinds)])
+        return {self.level_names[i] for i in ids if i != NO_LEVEL}
+
+    def to_tuples(self, kind):
+        """
+        One event type in the list-of-tuples format the detectors in signals.py return.
+        """
+        part = self.select(kind)
+        if kind in STAR_KINDS:
+            color = 'green' if kind == GREEN_STAR else 'red'
+            return [(date, price, int(size), color) for date, price, size in zip(part.dates, part.prices, part.sizes)]
+        if kind in (BUY, SELL, SPIKE):
+            return list(zip(part.dates, part.prices))
+        return [(date, (label, price)) for date, label, price in zip(part.dates, part.level_labels(), part.prices)]
+
+    def to_frame(self, kinds=SUMMARY_KINDS):
+        """
+        Detailed summary table (Date, Signal, Price, Size, Level, MA), built column by column.
+        Columns without any value are left out, as in the row-by-row summary.
+        """
+        events = self.select(kinds)
+        names = np.array(EVENT_NAMES, dtype=object)
+        labels = events.level_labels()
+
+        columns = {'Date': events.dates, 'Signal': names[events.kinds], 'Price': events.prices}
+        is_star = events.mask(STAR_KINDS)
+        if is_star.any():
+            columns['Size'] = np.where(is_star, events.sizes, np.nan)
+        is_level = events.mask((WICK_TOUCH, FIB_WICK_TOUCH))
+        if is_level.any():
+            columns['Level'] = np.where(is_level, labels, np.nan)
+        is_ma = events.mask(MA_TOUCH)
+        if is_ma.any():
+            columns['MA'] = np.where(is_ma, labels, np.nan)
+
+        return pd.DataFrame(columns)
+
+
+def _level_key(name):
+    # Fibonacci levels are floats, bands and MAs are strings; keep 1.0 and '1.0' apart
+    return (type(name).__name__, name)
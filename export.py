@@ -0,0 +1,79 @@
+import os
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# Layout applied to saved images: no legend and no range slider
+SAVE_LAYOUT = dict(showlegend=False, xaxis_rangeslider_visible=False)
+
+IMAGE_FORMATS = ('png', 'svg', 'jpeg', 'webp', 'pdf')
+
+_renderer_started = False
+
+
+def start_renderer():
+    """
+    Starts the image renderer of this process once and keeps it running for every later export.
+
+    With kaleido >= 1 this launches its persistent sync server; older kaleido versions keep their
+    own subprocess alive after the first image. A tiny figure is rendered so the first real export
+    does not pay the start-up cost. Does nothing when no renderer is installed (HTML still works).
+    """
+    global _renderer_started
+    if _renderer_started:
+        return
+    _renderer_started = True
+    try:
+        import kaleido
+        if hasattr(kaleido, 'start_sync_server'):
+            kaleido.start_sync_server(silence_warnings=True)
+        pio.to_image(go.Figure(), format='png', width=10, height=10)
+    except Exception as e:
+        print("Image renderer unavailable:", str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__)
+
+
+def export_figure(fig, path_stem, formats=('png',), layout=SAVE_LAYOUT):
+    """
+    Writes `fig` (a Figure or its dict) as `{path_stem}.{format}` for each format (png, svg, ..., html,
+    json) with the `layout` overrides applied to a copy. Returns {format: path}.
+
+    The figure was validated when it was built, so it is written from its dict without a second
+    validation pass, and full_figure_for_development is not needed.
+    """
+    directory = os.path.dirname(path_stem)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    fig_dict = _export_dict(fig, layout)
+    paths = {}
+    for fmt in formats:
+        path = f"{path_stem}.{fmt}"
+        if fmt == 'html':
+            pio.write_html(fig_dict, path, include_plotlyjs=True, full_html=True, validate=False)
+        elif fmt == 'json':
+            pio.write_json(fig_dict, path, validate=False)
+        elif fmt in IMAGE_FORMATS:
+            start_renderer()
+            pio.write_image(fig_dict, path, format=fmt, validate=False)
+        else:
+            raise ValueError(f"Unsupported export format: {fmt!r}")
+        paths[fmt] = path
+    return paths
+
+
+def render_figure(fig, fmt='png', layout=SAVE_LAYOUT):
+    """
+    The image of `fig` in an image format as bytes, rendered by this process' warm renderer.
+    """
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format: {fmt!r}")
+    start_renderer()
+    return pio.to_image(_export_dict(fig, layout), format=fmt, validate=False)
+
+
+def _export_dict(fig, layout):
+    fig_dict = fig.to_dict() if isinstance(fig, go.Figure) else dict(fig)
+    if layout:
+        fig_dict['layout'] = go.Layout(fig_dict.get('layout', {})).update(**layout).to_plotly_json()
+    return fig_dict
+
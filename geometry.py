@@ -1,15 +1,196 @@
 import pandas as pd
-import plotly.graph_objects as go
 import numpy as np
 from datetime import timedelta
-from scipy.signal import argrelextrema
+from moving_averages import block_prefix, prefix_block
 
-def find_two_peaks(df):
+class RangeArgMax:
+    """
+    Segment tree over an array answering "position of the largest value in [start, stop)" in
+    O(log n). Ties go to the earliest position and NaN never wins; build it on -values for minima.
+    """
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=float)
+        self.n = len(values)
+        self.size = 1 << max(self.n - 1, 0).bit_length()
+        # Padding and NaN sort below every real value
+        self.keys = np.full(self.size, -np.inf)
+        self.keys[:self.n] = np.where(np.isnan(values), -np.inf, values)
+
+        index_dtype = np.int32 if self.size < 2 ** 31 else np.int64
+        self.tree = np.zeros(2 * self.size, dtype=index_dtype)
+        self.tree[self.size:] = np.arange(self.size)
+        # Fill one level at a time; the left child holds the earlier positions, so it wins ties
+        width = self.size // 2
+        while width:
+            left = self.tree[2 * width:4 * width:2]
+            right = self.tree[2 * width + 1:4 * width:2]
+            self.tree[width:2 * width] = np.where(self.keys[right] > self.keys[left], right, left)
+            width //= 2
+
+    def argmax(self, start, stop):
+        """
+        Position of the largest value in [start, stop), or None if the range holds no values.
+        """
+        start, stop = max(start, 0), min(stop, self.n)
+        if start >= stop:
+            return None
+        lo, hi = start + self.size, stop + self.size
+        left_nodes, right_nodes = [], []
+        while lo < hi:
+            if lo & 1:
+                left_nodes.append(self.tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                right_nodes.append(self.tree[hi])
+            lo >>= 1
+            hi >>= 1
+
+        # Nodes in position order, so a strict comparison keeps the earliest of equal values
+        best = None
+        for position in left_nodes + right_nodes[::-1]:
+            if best is None or self.keys[position] > self.keys[best]:
+                best = position
+        return int(best) if self.keys[best] > -np.inf else None
+
+    def top(self, k, start, stop):
+        """
+        Positions of the k largest values in [start, stop), largest first (earliest first on ties).
+        """
+        found = []
+        ranges = [(start, stop)]
+        while ranges and len(found) < k:
+            # Best of the remaining sub-ranges, then split that range around it
+            best = None
+            for i, (lo, hi) in enumerate(ranges):
+                position = self.argmax(lo, hi)
+                if position is not None and (best is None or (-self.keys[position], position) < (-self.keys[best[1]], best[1])):
+                    best = (i, position)
+            if best is None:
+                break
+            i, position = best
+            lo, hi = ranges.pop(i)
+            ranges += [(lo, position), (position + 1, hi)]
+            found.append(position)
+        return found
+
+
+class SwingPointIndex:
+    """
+    Local maxima/minima of a price frame computed once, with range queries on top of them.
+
+    Swing points are the bars `argrelextrema` reports for the given `order`. Queries such as
+    "two highest peaks after date X" or "lowest low of the last N days" are answered by segment
+    trees in O(log n) instead of rescanning the frame, and return the same bars as running the
+    original full-scan functions on the corresponding slice of the frame.
+    """
+
+    def __init__(self, df, order=10):
+        self.df = df
+        self.order = order
+        self._swings = {}
+        self._trees = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def position(self, date, side='left'):
+        """
+        Bar position of `date` in the index (side='right' to start strictly after it).
+        """
+        return int(self.df.index.searchsorted(date, side=side))
+
+    def _values(self, column, sign):
+        return sign * self.df[column].values.astype(float)
+
+    def swing_points(self, column, sign=1):
+        """
+        Sorted positions of the local maxima of `column` (local minima with sign=-1).
+        """
+        key = (column, sign)
+        if key not in self._swings:
+            from scipy.signal import argrelextrema
+            self._swings[key] = argrelextrema(self._values(column, sign), np.greater, order=self.order)[0]
+        return self._swings[key]
+
+    def maxima(self, column='High'):
+        return self.swing_points(column, 1)
+
+    def minima(self, column='Low'):
+        return self.swing_points(column, -1)
+
+    def _tree(self, column, sign, swings_only):
+        key = (column, sign, swings_only)
+        if key not in self._trees:
+            values = self._values(column, sign)
+            if swings_only:
+                masked = np.full(len(values), -np.inf)
+                positions = self.swing_points(column, sign)
+                masked[positions] = values[positions]
+                values = masked
+            self._trees[key] = RangeArgMax(values)
+        return self._trees[key]
+
+    def _edge_swings(self, values, start, stop, positions):
+        # Bars within `order` of a slice edge only see the part of their neighbourhood inside the slice
+        found = []
+        for i in positions:
+            if start < i < stop - 1:
+                window = np.concatenate([values[max(start, i - self.order):i], values[i + 1:min(stop, i + self.order + 1)]])
+                if np.all(values[i] > window):
+                    found.append(i)
+        return found
+
+    def _top_swings(self, column, sign, k, start, stop):
+        n = len(self)
+        start = max(start, 0)
+        stop = n if stop is None else min(stop, n)
+        # Bars away from the slice edges have the same neighbourhood as in the full frame
+        inner_start = start + self.order if start > 0 else 0
+        inner_stop = stop - self.order if stop < n else n
+        if inner_start >= inner_stop:
+            inner_start = inner_stop = stop
+
+        values = self._values(column, sign)
+        tree = self._tree(column, sign, swings_only=True)
+        candidates = tree.top(k, inner_start, inner_stop)
+        edges = list(range(start, inner_start)) + list(range(inner_stop, stop))
+        candidates += self._edge_swings(values, start, stop, edges)
+        candidates.sort(key=lambda i: (-values[i], i))
+        return self.df.iloc[candidates[:k]]
+
+    def top_peaks(self, k=2, column='High', start=0, stop=None):
+        """
+        Rows of the k highest local maxima among bars [start, stop), highest first, as
+        `df.iloc[start:stop]` scanned with argrelextrema and `nlargest` would give.
+        """
+        return self._top_swings(column, 1, k, start, stop)
+
+    def bottom_troughs(self, k=2, column='Low', start=0, stop=None):
+        """
+        Rows of the k lowest local minima among bars [start, stop), lowest first.
+        """
+        return self._top_swings(column, -1, k, start, stop)
+
+    def highest(self, column='High', start=0, stop=None):
+        """
+        Position of the highest value of `column` in bars [start, stop) (earliest on ties).
+        """
+        return self._tree(column, 1, swings_only=False).argmax(start, len(self) if stop is None else stop)
+
+    def lowest(self, column='Low', start=0, stop=None):
+        """
+        Position of the lowest value of `column` in bars [start, stop) (earliest on ties).
+        """
+        return self._tree(column, -1, swings_only=False).argmax(start, len(self) if stop is None else stop)
+
+
+def find_two_peaks(df, swings=None):
     """
     Finds the two highest peaks in the Close price using a rolling window.
     """
-    local_maxima = argrelextrema(df['Close'].values, np.greater, order=10)[0]
-    peaks = df.iloc[local_maxima].nlargest(2, 'Close')
+    peaks = (swings or SwingPointIndex(df)).top_peaks(2, 'Close')
 
     # Ensure we have exactly two peaks
     if len(peaks) < 2:
@@ -17,12 +198,11 @@ def find_two_peaks(df):
     
     return peaks
 
-def find_two_high_peaks(df):
+def find_two_high_peaks(df, swings=None, start=0):
     """
-    Finds the two highest peaks based on the High prices.
+    Finds the two highest peaks based on the High prices, among the bars from position `start` on.
     """
-    local_maxima = argrelextrema(df['High'].values, np.greater, order=10)[0]
-    peaks = df.iloc[local_maxima].nlargest(2, 'High')
+    peaks = (swings or SwingPointIndex(df)).top_peaks(2, 'High', start=start)
 
     # Ensure we have exactly two high peaks
     if len(peaks) < 2:
@@ -30,22 +210,29 @@ def find_two_high_peaks(df):
     
     return peaks
 
-def find_two_low_troughs(df):
+def lookback_position(index, lookback):
     """
-    Finds the two lowest troughs based on the Low prices over different time frames.
+    First bar position of a lookback window ending on the last bar: `lookback` is a number of bars
+    or a duration (Timedelta, timedelta or a string such as '182D' or '90min').
     """
-    six_months_ago = df.index[-1] - timedelta(days=182)
-    one_month_ago = df.index[-1] - timedelta(days=30)
-
-    # Filter the data for each date range
-    last_six_months_data = df[df.index >= six_months_ago]
-    last_month_data = df[df.index >= one_month_ago]
+    if isinstance(lookback, (int, np.integer)):
+        return max(len(index) - int(lookback), 0)
+    return int(index.searchsorted(index[-1] - pd.Timedelta(lookback)))
 
-    # Find the lowest point in the last six months
-    first_trough = last_six_months_data.loc[last_six_months_data['Low'].idxmin()]
+def find_two_low_troughs(df, swings=None, start=0, long_lookback=timedelta(days=182), short_lookback=timedelta(days=30)):
+    """
+    Finds the two lowest troughs based on the Low prices over different time frames: the lowest
+    low of the `long_lookback` and of the `short_lookback` windows (bars or durations).
+    """
+    swings = swings or SwingPointIndex(df)
 
-    # Find the lowest point in the last month
-    second_trough = last_month_data.loc[last_month_data['Low'].idxmin()]
+    # Find the lowest point in the long window (six months) and in the short one (one month)
+    first_position = swings.lowest('Low', max(start, lookback_position(df.index, long_lookback)))
+    second_position = swings.lowest('Low', max(start, lookback_position(df.index, short_lookback)))
+    if first_position is None or second_position is None:
+        raise ValueError("No lows in the trough windows.")
+    first_trough = df.iloc[first_position]
+    second_trough = df.iloc[second_position]
 
     # Combine into a DataFrame
     troughs = pd.DataFrame([first_trough, second_trough], index=[first_trough.name, second_trough.name])
@@ -53,30 +240,334 @@ def find_two_low_troughs(df):
     return troughs
 
 
-def calculate_intersection(slope1, intercept1, slope2, intercept2):
+def calculate_intersection(slope1, intercept1, slope2, intercept2, axis=None):
     # Check if slopes are the same (parallel lines)
     if slope1 == slope2:
         raise ValueError("The lines are parallel and do not intersect.")
     
-    # Calculate the x-coordinate of the intersection
+    # Calculate the x-coordinate of the intersection (a date ordinal unless the lines use another TimeAxis)
     x_intersect = (intercept2 - intercept1) / (slope1 - slope2)
-    date_intersect = pd.Timestamp.fromordinal(int(x_intersect))
+    if not np.isfinite(x_intersect):
+        raise ValueError("The lines do not intersect.")
+    try:
+        if axis is None:
+            date_intersect = pd.Timestamp.fromordinal(int(x_intersect))
+        else:
+            date_intersect = axis.dates([x_intersect])[0]
+    except (OverflowError, pd.errors.OutOfBoundsDatetime):
+        raise ValueError("The lines intersect outside the representable dates.") from None
     y_intersect = slope1 * x_intersect + intercept1
     
     return date_intersect, y_intersect
 
 
-def plot_projection_line(df, fig, points, color='black', line_name='Projection Line', project_until=None):
+# Proleptic Gregorian ordinal of 1970-01-01, the datetime64 epoch
+_EPOCH_ORDINAL = 719163
+
+
+def to_ordinals(dates):
+    """
+    `date.toordinal()` of every date in one array operation (wall-clock date for tz-aware dates).
+    """
+    dates = pd.DatetimeIndex(dates)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    return dates.values.astype('datetime64[D]').astype(np.int64) + _EPOCH_ORDINAL
+
+
+def from_ordinals(ordinals):
+    """
+    Inverse of `to_ordinals` for (fractional) ordinals, like `pd.Timestamp.fromordinal(int(x))`.
+    """
+    days = np.trunc(np.asarray(ordinals, dtype=float)).astype(np.int64) - _EPOCH_ORDINAL
+    return pd.DatetimeIndex(days.astype('datetime64[D]').astype('datetime64[ns]'))
+
+
+_DAY_NS = 86_400 * 10 ** 9
+
+# Session bars a 'bar' TimeAxis continues past the last bar; nearly parallel intraday lines can
+# cross millions of bars away, which is not worth materializing
+MAX_FUTURE_BARS = 100_000
+
+
+def _epoch_ns(dates):
+    # Nanoseconds since the epoch (UTC instants for tz-aware dates)
+    return pd.DatetimeIndex(dates).values.astype('datetime64[ns]').view(np.int64)
+
+
+def bar_period(index):
+    """
+    Spacing of the bars: the median gap between consecutive timestamps (one day with fewer than two bars).
+    """
+    gaps = np.diff(_epoch_ns(index))
+    gaps = gaps[gaps > 0]
+    return pd.Timedelta(int(np.median(gaps)) if len(gaps) else _DAY_NS, unit='ns')
+
+
+class TimeAxis:
+    """
+    Numeric x axis for trendlines drawn over the bars of `index`.
+
+    - 'D': date ordinals, one unit per calendar day (what the daily charts have always used)
+    - 'ns': nanoseconds since the epoch
+    - 'bar': bar positions, continued past the last bar over the trading session of the data
+      (its weekdays and time-of-day range), so nights and weekends take no room on the axis
+
+    unit='auto' picks 'D' for daily or longer bars and 'bar' for intraday ones. Slopes are in
+    price per unit, and the projection grid follows the bar period and session on the intraday units.
+    """
+
+    def __init__(self, index, unit='auto'):
+        self.index = pd.DatetimeIndex(index)
+        self.period = bar_period(self.index)
+        if unit == 'auto':
+            unit = 'D' if self.period >= pd.Timedelta(days=1) else 'bar'
+        if unit not in ('D', 'ns', 'bar'):
+            raise ValueError(f"Unsupported time axis unit: {unit!r}")
+        self.unit = unit
+        self._session = None
+        self._times = _epoch_ns(self.index)
+
+    def _wall_ns(self, dates):
+        dates = pd.DatetimeIndex(dates)
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+        return dates.values.astype('datetime64[ns]').view(np.int64)
+
+    def session(self):
+        """
+        (weekdays, first and last time of day in ns) seen in the data, on its wall clock.
+        """
+        if self._session is None:
+            wall = self._wall_ns(self.index)
+            time_of_day = wall % _DAY_NS
+            # 1970-01-01 was a Thursday (Monday = 0)
+            weekdays = np.unique((wall // _DAY_NS + 3) % 7)
+            self._session = (weekdays, int(time_of_day.min()), int(time_of_day.max()))
+        return self._session
+
+    def grid(self, start, end):
+        """
+        Timestamps from `start` to `end` for drawing a projection: every calendar day on the 'D'
+        axis, every bar period inside the trading session otherwise.
+        """
+        if self.unit == 'D':
+            return pd.date_range(start=start, end=end, freq='D')
+        candidates = pd.date_range(start=start, end=end, freq=self.period)
+        weekdays, session_open, session_close = self.session()
+        wall = self._wall_ns(candidates)
+        time_of_day = wall % _DAY_NS
+        inside = (
+            np.isin((wall // _DAY_NS + 3) % 7, weekdays)
+            & (time_of_day >= session_open) & (time_of_day <= session_close)
+        )
+        return candidates[inside]
+
+    def session_bars_per_week(self):
+        """
+        Bars of one week on the session grid (at least one).
+        """
+        weekdays, session_open, session_close = self.session()
+        return max(len(weekdays) * ((session_close - session_open) // self.period.value + 1), 1)
+
+    def _check_horizon(self, count):
+        if count > MAX_FUTURE_BARS:
+            raise ValueError(
+                f"{count} bars past the last bar is beyond the projection horizon of {MAX_FUTURE_BARS} bars."
+            )
+
+    def future(self, count):
+        """
+        The next `count` bar times after the last bar, on the session grid (at most MAX_FUTURE_BARS).
+        """
+        self._check_horizon(count)
+        last = self.index[-1]
+        span = self.period * max(count, 1)
+        while True:
+            bars = self.grid(last + self.period, last + span)
+            if len(bars) >= count:
+                return bars[:count]
+            span *= 2
+
+    def offset(self, date, span):
+        """
+        `date` moved forward by `span`: a number of session bars or a duration.
+        """
+        if isinstance(span, (int, np.integer)):
+            if self.unit == 'D':
+                return date + self.period * int(span)
+            position = int(self.index.searchsorted(date, side='right')) - 1 + int(span)
+            return self.dates([position])[0]
+        return date + pd.Timedelta(span)
+
+    def _timeline(self, times=None, positions=None):
+        # Bar times extended past the last bar far enough to hold `times` or `positions`
+        extra = 0
+        if positions is not None and len(positions):
+            extra = int(np.max(positions)) - (len(self.index) - 1)
+        elif times is not None and len(times) and np.max(times) > self._times[-1]:
+            # Sized from the session before any bar is built
+            weeks = (int(np.max(times)) - int(self._times[-1])) / (7 * _DAY_NS)
+            self._check_horizon(int(weeks * self.session_bars_per_week()))
+            extra = len(self.grid(self.index[-1] + self.period, self._timestamps([np.max(times)])[-1]))
+        if extra <= 0:
+            return self._times
+        return np.concatenate([self._times, _epoch_ns(self.future(extra))])
+
+    def values(self, dates):
+        """
+        Axis coordinates of `dates` (fractional bar positions between bars on the 'bar' axis).
+        """
+        if self.unit == 'D':
+            return to_ordinals(dates).astype(float)
+        times = _epoch_ns(dates)
+        if self.unit == 'ns':
+            return times.astype(float)
+        timeline = self._timeline(times=times)
+        return np.interp(times.astype(float), timeline.astype(float), np.arange(len(timeline), dtype=float))
+
+    def dates(self, values):
+        """
+        Timestamps of axis coordinates, truncated to the day, nanosecond or bar they fall in.
+        """
+        values = np.asarray(values, dtype=float)
+        if self.unit == 'D':
+            return from_ordinals(values)
+        if not np.all(np.abs(values[np.isfinite(values)]) < 2.0 ** 63):
+            raise OverflowError("Axis coordinates out of the datetime range.")
+        if self.unit == 'ns':
+            times = np.trunc(values).astype(np.int64)
+        else:
+            positions = np.maximum(np.floor(values).astype(np.int64), 0)
+            times = self._timeline(positions=positions)[positions]
+        return self._timestamps(times)
+
+    def _timestamps(self, times):
+        # Epoch nanoseconds back to dates in the index's time zone
+        dates = pd.DatetimeIndex(np.asarray(times, dtype=np.int64).view('datetime64[ns]'))
+        return dates.tz_localize('UTC').tz_convert(self.index.tz) if self.index.tz is not None else dates
+
+
+def _axis_values(dates, axis):
+    return to_ordinals(dates).astype(float) if axis is None else axis.values(dates)
+
+
+def trendline_coefficients(dates_1, prices_1, dates_2, prices_2, axis=None):
+    """
+    Slopes (price per day) and intercepts (on the date ordinal axis) of the lines through each
+    pair of points, computed the same way as plot_projection_line does for a single pair.
+    With a 'ns' or 'bar' TimeAxis they are per nanosecond or per bar, on that axis.
+    """
+    dates_1, dates_2 = pd.DatetimeIndex(dates_1), pd.DatetimeIndex(dates_2)
+    prices_1 = np.asarray(prices_1, dtype=float)
+    if axis is None or axis.unit == 'D':
+        # Whole days between the points, as timedelta.days counts them
+        x_1, x_gap = to_ordinals(dates_1), np.asarray((dates_2 - dates_1).days)
+    else:
+        x_1 = axis.values(dates_1)
+        x_gap = axis.values(dates_2) - x_1
+    slopes = (np.asarray(prices_2, dtype=float) - prices_1) / x_gap
+    intercepts = prices_1 - slopes * x_1
+    return slopes, intercepts
+
+
+def trendline_candidates(points, axis=None):
+    """
+    Every line through two of the given swing points (a price Series indexed by date), earlier point first.
+
+    Returns a DataFrame with the positions and dates of both points, slope and intercept per pair.
+    """
+    order = np.argsort(points.index.values, kind='stable')
+    points = points.iloc[order]
+    first, second = np.triu_indices(len(points), k=1)
+    dates = points.index
+    slopes, intercepts = trendline_coefficients(
+        dates[first], points.values[first], dates[second], points.values[second], axis
+    )
+    return pd.DataFrame({
+        'first_date': dates[first], 'first_price': points.values[first],
+        'second_date': dates[second], 'second_price': points.values[second],
+        'slope': slopes, 'intercept': intercepts,
+    })
+
+
+def project_trendlines(slopes, intercepts, dates, axis=None):
+    """
+    (lines x dates) array with every line evaluated on a shared date grid.
+    """
+    x = _axis_values(dates, axis)
+    return np.asarray(slopes, dtype=float)[:, None] * x[None, :] + np.asarray(intercepts, dtype=float)[:, None]
+
+
+def find_trendline_intersections(slopes_a, intercepts_a, slopes_b, intercepts_b, start, horizon_days=30, axis=None):
     """
-    Plots a projection line between two points with an optional extension.
+    All crossings between a line of set A and a line of set B that fall between `start` and
+    `horizon_days` after it, found with one broadcast over the (A x B) pairs. Lines on a
+    TimeAxis other than date ordinals need that `axis`.
+
+    Returns a DataFrame (line_a, line_b, date, price) sorted by date; parallel lines are skipped.
     """
+    slopes_a, intercepts_a = np.asarray(slopes_a, dtype=float), np.asarray(intercepts_a, dtype=float)
+    slopes_b, intercepts_b = np.asarray(slopes_b, dtype=float), np.asarray(intercepts_b, dtype=float)
+    slope_gap = slopes_a[:, None] - slopes_b[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (intercepts_b[None, :] - intercepts_a[:, None]) / slope_gap
+
+    if axis is None:
+        first_x = to_ordinals([start])[0]
+        last_x = first_x + horizon_days
+    else:
+        start = pd.Timestamp(start)
+        first_x, last_x = axis.values([start, start + pd.Timedelta(days=horizon_days)])
+    inside = (slope_gap != 0) & (x >= first_x) & (x <= last_x)
+    line_a, line_b = np.nonzero(inside)
+    x = x[line_a, line_b]
+    price = slopes_a[line_a] * x + intercepts_a[line_a]
+
+    order = np.argsort(x, kind='stable')
+    return pd.DataFrame({
+        'line_a': line_a[order], 'line_b': line_b[order],
+        'date': from_ordinals(x[order]) if axis is None else axis.dates(x[order]), 'price': price[order],
+    })
+
+
+def rank_trendlines(df, candidates, column='High', side=1, tolerance=0.005, axis=None):
+    """
+    Scores candidate lines against the bars from each line's first point on.
+
+    `side` is 1 for resistance lines drawn through peaks (bars should stay below them) and -1 for
+    support lines through troughs. A bar counts as a break when it closes the wrong side of the line
+    in `column` by more than `tolerance` (relative), and as a touch when it comes within `tolerance`.
+    Returns the candidates with `breaks` and `touches` columns, fewest breaks and most touches first.
+    """
+    lines = project_trendlines(candidates['slope'].values, candidates['intercept'].values, df.index, axis)
+    prices = df[column].values.astype(float)[None, :]
+    active = df.index.values[None, :] >= pd.DatetimeIndex(candidates['first_date']).values[:, None]
+    gap = side * (prices - lines) / np.abs(lines)
+
+    ranked = candidates.copy()
+    ranked['breaks'] = (active & (gap > tolerance)).sum(axis=1)
+    ranked['touches'] = (active & (np.abs(gap) <= tolerance)).sum(axis=1)
+    return ranked.sort_values(['breaks', 'touches'], ascending=[True, False], kind='stable')
+
+
+def plot_projection_line(df, fig, points, color='black', line_name='Projection Line', project_until=None,
+                         axis=None, projection=timedelta(days=30)):
+    """
+    Plots a projection line between two points with an optional extension, by default
+    `projection` (a duration or a number of bars) past the last bar. The line is computed on
+    `axis` (a TimeAxis over df's bars by default) and its slope and intercept on that axis are returned.
+    """
+    import plotly.graph_objects as go
+
+    axis = axis or TimeAxis(df.index)
     # Extract x and y coordinates of the two points (peaks or troughs)
     point_1, point_2 = points.index[0], points.index[1]
     price_1, price_2 = points.iloc[0], points.iloc[1]
 
     # Calculate slope and intercept of the line between the two points
-    slope = (price_2 - price_1) / (point_2 - point_1).days
-    intercept = price_1 - slope * (point_1.toordinal())
+    slopes, intercepts = trendline_coefficients([point_1], [price_1], [point_2], [price_2], axis)
+    slope, intercept = slopes[0], intercepts[0]
 
     # Generate x values to directly connect the two points
     x_values = [point_1, point_2]
@@ -89,7 +580,7 @@ def plot_projection_line(df, fig, points, color='black', line_name='Projection L
 
     # Set the end date for projection based on intersection or one month after the last date
     if project_until is None:
-        end_date = df.index[-1] + timedelta(days=30)
+        end_date = axis.offset(df.index[-1], projection)
     else:
         end_date = project_until
 
@@ -99,12 +590,12 @@ def plot_projection_line(df, fig, points, color='black', line_name='Projection L
     elif point_2.tzinfo is None and end_date.tzinfo is not None:
         end_date = end_date.tz_convert(None)
 
-    # Extend the line beyond the second point for projection
-    x_proj_values = pd.date_range(start=point_2, end=end_date, freq='D')
-    y_proj_values = slope * x_proj_values.map(lambda d: d.toordinal()) + intercept
+    # Extend the line beyond the second point for projection, over the axis' date grid
+    x_proj_values = axis.grid(point_2, end_date)
+    y_proj_values = project_trendlines([slope], [intercept], x_proj_values, axis)[0]
 
     # Plot the projection line starting from the second point
-    fig.add_trace(go.Scatter(x=[point_2] + list(x_proj_values), y=[price_2] + list(y_proj_values),
+    fig.add_trace(go.Scatter(x=x_proj_values.insert(0, point_2), y=np.concatenate([[price_2], y_proj_values]),
                              mode='lines', line=dict(color=color, width=2, dash='dash'),
                              name=f'{line_name} (Projection)'))
 
@@ -115,9 +606,20 @@ def plot_projection_line(df, fig, points, color='black', line_name='Projection L
 
     return slope, intercept  # Return slope and intercept for intersection calculation
 
-import numpy as np
+# Sigma offsets of the deviation bands drawn around the regression line
+DEVIATION_SIGMAS = [0, 0.25, 0.5, 0.75, 1, 1.25, 1.5, 1.75, 2]
 
-import numpy as np
+def deviation_band_names(sigmas=DEVIATION_SIGMAS):
+    """
+    Band names in the order the deviations dict uses: upper_0, lower_0, upper_0.25, ...
+    """
+    return [f'{side}_{dev}' for dev in sigmas for side in ('upper', 'lower')]
+
+def band_offsets(sigmas=DEVIATION_SIGMAS):
+    """
+    Signed sigma multiplier of each deviation band, in the order of deviation_band_names.
+    """
+    return np.array([sign * dev for dev in sigmas for sign in (1, -1)], dtype=float)
 
 # Modifying the `calculate_linear_regression_and_deviations` function to use 0.25 sigma increments.
 
@@ -137,14 +639,100 @@ def calculate_linear_regression_and_deviations(df, length):
     residuals = y[-length:] - (slope * x[-length:] + intercept)
     std_dev = np.std(residuals)
 
-    # Create deviation bands at 0.25 sigma intervals
-    deviations = {}
-    for dev in [0, 0.25, 0.5, 0.75, 1, 1.25, 1.5, 1.75, 2]:
-        deviations[f'upper_{dev}'] = (slope * x[-length:] + intercept + dev * std_dev)
-        deviations[f'lower_{dev}'] = (slope * x[-length:] + intercept - dev * std_dev)
+    # Create deviation bands at 0.25 sigma intervals, one row per band
+    line = slope * x[-length:] + intercept
+    bands = line[None, :] + band_offsets()[:, None] * std_dev
+    deviations = dict(zip(deviation_band_names(), bands))
 
     return slope, intercept, start_price, end_price, deviations
 
+
+def calculate_rolling_linear_regression(df, length, sigmas=DEVIATION_SIGMAS):
+    """
+    Fits the regression over every `length`-bar window of Close in a single vectorized pass.
+
+    Window sums of y, x*y and y*y come from prefix sums, so each window costs O(1). The sums
+    restart every `block` bars (a power of two at least `length` long, as in compute_moving_averages)
+    and y is centred on the first close of each block, so they stay the size of a window and the fit
+    keeps its precision however long the history and whatever the price level. Arrays are indexed by the
+    last bar of each window (NaN before `length` bars exist): slope, intercept (on the same
+    bar-number axis as calculate_linear_regression_and_deviations), residual std and a
+    (bars x bands) array with the level of every deviation band at that bar, as it stood on that
+    date. The band names for the columns are returned last. Windows holding a NaN close are NaN;
+    the others are unaffected by it.
+    """
+    y = df['Close'].values.astype(float)
+    n = len(y)
+    slope = np.full(n, np.nan)
+    intercept = np.full(n, np.nan)
+    std_dev = np.full(n, np.nan)
+    offsets = band_offsets(sigmas)
+    bands = np.full((n, len(offsets)), np.nan)
+    if n < length:
+        return slope, intercept, std_dev, bands, deviation_band_names(sigmas)
+
+    block = prefix_block([length])
+    offset = np.arange(n) % block
+    block_of = np.arange(n) // block
+
+    # Centre y on the first close of its block, so no value depends on later bars; missing closes
+    # add nothing and are counted instead
+    missing = np.isnan(y)
+    present = np.flatnonzero(~missing)
+    starts = present[np.concatenate([[True], np.diff(block_of[present]) > 0])] if len(present) else present
+    centres = np.zeros(n // block + 2)
+    centres[block_of[starts]] = y[starts]
+    yc = np.where(missing, 0.0, y - centres[block_of])
+    prefix_missing = np.concatenate([[0], np.cumsum(missing)])
+    prefix_y = block_prefix(yc, block)
+    prefix_xy = block_prefix(offset * yc, block)
+    prefix_yy = block_prefix(yc * yc, block)
+
+    first = np.arange(n - length + 1)  # First bar of each window
+    last = first + length - 1
+    stop = last + 1
+    start_offset = offset[first]
+    # A window spans at most two blocks: bars up to the end of its first block, then the bars of
+    # the next block before `stop` (centred on that block's first close, `shift` away from the first's)
+    crosses = start_offset >= block - length
+    tail = np.where(crosses, stop % block, 0)
+    shift = centres[block_of[first] + 1] - centres[block_of[first]]
+
+    def window_sums(prefix):
+        local, total = prefix
+        return local[stop] - local[first] + crosses * total[first]
+
+    sum_y, sum_xy, sum_yy = window_sums(prefix_y), window_sums(prefix_xy), window_sums(prefix_yy)
+    tail_y = crosses * prefix_y[0][stop]
+
+    # Sums relative to the first block's centre, x counted from the start of the window
+    sum_ky = (sum_xy - start_offset * sum_y + block * tail_y
+              + shift * (tail * (tail - 1) / 2 + (block - start_offset) * tail))
+    sum_yy = sum_yy + 2 * shift * tail_y + shift * shift * tail
+    sum_y = sum_y + shift * tail
+
+    sum_k = length * (length - 1) / 2
+    sum_kk = (length - 1) * length * (2 * length - 1) / 6
+    window_slope = (length * sum_ky - sum_k * sum_y) / (length * sum_kk - sum_k ** 2)
+    window_intercept = (sum_y - window_slope * sum_k) / length + centres[block_of[first]]
+
+    centered_ky = sum_ky - sum_k * sum_y / length
+    centered_yy = sum_yy - sum_y * sum_y / length
+    variance = np.maximum((centered_yy - window_slope * centered_ky) / length, 0.0)
+
+    gaps = prefix_missing[last + 1] - prefix_missing[first] > 0
+    window_slope[gaps] = np.nan
+    window_intercept[gaps] = np.nan
+    variance[gaps] = np.nan
+
+    slope[last] = window_slope
+    intercept[last] = window_intercept - window_slope * first
+    std_dev[last] = np.sqrt(variance)
+    fitted = window_slope * (length - 1) + window_intercept
+    bands[length - 1:] = fitted[:, None] + offsets[None, :] * std_dev[length - 1:, None]
+
+    return slope, intercept, std_dev, bands, deviation_band_names(sigmas)
+
 # Replace the original function with this modified version in the relevant part of the script.
 # This would ensure all standard deviation bands are calculated as offsets from the regression line at 0.25 sigma intervals.
 #calculate_linear_regression_and_deviations_modified
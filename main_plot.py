@@ -1,18 +1,34 @@
-from data_retrieval import get_stock_data, add_moving_averages
-#from plot_helpers import add_open_shape_indicator
-from plot_helpers import add_open_shape_indicator, plot_signals_with_candlestick_refactored, plot_intersection_marker, add_anchored_volume_profile
-#from plot_helpers import add_open_shape_indicator, plot_signals_with_candlestick_refactored, plot_intersection_marker  
-from signals import detect_signals, calculate_fibonacci_levels, detect_wick_touches, detect_fib_wick_touches, detect_body_ma_touches, detect_consecutive_days
-from geometry import find_two_peaks, find_two_high_peaks, find_two_low_troughs, calculate_intersection, plot_projection_line
-from plot_helpers import plot_signals_with_candlestick_refactored, plot_intersection_marker
-from signals import detect_volume_price_spikes
-from summary import generate_summary_output
-from datetime import timedelta
-from geometry import calculate_linear_regression_and_deviations
-import plotly.io as pio
-import yfinance as yf
+import argparse
 import os
-from datetime import datetime
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from data_retrieval import get_stock_data, add_moving_averages, OHLCVCache
+from events import SPIKE
+from geometry import (
+    SwingPointIndex, TimeAxis, find_two_high_peaks, find_two_low_troughs, calculate_intersection, plot_projection_line,
+    calculate_linear_regression_and_deviations,
+)
+from memo import IndicatorCache
+from profiling import PROFILE_ENV_VAR, PROFILE_MODES, RunProfiler
+from signal_db import SignalDB
+from signals import DETECTORS, calculate_fibonacci_levels, detect_events
+from summary import generate_event_summary_output, SummaryWriter, SUMMARY_FORMATS
+
+# plotly, kaleido and scipy are imported by the stages that draw (build_chart, the image export)
+# and yfinance by the first download, so a summary-only or cached run never loads them
+
+# Regression length of the deviation bands, in bars
+LEN_REGRESSION = 144
+
+# Chart formats export_figure writes
+FIGURE_FORMATS = ('png', 'svg', 'jpeg', 'webp', 'pdf', 'html', 'json')
+
+# Trough lookbacks and projection length: durations on daily bars, about as many bars on intraday ones
+DAILY_TRENDLINE_WINDOWS = dict(long_lookback=timedelta(days=182), short_lookback=timedelta(days=30), projection=timedelta(days=30))
+INTRADAY_TRENDLINE_WINDOWS = dict(long_lookback=126, short_lookback=21, projection=21)
 
 def create_output_directory(ticker):
     # Get today's date in YYYY-MM-DD format
@@ -21,27 +37,17 @@ def create_output_directory(ticker):
     # Create the directory path: data/YYYY-MM-DD/ticker
     directory = os.path.join('data', today, ticker)
 
-    # Create the directories if they don't exist
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+    # Create the directories if they don't exist (batch workers may race on the shared date folder)
+    os.makedirs(directory, exist_ok=True)
 
     return directory
 
 
 
-def main():
-
-
-    # Configuration and user input
-    ticker = input("Enter the stock ticker: ")
-
-    # Create the output directory at the beginning of the main function
-    output_directory = create_output_directory(ticker) 
-
-    # Allow the user to specify either a time period (e.g., '1y') or a date range (e.g., '2020-01-02,2021-06-22')
-    date_range_input = input("Enter the time period (e.g., '1y') or date range (e.g., '2020-01-02,2021-06-22'): ")
-
-    # Parse date range input
+def parse_date_range(date_range_input):
+    """
+    Splits a time period (e.g. '1y') or a date range (e.g. '2020-01-02,2021-06-22') into period, start and end.
+    """
     if ',' in date_range_input:
         start_date, end_date = date_range_input.split(',')
         start_date = start_date.strip()
@@ -52,114 +58,358 @@ def main():
         end_date = None
         period = date_range_input.strip()
 
-    # Data Retrieval
-    if start_date and end_date:
-        # Fetch data for the specified date range
-        df = yf.download(ticker, start=start_date, end=end_date)
-    else:
-        # Fetch data for the specified period (e.g., '1y')
-        df = yf.download(ticker, period=period)
-    
+    return period, start_date, end_date
+
+
+def compute_signals(ticker, date_range_input, profiler=None, indicator_cache=None, ohlcv_cache=None,
+                    len_regression=LEN_REGRESSION, detectors=DETECTORS):
+    """
+    Downloads the bars (through `ohlcv_cache`, a fresh OHLCVCache by default) and runs the
+    indicators and the `detectors`, without writing anything. Returns a dict with the frame (`df`),
+    the `events` and the levels the chart is drawn from.
+    """
+    profiler = profiler or RunProfiler()
+    indicators = indicator_cache or IndicatorCache()
+    ohlcv_cache = ohlcv_cache or OHLCVCache()
+
+    period, start_date, end_date = parse_date_range(date_range_input)
+
+    # Data Retrieval (served from the local OHLCV cache; only missing bars are downloaded)
+    with profiler.stage('download') as stage:
+        if start_date and end_date:
+            # Fetch data for the specified date range
+            df = get_stock_data(ticker, start=start_date, end=end_date, cache=ohlcv_cache)
+        else:
+            # Fetch data for the specified period (e.g., '1y')
+            df = get_stock_data(ticker, period=period, cache=ohlcv_cache)
+        stage.note(rows=len(df))
+    if len(df) < len_regression:
+        raise ValueError(f"{ticker}: {len(df)} bars, the analysis needs at least {len_regression}")
+
     # Add moving averages (if needed)
-    df = add_moving_averages(df)
+    with profiler.stage('moving_averages', rows=len(df)):
+        df = indicators.call(add_moving_averages, df)
 
     # Get the most recent date and closing price for the watermark
     latest_date = df.index[-1].strftime("%Y-%m-%d")
     current_price = df['Close'].iloc[-1]
 
     # Signal Calculations
-    buy_signals, sell_signals = detect_signals(df)
-    fib_levels, high_price, low_price = calculate_fibonacci_levels(df)
-    len_regression = 144  # Set regression length for calculations
-
-    # Calculate Linear Regression and Deviation Bands
-    slope, intercept, start_price, end_price, deviations = calculate_linear_regression_and_deviations(df, len_regression)
-    wick_touches, touched_devs = detect_wick_touches(df, deviations, len_regression)
-    fib_wick_touches, touched_fibs = detect_fib_wick_touches(df, fib_levels)
-    ma_touches, touched_mas = detect_body_ma_touches(df)
-    sequence_stars = detect_consecutive_days(df)
+    with profiler.stage('detectors', rows=len(df)) as stage:
+        fib_levels, high_price, low_price = indicators.call(calculate_fibonacci_levels, df)
+        # Calculate Linear Regression and Deviation Bands
+        slope, intercept, start_price, end_price, deviations = indicators.call(
+            calculate_linear_regression_and_deviations, df, len_regression)
+
+        # Buy/sell, streak, wick, Fibonacci and MA touch events plus volume/price spikes, in one columnar store
+        events = indicators.call(detect_events, df, deviations, len_regression, fib_levels, detectors=tuple(detectors))
+        stage.note(events=len(events))
+
+    return dict(
+        df=df, events=events, fib_levels=fib_levels, slope=slope, intercept=intercept, deviations=deviations,
+        latest_date=latest_date, current_price=current_price,
+    )
 
-    # Calculate spikes
-    spike_days = detect_volume_price_spikes(df)
 
-    # Generate Detailed Summary Output
-    generate_summary_output(ticker, buy_signals, sell_signals, sequence_stars, wick_touches, fib_wick_touches, ma_touches, output_directory)
+def build_chart(ticker, signals, profiler=None):
+    """
+    Candlestick chart of `compute_signals` results with the signal markers, the trendline
+    projections and their intersection.
+    """
+    profiler = profiler or RunProfiler()
+    df, events = signals['df'], signals['events']
+    fib_levels, slope, intercept, deviations = signals['fib_levels'], signals['slope'], signals['intercept'], signals['deviations']
+    latest_date, current_price = signals['latest_date'], signals['current_price']
+    from plot_helpers import add_anchored_volume_profile, add_event_markers, plot_intersection_marker, plot_signals_from_events
 
     # Initial Peaks and Troughs Calculation
-    high_peaks = find_two_high_peaks(df)
-    low_troughs = find_two_low_troughs(df)
-    
-    slope, intercept, start_price, end_price, deviations = calculate_linear_regression_and_deviations(df, len_regression)
+    with profiler.stage('peaks_troughs', rows=len(df)):
+        # Swing points and range trees are built once and reused for the secondary lines
+        swings = SwingPointIndex(df)
+        # Trendlines use date ordinals on daily bars and bar positions on intraday ones
+        axis = TimeAxis(df.index)
+        windows = DAILY_TRENDLINE_WINDOWS if axis.unit == 'D' else INTRADAY_TRENDLINE_WINDOWS
+        try:
+            high_peaks = find_two_high_peaks(df, swings)
+            low_troughs = find_two_low_troughs(df, swings, long_lookback=windows['long_lookback'], short_lookback=windows['short_lookback'])
+        except ValueError as e:
+            print("Skipping trendlines:", e)
+            high_peaks = low_troughs = None
 
     # Create Figure and Plot Initial Signals with Candlestick Chart
-    fig = plot_signals_with_candlestick_refactored(
-        df, buy_signals, sell_signals, fib_levels, 
-        wick_touches, fib_wick_touches, ma_touches, 
-        sequence_stars, slope, intercept, ticker, deviations, touched_devs,
-        spike_days=spike_days  # Add spike_days
-    )
+    with profiler.stage('figure') as stage:
+        fig = plot_signals_from_events(df, events, fib_levels, slope, intercept, ticker, deviations)
+
+        # Add the open shape indicator
+        add_event_markers(fig, events, SPIKE)
+
+        # Add the volume profile anchored at the start of the long trough window
+        add_anchored_volume_profile(fig, df, period=windows['long_lookback'])
+        stage.note(traces_added=len(fig.data))
+
+    with profiler.stage('projections') as stage:
+        traces_before = len(fig.data)
+
+        # Without two peaks and troughs there are no trendlines to project
+        if high_peaks is not None:
+            # Plot Projection Lines
+            slope_high, intercept_high = plot_projection_line(df, fig, high_peaks['High'], color='green', line_name='High Peak Line', axis=axis, projection=windows['projection'])
+            slope_low, intercept_low = plot_projection_line(df, fig, low_troughs['Low'], color='red', line_name='Low Trough Line', axis=axis, projection=windows['projection'])
+
+            # Try to Calculate Intersection and Plot Concentric Circles
+            try:
+                date_intersect, y_intersect = calculate_intersection(slope_high, intercept_high, slope_low, intercept_low, axis)
+                plot_intersection_marker(fig, date_intersect, y_intersect)
+            except ValueError as e:
+                print("Skipping intersection marker:", e)
+
+            # Get the Date One Bar After the First Peak to Start New Calculation for Secondary Peaks and Troughs
+            start_date_new_peaks = high_peaks.index[0] + axis.period
+            start_new_peaks = swings.position(start_date_new_peaks, side='right')
+
+            # Calculate the Second Set of Peaks and Troughs Only if Enough Data Points Are Available
+            try:
+                new_high_peaks = find_two_high_peaks(df, swings, start=start_new_peaks)
+                new_low_troughs = find_two_low_troughs(df, swings, start=start_new_peaks, long_lookback=windows['long_lookback'], short_lookback=windows['short_lookback'])
+
+                # Plot New Projections with Dotted Lines in Blue and Yellow
+                plot_projection_line(df, fig, new_high_peaks['High'], color='blue', line_name='Secondary High Peak Line', project_until=None, axis=axis, projection=windows['projection'])
+                plot_projection_line(df, fig, new_low_troughs['Low'], color='yellow', line_name='Secondary Low Trough Line', project_until=None, axis=axis, projection=windows['projection'])
+
+            except ValueError as e:
+                print("Skipping secondary lines:", e)
+
+        # Add watermark with ticker, date, and current price
+        fig.add_annotation(
+            text=f"{ticker.upper()} - {latest_date} - ${current_price:.2f}",
+            xref="paper", yref="paper", x=0.5, y=0.5,
+            showarrow=False,
+            font=dict(size=40, color="rgba(128, 128, 128, 0.3)"),
+            opacity=0.2
+        )
+        stage.note(traces_added=len(fig.data) - traces_before)
+
+    return fig
+
+
+def analyze_ticker(ticker, date_range_input, show=True, profiler=None, indicator_cache=None, summary_writers=None,
+                   signal_db=None, len_regression=LEN_REGRESSION, detectors=DETECTORS, figure_formats=('png',),
+                   skip_plot=False):
+    """
+    Runs the full analysis for one ticker: signals, summary files (one per SummaryWriter in
+    `summary_writers`, a plain CSV by default), chart and its export in `figure_formats`. With a
+    `signal_db` path the events are also upserted into that SignalDB. With skip_plot=True no figure
+    is built at all.
+    Indicators and detectors are memoized in `indicator_cache` (by default on disk under
+    cache/indicators, so reruns on unchanged data skip them). Returns the path of the first chart
+    file written, or None.
+    """
+    profiler = (profiler or RunProfiler()).start()
+    indicators = indicator_cache or IndicatorCache(directory=os.path.join('cache', 'indicators'))
+    summary_writers = (SummaryWriter(),) if summary_writers is None else summary_writers
+
+    # Create the output directory at the beginning of the analysis
+    output_directory = create_output_directory(ticker)
+
+    df = fig = plot_filename = error = None
+    try:
+        signals = compute_signals(ticker, date_range_input, profiler, indicators, len_regression=len_regression,
+                                  detectors=detectors)
+        df, events = signals['df'], signals['events']
+
+        # Generate Detailed Summary Output
+        with profiler.stage('summary'):
+            for writer in summary_writers:
+                generate_event_summary_output(ticker, events, output_directory, writer)
+            if signal_db is not None:
+                with SignalDB(signal_db) as db:
+                    db.ingest(ticker, events)
+
+        if not skip_plot:
+            fig = build_chart(ticker, signals, profiler)
+
+            # Display the interactive plot with full legend and range slider
+            if show:
+                with profiler.stage('show'):
+                    fig.show()
+
+            # Save the plot with the ticker and period in the filename; the legend and range slider are switched
+            # off on a copy of the figure (SAVE_LAYOUT) and the warm renderer of this process is reused
+            if figure_formats:
+                plot_stem = os.path.join(output_directory, f"{ticker}_{date_range_input.replace(',', '_')}_plot")
+                with profiler.stage('write_image'):
+                    from export import export_figure
+                    paths = export_figure(fig, plot_stem, formats=figure_formats)
+                plot_filename = paths[figure_formats[0]]
+                for path in paths.values():
+                    print(f"Plot saved as {path}")
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        # Written for failing runs too, with the error that stopped them
+        profiler.stop().write_report(
+            output_directory, ticker, date_range=date_range_input, rows=0 if df is None else len(df),
+            traces=len(fig.data) if fig else 0, indicator_cache=indicators.summary(), error=error,
+        )
+
+    return plot_filename
 
-    # Add the open shape indicator
-    add_open_shape_indicator(fig, spike_days)
 
-    # Add anchored volume profile
-    #fig = add_anchored_volume_profile(fig, df, anchor_price=df['Close'].iloc[-1], period=20)  # Customize anchor_price and period as needed
+def main():
+    # Configuration and user input
+    ticker = input("Enter the stock ticker: ")
 
-    # Plot Projection Lines
-    slope_high, intercept_high = plot_projection_line(df, fig, high_peaks['High'], color='green', line_name='High Peak Line')
-    slope_low, intercept_low = plot_projection_line(df, fig, low_troughs['Low'], color='red', line_name='Low Trough Line')
+    # Allow the user to specify either a time period (e.g., '1y') or a date range (e.g., '2020-01-02,2021-06-22')
+    date_range_input = input("Enter the time period (e.g., '1y') or date range (e.g., '2020-01-02,2021-06-22'): ")
 
-    # Try to Calculate Intersection and Plot Concentric Circles
-    try:
-        date_intersect, y_intersect = calculate_intersection(slope_high, intercept_high, slope_low, intercept_low)
-        plot_intersection_marker(fig, date_intersect, y_intersect)
-    except ValueError as e:
-        print("Skipping intersection marker:", e)
+    analyze_ticker(ticker, date_range_input, show=True)
 
-    # Get the Date After the First Peak to Start New Calculation for Secondary Peaks and Troughs
-    start_date_new_peaks = high_peaks.index[0] + timedelta(days=1)
-    df_after_first_peak = df[df.index > start_date_new_peaks]
 
-    # Calculate the Second Set of Peaks and Troughs Only if Enough Data Points Are Available
+def _analyze_ticker_isolated(ticker, date_range_input, options):
+    """
+    Batch worker: runs one ticker and reports the failure instead of raising it.
+    """
+    start = time.perf_counter()
     try:
-        new_high_peaks = find_two_high_peaks(df_after_first_peak)
-        new_low_troughs = find_two_low_troughs(df_after_first_peak)
-
-        # Plot New Projections with Dotted Lines in Blue and Yellow
-        plot_projection_line(df, fig, new_high_peaks['High'], color='blue', line_name='Secondary High Peak Line', project_until=None)
-        plot_projection_line(df, fig, new_low_troughs['Low'], color='yellow', line_name='Secondary Low Trough Line', project_until=None)
-
+        plot_filename = analyze_ticker(ticker, date_range_input, show=False, **options)
+        error = None
+    except Exception as e:
+        plot_filename = None
+        error = f"{type(e).__name__}: {e}"
+    return {"ticker": ticker, "plot": plot_filename, "error": error, "seconds": time.perf_counter() - start}
+
+
+def run_batch(tickers, date_range_input, max_workers=None, **options):
+    """
+    Analyzes every ticker in a process pool, passing `options` on to analyze_ticker (never shown).
+    A failing ticker is recorded and does not stop the run. With a SummaryWriter given a `dataset`,
+    the summaries also form one dataset for the whole list.
+    """
+    results = []
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_analyze_ticker_isolated, ticker, date_range_input, options): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:  # The worker process itself died
+                result = {"ticker": futures[future], "plot": None, "error": f"{type(e).__name__}: {e}", "seconds": None}
+            results.append(result)
+
+    print_timing_report(results, time.perf_counter() - start)
+    return results
+
+
+def print_timing_report(results, total_seconds):
+    failed = [r for r in results if r["error"]]
+    timed = sorted((r for r in results if r["seconds"] is not None), key=lambda r: r["seconds"], reverse=True)
+
+    print(f"\nProcessed {len(results)} tickers in {total_seconds:.1f}s ({len(results) - len(failed)} ok, {len(failed)} failed)")
+    for r in timed:
+        status = "FAILED" if r["error"] else "ok"
+        print(f"  {r['ticker']:<10} {r['seconds']:8.2f}s  {status}")
+    if timed:
+        print(f"  mean {sum(r['seconds'] for r in timed) / len(timed):.2f}s per ticker")
+    for r in failed:
+        print(f"  {r['ticker']}: {r['error']}")
+
+
+def read_watchlist(path):
+    """
+    Reads one ticker per line, ignoring blank lines and '#' comments.
+    """
+    with open(path) as f:
+        lines = (line.split('#')[0].strip() for line in f)
+        return [line for line in lines if line]
+
+
+def _choices(text, allowed, what, parser):
+    values = [value.strip() for value in text.split(',') if value.strip()]
+    unknown = [value for value in values if value not in allowed]
+    if unknown:
+        parser.error(f"unknown {what}: {', '.join(unknown)} (choose from {', '.join(allowed)})")
+    return values
+
+
+def cli(argv=None):
+    """
+    Command line entry point. Without arguments on a terminal it falls back to the interactive prompts.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv and sys.stdin.isatty():
+        main()
+        return 0
+
+    parser = argparse.ArgumentParser(description="Analyze tickers: signal summaries, signal database and charts.")
+    parser.add_argument("tickers", nargs="*", help="Tickers to analyze")
+    parser.add_argument("--watchlist", help="File with one ticker per line")
+    parser.add_argument("--period", default="1y",
+                        help="Time period (e.g. '1y') or date range (e.g. '2020-01-02,2021-06-22')")
+    parser.add_argument("--start", default=None, help="First date (YYYY-MM-DD), instead of --period")
+    parser.add_argument("--end", default=None, help="End date, exclusive (default: up to today)")
+    parser.add_argument("--len-regression", type=int, default=LEN_REGRESSION, help="Regression length in bars")
+    parser.add_argument("--detectors", default=','.join(DETECTORS),
+                        help=f"Comma separated detectors to run (default: all of {', '.join(DETECTORS)})")
+    parser.add_argument("--formats", default="csv,png",
+                        help=f"Comma separated outputs: summary {', '.join(SUMMARY_FORMATS)}; "
+                             f"chart {', '.join(FIGURE_FORMATS)} (default: csv,png)")
+    parser.add_argument("--no-show", action="store_true", help="Do not open the interactive chart")
+    parser.add_argument("--skip-plot", action="store_true", help="Analysis only: do not build any chart")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes for several tickers")
+    parser.add_argument("--profile", nargs="?", const="stages", choices=PROFILE_MODES,
+                        help="Write a run report for every ticker: stage timings (the default), plus the "
+                             "top cProfile functions (cprofile) or the peak memory of each stage (memory)")
+    parser.add_argument("--db", default=None, help="SQLite signal database to upsert the events into")
+    parser.add_argument("--compression", default=None,
+                        help="Summary compression (gzip, bz2 or xz for CSV; snappy, zstd, gzip, ... for Parquet)")
+    parser.add_argument("--append", action="store_true", help="Only add events newer than those already written")
+    parser.add_argument("--dataset", default=None, help="Also write every summary into one partitioned dataset here")
+    args = parser.parse_args(argv)
+
+    tickers = list(args.tickers)
+    if args.watchlist:
+        tickers += read_watchlist(args.watchlist)
+    if not tickers:
+        parser.error("no tickers given")
+
+    date_range_input = args.period
+    if args.start or args.end:
+        if not args.start:
+            parser.error("--end needs --start")
+        end = args.end or (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+        date_range_input = f"{args.start},{end}"
+
+    formats = _choices(args.formats, SUMMARY_FORMATS + FIGURE_FORMATS, "formats", parser)
+    summary_formats = [fmt for fmt in formats if fmt in SUMMARY_FORMATS]
+    if args.dataset and not summary_formats:
+        parser.error("--dataset needs a summary format (csv or parquet)")
+    # The dataset is written once, in Parquet when both summary formats are asked for
+    dataset_format = 'parquet' if 'parquet' in summary_formats else 'csv'
+    try:
+        summary_writers = [
+            SummaryWriter(fmt, args.compression, append=args.append, dataset=args.dataset if fmt == dataset_format else None)
+            for fmt in summary_formats
+        ]
     except ValueError as e:
-        print("Skipping secondary lines:", e)
-
-    # Add watermark with ticker, date, and current price
-    fig.add_annotation(
-        text=f"{ticker.upper()} - {latest_date} - ${current_price:.2f}",
-        xref="paper", yref="paper", x=0.5, y=0.5,
-        showarrow=False,
-        font=dict(size=40, color="rgba(128, 128, 128, 0.3)"),
-        opacity=0.2
-    )
+        parser.error(str(e))
 
-    # Display the interactive plot with full legend and range slider
-    fig.show()
+    if args.profile:
+        # Read by every RunProfiler, including those of the worker processes
+        os.environ[PROFILE_ENV_VAR] = args.profile
 
-    # Create a copy of the figure for saving
-    fig_for_saving = fig.full_figure_for_development(warn=False)
-    
-    # Remove the legend and range slider from the saved figure
-    fig_for_saving.update_layout(showlegend=False, xaxis_rangeslider_visible=False)
-
-    # Save the plot as a PNG with the ticker and period in the filename
-    #filename = f"{ticker}_{date_range_input.replace(',', '_')}_plot.png"
-    #pio.write_image(fig_for_saving, filename, format="png")
-    #print(f"Plot saved as {filename}")
-    # Save the plot
-    plot_filename = os.path.join(output_directory, f"{ticker}_{date_range_input.replace(',', '_')}_plot.png")
-    pio.write_image(fig_for_saving, plot_filename, format="png")
-    print(f"Plot saved as {plot_filename}")
+    options = dict(
+        summary_writers=summary_writers, signal_db=args.db, len_regression=args.len_regression,
+        detectors=tuple(_choices(args.detectors, DETECTORS, "detectors", parser)),
+        figure_formats=tuple(fmt for fmt in formats if fmt in FIGURE_FORMATS), skip_plot=args.skip_plot,
+    )
+    if len(tickers) == 1:
+        analyze_ticker(tickers[0], date_range_input, show=not (args.no_show or args.skip_plot), **options)
+        return 0
+    results = run_batch(tickers, date_range_input, max_workers=args.workers, **options)
+    return 1 if any(r["error"] for r in results) else 0
 
 
 if __name__ == "__main__":
-    main()
-
+    sys.exit(cli())
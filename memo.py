@@ -0,0 +1,284 @@
+import copy
+import functools
+import hashlib
+import importlib.util
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Bars hashed at the end of a frame (where new and revised bars land) and spread over the rest of it
+TAIL_ROWS = 256
+SAMPLE_ROWS = 64
+
+# Modules holding the helpers behind the memoized indicators and detectors: their source is part of
+# every key, so editing any of them invalidates the cached results
+SOURCE_MODULES = ('data_retrieval', 'events', 'geometry', 'moving_averages', 'signals', 'timeframes', 'volume_profile')
+
+
+def fingerprint(df, columns=None, tail=TAIL_ROWS, samples=SAMPLE_ROWS):
+    """
+    Cheap content hash of a frame: its length, column names, index ends, and the values of the last
+    `tail` rows plus `samples` rows spread evenly over the rest.
+
+    Appending, dropping or revising recent bars changes it; a revision deep in the history is only
+    seen if it falls on a sampled row, so pass tail=None to hash every row.
+    """
+    if isinstance(df, pd.Series):
+        df = df.to_frame()
+    columns = list(df.columns) if columns is None else [c for c in columns if c in df.columns]
+    n = len(df)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((n, columns, str(df.index.dtype))).encode())
+
+    if tail is None or n <= tail + samples:
+        rows = slice(None)
+    else:
+        rows = np.unique(np.concatenate([np.linspace(0, n - tail - 1, samples).astype(int), np.arange(n - tail, n)]))
+
+    index = df.index
+    if isinstance(index, pd.DatetimeIndex):
+        index = index.values.astype('datetime64[ns]').view(np.int64)
+    digest.update(_array_bytes(np.asarray(index)[rows]))
+    for column in columns:
+        digest.update(_array_bytes(df[column].values[rows]))
+    return digest.hexdigest()
+
+
+def _array_bytes(values):
+    values = np.asarray(values)
+    if values.dtype == object:
+        return repr(values.tolist()).encode()
+    return np.ascontiguousarray(values).tobytes()
+
+
+def _key_part(value, columns):
+    """
+    Hashable stand-in for one argument; raises TypeError for values without a stable representation.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return ('frame', fingerprint(value, columns if isinstance(value, pd.DataFrame) else None))
+    if isinstance(value, np.ndarray):
+        return ('array', value.shape, str(value.dtype), hashlib.blake2b(_array_bytes(value), digest_size=16).hexdigest())
+    if isinstance(value, dict):
+        return ('dict', tuple((repr(k), _key_part(v, columns)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(_key_part(v, columns) for v in value))
+    if value is None or isinstance(value, (str, bytes, bool, int, float, np.generic, pd.Timestamp, pd.Timedelta)):
+        return repr(value)
+    raise TypeError(f"cannot fingerprint {type(value).__name__}")
+
+
+def _code_bytes(code):
+    # Nested code objects (comprehensions, lambdas) are expanded; their repr holds a memory address
+    consts = [_code_bytes(c) if hasattr(c, 'co_code') else repr(c).encode() for c in code.co_consts]
+    return code.co_code + b''.join(consts)
+
+
+def _function_id(func):
+    # The bytecode is part of the key, so editing a memoized function invalidates its old results
+    code = getattr(func, '__code__', None)
+    body = hashlib.blake2b(_code_bytes(code), digest_size=8).hexdigest() if code else ''
+    return f"{func.__module__}.{func.__qualname__}:{body}"
+
+
+@functools.lru_cache(maxsize=None)
+def source_salt(modules):
+    """
+    Hash of the source files of `modules`; a module that cannot be found is hashed by name only.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for name in sorted(set(modules)):
+        digest.update(name.encode())
+        try:
+            spec = importlib.util.find_spec(name)
+        except (ImportError, ValueError):  # __main__ and other modules without a spec
+            spec = None
+        if spec is not None and spec.origin and os.path.isfile(spec.origin):
+            with open(spec.origin, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+class IndicatorCache:
+    """
+    Memoizes indicator and detector calls on (function, fingerprint of the frame arguments, other
+    arguments).
+
+    Results live in an in-memory LRU of `max_entries` and, when `directory` is given, in pickles on
+    disk that survive between runs; the least recently used files are removed once they take more
+    than `max_disk_bytes`. The disk tier is best-effort: files removed or unreadable because another
+    process shares the directory are recomputed. Every hit returns a copy, so callers may modify
+    results freely. Functions that modify their input frame in place must be used through their
+    return value. One cache may be shared by threads and processes.
+
+    Keys hold the bytecode of the function and the source of its module and of `source_modules`,
+    so editing a helper called by a memoized function does not reuse stale results.
+
+    `stats` counts, per function, memory and disk hits, misses, uncacheable calls, the seconds spent
+    computing and the seconds the hits saved.
+    """
+
+    def __init__(self, max_entries=128, directory=None, max_disk_bytes=256 * 2 ** 20, source_modules=SOURCE_MODULES):
+        self.max_entries = max_entries
+        self.source_modules = tuple(source_modules)
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    def call(self, func, *args, columns=None, **kwargs):
+        """
+        `func(*args, **kwargs)`, served from the cache when the same inputs were seen before.
+        Only the `columns` of frame arguments are fingerprinted (all of them by default).
+        """
+        stats = self.stats.setdefault(func.__qualname__, dict(
+            memory_hits=0, disk_hits=0, misses=0, uncacheable=0, compute_seconds=0.0, saved_seconds=0.0,
+        ))
+        try:
+            key = hashlib.blake2b(repr((
+                _function_id(func), source_salt(self.source_modules + (func.__module__,)),
+                _key_part(args, columns), _key_part(kwargs, columns),
+            )).encode(), digest_size=20).hexdigest()
+        except TypeError:
+            stats['uncacheable'] += 1
+            return func(*args, **kwargs)
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                stats['memory_hits'] += 1
+        if entry is None:
+            entry = self._load(key)
+            if entry is not None:
+                stats['disk_hits'] += 1
+                self._remember(key, entry)
+        if entry is not None:
+            value, seconds = entry
+            stats['saved_seconds'] += seconds
+            return copy.deepcopy(value)
+
+        start = time.perf_counter()
+        value = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        stats['misses'] += 1
+        stats['compute_seconds'] += seconds
+
+        entry = (copy.deepcopy(value), seconds)
+        self._remember(key, entry)
+        self._store(key, entry)
+        return value
+
+    def memoize(self, func=None, columns=None):
+        """
+        Decorator form of `call`: `@cache.memoize` or `@cache.memoize(columns=['Close'])`.
+        """
+        if func is None:
+            return functools.partial(self.memoize, columns=columns)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(func, *args, columns=columns, **kwargs)
+        return wrapper
+
+    def summary(self):
+        """
+        Totals over all functions.
+        """
+        totals = dict(memory_hits=0, disk_hits=0, misses=0, uncacheable=0, compute_seconds=0.0, saved_seconds=0.0)
+        for stats in self.stats.values():
+            for name, value in stats.items():
+                totals[name] += value
+        calls = totals['memory_hits'] + totals['disk_hits'] + totals['misses']
+        totals['hit_rate'] = (totals['memory_hits'] + totals['disk_hits']) / calls if calls else 0.0
+        return totals
+
+    def clear(self):
+        self._memory.clear()
+        if self.directory and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.directory, name))
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _load(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        # The modification time records the last access for the LRU eviction; another process
+        # may have evicted the file since it was read
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return entry
+
+    def _store(self, key, entry):
+        if not self.directory:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            # A full or unwritable disk only costs the cached copy
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """
+        Removes the least recently used result files until they fit in `max_disk_bytes`.
+        """
+        if not self.directory or self.max_disk_bytes is None or not os.path.isdir(self.directory):
+            return []
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                # Processes sharing the directory evict concurrently: a file may vanish at any point
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        files.sort()
+        total = sum(size for _, _, size in files)
+        evicted = []
+        for _, name, size in files:
+            if total <= self.max_disk_bytes:
+                break
+            if keep is not None and name == f"{keep}.pkl":
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+                evicted.append(name)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return evicted
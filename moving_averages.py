@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+
+MA_KINDS = ('SMA', 'EMA', 'WMA', 'VWMA')
+
+# The averages add_moving_averages has always added
+DEFAULT_MAS = ['SMA_10', 'SMA_20', 'SMA_50', 'SMA_100', 'SMA_200', 'SMA_300']
+
+
+def ma_name(kind, window):
+    return f'{kind}_{window}'
+
+
+def parse_ma(name):
+    """
+    Splits an MA name such as 'EMA_21' into its kind and window.
+    """
+    kind, _, window = name.partition('_')
+    if kind not in MA_KINDS or not window.isdigit() or int(window) < 1:
+        raise ValueError(f"Unsupported moving average: {name!r}")
+    return kind, int(window)
+
+
+def prefix_block(windows):
+    """
+    Rows between restarts of the block prefix sums: 512, or the power of two at least as long as
+    the longest window when that is longer.
+    """
+    return 1 << max(9, (max(windows, default=1) - 1).bit_length())
+
+
+def block_prefix(values, block):
+    """
+    Prefix sums that restart every `block` rows (exclusive, one per position 0..n) and the total of
+    each block's row repeated over the block's rows. Each sum only adds the rows before its
+    position, in order, so it is the same whatever follows it.
+    """
+    n = len(values)
+    padded = np.zeros(((n // block + 1) * block,) + values.shape[1:])
+    padded[:n] = values
+    inclusive = np.cumsum(padded.reshape((-1, block) + values.shape[1:]), axis=1)
+    local = np.zeros_like(inclusive)
+    local[:, 1:] = inclusive[:, :-1]
+    totals = np.repeat(inclusive[:, -1], block, axis=0)[:n]
+    return local.reshape(padded.shape)[:n + 1], totals
+
+
+def _ema(close, window):
+    alpha = 2 / (window + 1)
+    if np.isnan(close).any():
+        # Gaps: pandas carries the average across missing values
+        frame = pd.DataFrame(close.reshape(len(close), -1))
+        values = frame.ewm(span=window, adjust=False, min_periods=window).mean().values
+        return values.reshape(close.shape)
+    from scipy.signal import lfilter
+
+    # y[t] = alpha * x[t] + (1 - alpha) * y[t-1], seeded with the first close
+    initial = ((1 - alpha) * close[:1]).reshape((1,) + close.shape[1:])
+    values, _ = lfilter([alpha], [1, alpha - 1], close, axis=0, zi=initial)
+    values[:window - 1] = np.nan
+    return values
+
+
+def compute_moving_averages(close, mas=DEFAULT_MAS, volume=None):
+    """
+    Every requested moving average of `close` in one (bars x MAs) float64 array, columns in the
+    order of `mas` (names like 'SMA_50', 'EMA_21', 'WMA_10', 'VWMA_20').
+
+    - SMA: mean of the last `window` closes
+    - EMA: exponential average with alpha = 2 / (window + 1), seeded with the first close
+      (pandas `ewm(span=window, adjust=False)`)
+    - WMA: linearly weighted mean, the newest close weighing `window`
+    - VWMA: volume weighted mean (needs `volume`)
+
+    SMA, WMA and VWMA share one pass of prefix sums over the closes, so each extra window costs a
+    few array subtractions. The sums restart every `block` bars (512, or a larger power of two for
+    longer windows), which keeps them the size of a block, so the error stays near 1e-14 relative
+    for SMA and VWMA (1e-11 for WMA) however long the history. A value depends only on its window
+    length and the closes up to its bar, never on the other `mas` or on later bars. Like pandas'
+    rolling(window), the first `window - 1` bars and any window holding a NaN are NaN. `close` may
+    also be (bars x series), giving a (bars x series x MAs) array.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    specs = [parse_ma(name) for name in mas]
+    kinds = {kind for kind, _ in specs}
+    n = len(close)
+    out = np.full((len(specs),) + close.shape, np.nan)
+    if n == 0:
+        return np.moveaxis(out, 0, -1)
+
+    def column(values):
+        return values.reshape((-1,) + (1,) * (close.ndim - 1))
+
+    def counts(mask):
+        result = np.zeros((n + 1,) + mask.shape[1:], dtype=np.int64)
+        np.cumsum(mask, axis=0, out=result[1:])
+        return result
+
+    missing = np.isnan(close)
+    clean = np.where(missing, 0.0, close)
+    missing_counts = counts(missing)
+    if 'VWMA' in kinds:
+        if volume is None:
+            raise ValueError("VWMA needs volume")
+        volume = np.ascontiguousarray(volume, dtype=np.float64)
+        missing_volume = missing | np.isnan(volume)
+        clean_volume = np.where(missing_volume, 0.0, volume)
+        missing_volume_counts = counts(missing_volume)
+
+    # Each window's block depends on that window alone, so an average comes out the same whatever
+    # other averages are asked for with it; windows of one block share its offsets and prefix sums
+    offsets = {}
+    prefixes = {}
+
+    def block_offsets(block):
+        if block not in offsets:
+            offsets[block] = np.arange(n) % block
+        return offsets[block]
+
+    def prefix(name, block):
+        if (name, block) not in prefixes:
+            if name == 'sums':
+                values = clean
+            elif name == 'weighted':
+                values = column(block_offsets(block).astype(np.float64)) * clean
+            elif name == 'volumes':
+                values = clean_volume
+            else:
+                values = clean * clean_volume
+            prefixes[name, block] = block_prefix(values, block)
+        return prefixes[name, block]
+
+    for position, (kind, window) in enumerate(specs):
+        if kind == 'EMA':
+            out[position] = _ema(close, window)
+            continue
+        if window > n:
+            continue
+
+        # Windows [start, start + window) for every start; a window spans at most two blocks, and
+        # when it ends past its first block that block's total completes the sum
+        block = prefix_block([window])
+        m = n - window + 1
+        offset = block_offsets(block)[:m]
+        crosses = column(offset >= block - window)
+
+        def window_sums(prefixed):
+            local, totals = prefixed
+            return local[window:] - local[:m] + crosses * totals[:m]
+
+        if kind == 'SMA':
+            values = window_sums(prefix('sums', block)) / window
+            gaps = missing_counts
+        elif kind == 'WMA':
+            # Bar i = block * k + p weighs p + block * k - start + 1: its offset in the block plus a
+            # per-window base, plus `block` for the bars in the second block
+            sums = prefix('sums', block)
+            base = column((1 - offset).astype(np.float64))
+            second_block = crosses * sums[0][window:]
+            values = (window_sums(prefix('weighted', block)) + base * window_sums(sums)
+                      + block * second_block)
+            values /= window * (window + 1) / 2
+            gaps = missing_counts
+        else:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values = (window_sums(prefix('price_volumes', block))
+                          / window_sums(prefix('volumes', block)))
+            gaps = missing_volume_counts
+
+        target = out[position, window - 1:]
+        target[...] = values
+        if gaps[-1].any():
+            target[gaps[window:] - gaps[:m] > 0] = np.nan
+    return np.moveaxis(out, 0, -1)
+
+
+def moving_average_frame(df, mas=DEFAULT_MAS):
+    """
+    The averages of df['Close'] (VWMA weighted by df['Volume']) as a DataFrame on df's index.
+    """
+    volume = df['Volume'].values if any(name.startswith('VWMA') for name in mas) else None
+    values = compute_moving_averages(df['Close'].values, mas, volume)
+    return pd.DataFrame(values, index=df.index, columns=list(mas))
+
+
+def ma_matrix(df, mas=DEFAULT_MAS):
+    """
+    (bars x MAs) array of `mas`: the columns df already holds, the rest computed from its closes.
+    """
+    missing = [name for name in mas if name not in df.columns]
+    computed = moving_average_frame(df, missing)
+    values = np.empty((len(df), len(mas)))
+    for i, name in enumerate(mas):
+        values[:, i] = computed[name].values if name in missing else df[name].values
+    return values
@@ -1,43 +1,78 @@
 import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
+
+from events import BUY, SELL, GREEN_STAR, RED_STAR, WICK_TOUCH, FIB_WICK_TOUCH, MA_TOUCH, SPIKE
+from moving_averages import ma_matrix
+from signals import TOUCH_MAS
+from volume_profile import DEFAULT_BINS, VALUE_AREA, anchored_volume_profile
+
+# Marker style and legend name of each event type
+EVENT_MARKERS = {
+    BUY: dict(marker=dict(symbol='triangle-up', size=10, color='green'), name='Buy Signals'),
+    SELL: dict(marker=dict(symbol='triangle-down', size=10, color='red'), name='Sell Signals'),
+    WICK_TOUCH: dict(marker=dict(symbol='x', color='blue', size=8), name='Wick Touches'),
+    FIB_WICK_TOUCH: dict(marker=dict(symbol='circle', color='purple', size=6), name='Fib Wick Touches'),
+    MA_TOUCH: dict(marker=dict(symbol='cross', color='black', size=8), name='MA Touches'),
+    SPIKE: dict(marker=dict(symbol='circle-open', size=15, color='black', line=dict(width=2)), name='Volume & Price Spike'),
+}
+
+# Large-data rendering: above LARGE_DATA_THRESHOLD bars candles are merged into at most MAX_CANDLES,
+# line series are thinned to LINE_POINTS points and traces are drawn with WebGL
+LARGE_DATA_THRESHOLD = 20_000
+MAX_CANDLES = 2_000
+LINE_POINTS = 4_000
+
+def _add_markers(fig, x, y, kind):
+    fig.add_trace(go.Scatter(x=x, y=y, mode='markers', **EVENT_MARKERS[kind]))
+    return fig
 
+def add_anchored_volume_profile(fig, df, anchor_price=None, period=None, anchor=None, bins=DEFAULT_BINS,
+                                bin_size=None, value_area=VALUE_AREA, width=0.2):
+    """
+    Horizontal volume-at-price histogram of the bars from `anchor` (a date) or over the last
+    `period` (bars or a duration), drawn against the right edge of the price axis over `width` of
+    the plot, with the point of control and the value area edges over the anchored window.
+    A horizontal line marks `anchor_price` when one is given. `df` is not modified.
+    """
+    profile, start = anchored_volume_profile(df, anchor, period, bins, bin_size)
+    low, high = profile.value_area(value_area)
+    centers = profile.centers
+    inside = (centers >= low) & (centers <= high)
 
-import plotly.graph_objects as go
-
-def add_anchored_volume_profile(fig, df, anchor_price, period=20):
-    # Calculate volume profile
-    df['PriceBin'] = pd.cut(df['Close'], bins=20)  # Adjust bins as needed
-    volume_profile = df.groupby('PriceBin')['Volume'].sum()
-
-    # Create bar trace for volume profile
     fig.add_trace(go.Bar(
-        x=volume_profile.index.astype(str),  # Convert intervals to strings for plotting
-        y=volume_profile.values,
-        yaxis='y2',  # Use a secondary y-axis
+        x=profile.volumes,
+        y=centers,
+        orientation='h',
+        width=profile.bin_size * 0.9,
+        xaxis='x2',
         name='Volume Profile',
         opacity=0.5,
-        marker=dict(color='lightblue')
+        marker=dict(color=np.where(inside, 'steelblue', 'lightblue')),
     ))
 
-    # Add a vertical line at the anchor price
-    fig.add_shape(go.layout.Shape(
-        type="line",
-        x0=anchor_price,
-        x1=anchor_price,
-        y0=0,
-        y1=1,
-        xref="x",
-        yref="paper",
-        line=dict(color="red", width=2)
+    window_x = [df.index[start], df.index[-1]]
+    fig.add_trace(go.Scatter(
+        x=window_x, y=[profile.point_of_control()] * 2, mode='lines',
+        line=dict(color='red', width=2), name='Point of Control'
+    ))
+    fig.add_trace(go.Scatter(
+        x=window_x + [None] + window_x, y=[high, high, None, low, low], mode='lines',
+        line=dict(color='steelblue', dash='dot'), name=f'Value Area {value_area:.0%}'
     ))
+    if anchor_price is not None:
+        fig.add_trace(go.Scatter(
+            x=[df.index[0], df.index[-1]], y=[anchor_price] * 2, mode='lines',
+            line=dict(color='red', dash='dash'), name=f'Anchor Price @ {anchor_price:.2f}'
+        ))
 
-    # Update layout for secondary y-axis
+    # The profile gets an axis of its own, reversed so the bars grow from the right edge
     fig.update_layout(
-        yaxis2=dict(
-            title='Volume',
-            overlaying='y',
-            side='right',
-            showgrid=False
+        xaxis2=dict(
+            overlaying='x',
+            side='top',
+            range=[(profile.volumes.max() or 1.0) / width, 0],
+            visible=False,
         )
     )
 
@@ -45,12 +80,7 @@ def add_anchored_volume_profile(fig, df, anchor_price, period=20):
 
 def add_open_shape_indicator(fig, spike_days):
     spike_dates, spike_prices = zip(*spike_days) if spike_days else ([], [])
-    fig.add_trace(go.Scatter(
-        x=spike_dates, y=spike_prices, mode='markers',
-        marker=dict(symbol='circle-open', size=15, color='black', line=dict(width=2)),  # Customize as needed
-        name='Volume & Price Spike'
-    ))
-    return fig
+    return _add_markers(fig, spike_dates, spike_prices, SPIKE)
 
 
 # plot_helpers.py - add_sequence_stars function
@@ -79,9 +109,70 @@ def plot_intersection_marker(fig, date_intersect, y_intersect):
             name=f"Intersection Circle {i}",
         ))
 
-def create_candlestick_chart(df):
+def aggregate_ohlc(df, max_bars=MAX_CANDLES):
+    """
+    Merges runs of consecutive bars into at most `max_bars` coarser candles (labelled by their first bar).
+    """
+    n = len(df)
+    step = -(-n // max_bars)  # Ceiling division
+    if step <= 1:
+        return df
+    starts = np.arange(0, n, step)
+    ends = np.append(starts[1:], n) - 1
+    return pd.DataFrame({
+        'Open': df['Open'].values[starts],
+        'High': np.fmax.reduceat(df['High'].values, starts),
+        'Low': np.fmin.reduceat(df['Low'].values, starts),
+        'Close': df['Close'].values[ends],
+        'Volume': np.add.reduceat(np.nan_to_num(df['Volume'].values), starts),
+    }, index=df.index[starts])
+
+def downsample_indices(y, n_out=LINE_POINTS):
+    """
+    Positions to keep when drawing `y` with about `n_out` points: the first and last point plus the
+    minimum and maximum of every bucket, so peaks and troughs survive (min/max decimation).
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    n_buckets = max(n_out // 2, 1)
+    if n <= n_out:
+        return np.arange(n)
+
+    size = -(-n // n_buckets)
+    padded = np.full(size * n_buckets, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+
+    # NaN never wins; an all-NaN bucket falls back to its first position
+    lows = np.where(np.isnan(buckets), np.inf, buckets).argmin(axis=1) + offsets
+    highs = np.where(np.isnan(buckets), -np.inf, buckets).argmax(axis=1) + offsets
+    keep = np.unique(np.concatenate([[0, n - 1], lows, highs]))
+    return keep[keep < n]
+
+def use_webgl(fig):
+    """
+    Returns a copy of the figure with every Scatter trace drawn as Scattergl.
+    """
+    traces = [
+        go.Scattergl({key: value for key, value in trace.to_plotly_json().items() if key != 'type'})
+        if isinstance(trace, go.Scatter) else trace
+        for trace in fig.data
+    ]
+    return go.Figure(data=traces, layout=fig.layout)
+
+def _is_large(df, render_mode):
+    if render_mode not in ('auto', 'full', 'large'):
+        raise ValueError(f"Unknown render mode: {render_mode!r}")
+    return render_mode == 'large' or (render_mode == 'auto' and len(df) > LARGE_DATA_THRESHOLD)
+
+def create_candlestick_chart(df, max_candles=None):
     fig = go.Figure()
 
+    # Coarser candles for very long histories
+    if max_candles is not None:
+        df = aggregate_ohlc(df, max_candles)
+
     # Add volume trace as a bar chart with conditional coloring
     fig.add_trace(go.Bar(
         x=df.index,
@@ -118,27 +209,29 @@ def create_candlestick_chart(df):
     return fig
 
 
-def add_moving_averages(fig, df):
-    for ma in ['SMA_10', 'SMA_20', 'SMA_50', 'SMA_100', 'SMA_200']:
-        if ma in df.columns:
-            fig.add_trace(go.Scatter(x=df.index, y=df[ma], mode='lines', name=ma))
+def add_moving_averages(fig, df, max_points=None, mas=TOUCH_MAS, ma_values=None):
+    """
+    One line per moving average: the columns of the (bars x MAs) `ma_values` array, or by default
+    the averages in `mas` that df holds.
+    """
+    if ma_values is None:
+        mas = [ma for ma in mas if ma in df.columns]
+        ma_values = ma_matrix(df, mas)
+    for i, ma in enumerate(mas):
+        x, y = df.index, ma_values[:, i]
+        if max_points is not None:
+            keep = downsample_indices(y, max_points)
+            x, y = x[keep], y[keep]
+        fig.add_trace(go.Scatter(x=x, y=y, mode='lines', name=ma))
     return fig
 
 def add_buy_signals(fig, buy_signals):
     buy_dates, buy_prices = zip(*buy_signals) if buy_signals else ([], [])
-    fig.add_trace(go.Scatter(
-        x=buy_dates, y=buy_prices, mode='markers', marker=dict(symbol='triangle-up', size=10, color='green'),
-        name='Buy Signals'
-    ))
-    return fig
+    return _add_markers(fig, buy_dates, buy_prices, BUY)
 
 def add_sell_signals(fig, sell_signals):
     sell_dates, sell_prices = zip(*sell_signals) if sell_signals else ([], [])
-    fig.add_trace(go.Scatter(
-        x=sell_dates, y=sell_prices, mode='markers', marker=dict(symbol='triangle-down', size=10, color='red'),
-        name='Sell Signals'
-    ))
-    return fig
+    return _add_markers(fig, sell_dates, sell_prices, SELL)
 
 def add_fibonacci_levels(fig, fib_levels, df):
     # Define the typical Fibonacci percentage levels and their colors
@@ -248,32 +341,17 @@ def add_deviation_bandsOriginal(fig, deviations, df):
 def add_wick_touches(fig, wick_touches):
     wick_x = [date for date, (level, price) in wick_touches]
     wick_y = [price for date, (level, price) in wick_touches]
-    fig.add_trace(go.Scatter(
-        x=wick_x, y=wick_y, mode='markers',
-        marker=dict(symbol='x', color='blue', size=8),
-        name='Wick Touches'
-    ))
-    return fig
+    return _add_markers(fig, wick_x, wick_y, WICK_TOUCH)
 
 def add_fib_wick_touches(fig, fib_wick_touches):
     fib_wick_x = [date for date, (level, price) in fib_wick_touches]
     fib_wick_y = [price for date, (level, price) in fib_wick_touches]
-    fig.add_trace(go.Scatter(
-        x=fib_wick_x, y=fib_wick_y, mode='markers',
-        marker=dict(symbol='circle', color='purple', size=6),
-        name='Fib Wick Touches'
-    ))
-    return fig
+    return _add_markers(fig, fib_wick_x, fib_wick_y, FIB_WICK_TOUCH)
 
 def add_ma_touches(fig, ma_touches):
     ma_x = [date for date, (ma, price) in ma_touches]
     ma_y = [price for date, (ma, price) in ma_touches]
-    fig.add_trace(go.Scatter(
-        x=ma_x, y=ma_y, mode='markers',
-        marker=dict(symbol='cross', color='black', size=8),
-        name='MA Touches'
-    ))
-    return fig
+    return _add_markers(fig, ma_x, ma_y, MA_TOUCH)
 
 def finalize_layout(fig, ticker):
     fig.update_layout(
@@ -289,10 +367,11 @@ def plot_signals_with_candlestick_refactored(
     df, buy_signals, sell_signals, fib_levels,
     wick_touches, fib_wick_touches, ma_touches,
     sequence_stars, slope, intercept, ticker, deviations, touched_devs,
-    spike_days
+    spike_days, render_mode='auto'
 ):
-    fig = create_candlestick_chart(df)
-    add_moving_averages(fig, df)
+    large = _is_large(df, render_mode)
+    fig = create_candlestick_chart(df, max_candles=MAX_CANDLES if large else None)
+    add_moving_averages(fig, df, max_points=LINE_POINTS if large else None)
     add_buy_signals(fig, buy_signals)
     add_sell_signals(fig, sell_signals)
     add_fibonacci_levels(fig, fib_levels, df)
@@ -307,8 +386,72 @@ def plot_signals_with_candlestick_refactored(
     add_fib_wick_touches(fig, fib_wick_touches)
     add_ma_touches(fig, ma_touches)
     finalize_layout(fig, ticker)
+    return use_webgl(fig) if large else fig
+
+
+def add_event_markers(fig, events, kind):
+    """
+    Adds one event type from a SignalEvents store as a marker trace.
+    """
+    part = events.select(kind)
+    return _add_markers(fig, part.dates, part.prices, kind)
+
+def add_event_sequence_stars(fig, events):
+    for kind, color in ((GREEN_STAR, 'green'), (RED_STAR, 'red')):
+        stars = events.select(kind)
+        if not len(stars):
+            continue
+        fig.add_trace(go.Scatter(
+            x=stars.dates, y=stars.prices, mode='markers',
+            marker=dict(symbol='star', size=stars.sizes, color=color),
+            name=f'{color.capitalize()} Stars'
+        ))
     return fig
 
+def add_timeframe_events(fig, events, timeframe, kinds=(WICK_TOUCH, FIB_WICK_TOUCH, MA_TOUCH)):
+    """
+    Overlays events of a higher timeframe, placed on this chart's bars (MultiTimeframe.aligned_events),
+    with enlarged markers named after the timeframe, e.g. 'W Wick Touches'. The same events also fit
+    the tuple arguments of plot_signals_with_candlestick_refactored through `events.to_tuples(kind)`.
+    """
+    for kind in kinds:
+        part = events.select(kind)
+        if not len(part):
+            continue
+        style = EVENT_MARKERS[kind]
+        marker = dict(style['marker'], size=style['marker'].get('size', 8) * 2)
+        fig.add_trace(go.Scatter(
+            x=part.dates, y=part.prices, mode='markers', marker=marker,
+            name=f"{timeframe} {style['name']}", text=part.level_labels(),
+        ))
+    return fig
+
+def plot_signals_from_events(df, events, fib_levels, slope, intercept, ticker, deviations, render_mode='auto',
+                             mas=TOUCH_MAS, ma_values=None):
+    """
+    plot_signals_with_candlestick_refactored for a SignalEvents store: the markers are taken
+    straight from its columns instead of being unpacked from tuples.
+
+    render_mode 'large' (or 'auto' above LARGE_DATA_THRESHOLD bars) aggregates the candles,
+    decimates the moving averages and switches to WebGL traces; signal markers stay exact.
+    `mas` and `ma_values` select the moving-average lines as in add_moving_averages.
+    """
+    large = _is_large(df, render_mode)
+    fig = create_candlestick_chart(df, max_candles=MAX_CANDLES if large else None)
+    add_moving_averages(fig, df, max_points=LINE_POINTS if large else None, mas=mas, ma_values=ma_values)
+    add_event_markers(fig, events, BUY)
+    add_event_markers(fig, events, SELL)
+    add_fibonacci_levels(fig, fib_levels, df)
+    add_event_sequence_stars(fig, events)
+    add_linear_regression(fig, slope, intercept, df)
+    add_event_markers(fig, events, SPIKE)
+    add_deviation_bands(fig, deviations, df, events.touched_levels(WICK_TOUCH))
+    add_event_markers(fig, events, WICK_TOUCH)
+    add_event_markers(fig, events, FIB_WICK_TOUCH)
+    add_event_markers(fig, events, MA_TOUCH)
+    finalize_layout(fig, ticker)
+    return use_webgl(fig) if large else fig
+
 
 def plot_signals_with_candlestick_refactoredBroken(
     df, buy_signals, sell_signals, fib_levels,
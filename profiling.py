@@ -0,0 +1,170 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from datetime import datetime
+
+# Set TENEBRIS_PROFILE=1 (or one of PROFILE_MODES) to profile runs without changing any call site
+PROFILE_ENV_VAR = 'TENEBRIS_PROFILE'
+
+# Stage timings only, plus a cProfile capture, or plus tracemalloc peaks
+PROFILE_MODES = ('stages', 'cprofile', 'memory')
+
+
+class _NullStage:
+    """
+    Stand-in returned by a disabled profiler: entering, leaving and noting cost a method call each.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def note(self, **values):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, profiler, name, values):
+        self.profiler = profiler
+        self.record = {'stage': name, **values}
+
+    def __enter__(self):
+        if self.profiler.memory:
+            tracemalloc.reset_peak()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record['wall_seconds'] = time.perf_counter() - self._wall
+        self.record['cpu_seconds'] = time.process_time() - self._cpu
+        if self.profiler.memory:
+            self.record['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        if exc_type is not None:
+            self.record['error'] = f"{exc_type.__name__}: {exc}"
+        self.profiler.stages.append(self.record)
+        return False
+
+    def note(self, **values):
+        """
+        Attaches extra figures to the stage record (row counts, traces added, ...).
+        """
+        self.record.update(values)
+
+
+class RunProfiler:
+    """
+    Per-run stage timer with optional cProfile and tracemalloc capture.
+
+    Disabled by default (unless TENEBRIS_PROFILE is set, its 'cprofile' or 'memory' value turning
+    on that capture too); a disabled profiler hands out a shared no-op stage so instrumented code
+    pays almost nothing.
+    """
+
+    def __init__(self, enabled=None, cprofile=False, memory=False):
+        if enabled is None:
+            mode = os.environ.get(PROFILE_ENV_VAR, '')
+            enabled = mode not in ('', '0')
+            cprofile = cprofile or mode == 'cprofile'
+            memory = memory or mode == 'memory'
+        self.enabled = enabled
+        self.cprofile = enabled and cprofile
+        self.memory = enabled and memory
+        self.stages = []
+        self._profile = None
+        self._started = None
+
+    def start(self):
+        if not self.enabled:
+            return self
+        self._started = (time.perf_counter(), time.process_time())
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.cprofile:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def stop(self):
+        if not self.enabled:
+            return self
+        if self._profile is not None:
+            self._profile.disable()
+        if self.memory and tracemalloc.is_tracing():
+            self._peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self._elapsed = (time.perf_counter() - self._started[0], time.process_time() - self._started[1])
+        return self
+
+    def stage(self, name, **values):
+        """
+        Context manager timing one stage; `values` (e.g. rows=len(df)) are stored with it.
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, values)
+
+    def timed(self, name=None):
+        """
+        Decorator form of `stage`.
+        """
+        def decorator(func):
+            stage_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(stage_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def report(self, **run_info):
+        report = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            **run_info,
+            'stages': self.stages,
+        }
+        if getattr(self, '_elapsed', None):
+            report['wall_seconds'], report['cpu_seconds'] = self._elapsed
+        if getattr(self, '_peak_memory', None) is not None:
+            report['peak_memory_bytes'] = self._peak_memory
+        if self._profile is not None:
+            report['top_functions'] = _top_functions(self._profile)
+        return report
+
+    def write_report(self, directory, ticker, **run_info):
+        """
+        Writes `{ticker}_run_profile.json` (and the raw cProfile stats, if captured) into `directory`.
+        Returns the report path, or None when profiling is disabled.
+        """
+        if not self.enabled:
+            return None
+        path = os.path.join(directory, f"{ticker}_run_profile.json")
+        with open(path, 'w') as f:
+            json.dump(self.report(ticker=ticker, **run_info), f, indent=2, default=str)
+        if self._profile is not None:
+            self._profile.dump_stats(os.path.join(directory, f"{ticker}_run_profile.prof"))
+        print(f"Run profile saved to {path}")
+        return path
+
+
+def _top_functions(profile, limit=25):
+    stats = pstats.Stats(profile, stream=io.StringIO()).sort_stats('cumulative')
+    rows = []
+    for (filename, line, func), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}({func})",
+            'calls': calls, 'total_seconds': total, 'cumulative_seconds': cumulative,
+        })
+    rows.sort(key=lambda row: row['cumulative_seconds'], reverse=True)
+    return rows[:limit]
@@ -0,0 +1,242 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from async_fetch import download_many
+from data_retrieval import OHLCV_COLUMNS, OHLCVCache
+from events import EVENT_NAMES, FIB_WICK_TOUCH, GREEN_STAR, MA_TOUCH, RED_STAR, WICK_TOUCH
+from geometry import DEVIATION_SIGMAS, band_offsets, deviation_band_names
+from moving_averages import compute_moving_averages
+from signals import TOUCH_MAS, band_crossings, fib_level_hits, fibonacci_levels, ma_touch_hits, run_lengths
+
+
+class Panel:
+    """
+    OHLCV data of a whole universe in one (dates x tickers x fields) float array.
+
+    Dates are the union of every ticker's dates; a ticker without a bar on a date has NaN there.
+    tz-aware indexes are compared on their local wall-clock dates, so exchanges in different time
+    zones line up on the same trading days.
+    """
+
+    def __init__(self, dates, tickers, values, fields=OHLCV_COLUMNS):
+        self.dates = pd.DatetimeIndex(dates)
+        self.tickers = list(tickers)
+        self.fields = list(fields)
+        self.values = values
+
+    @classmethod
+    def from_frames(cls, frames, fields=OHLCV_COLUMNS):
+        """
+        Builds the panel from a {ticker: OHLCV DataFrame} mapping.
+        """
+        frames = {ticker: _wall_clock(df) for ticker, df in frames.items()}
+        dates = pd.DatetimeIndex([], name='Date')
+        for df in frames.values():
+            dates = dates.union(df.index)
+
+        values = np.full((len(dates), len(frames), len(fields)), np.nan)
+        for column, df in enumerate(frames.values()):
+            rows = dates.get_indexer(df.index)
+            values[rows, column, :] = df[fields].values
+        return cls(dates, frames.keys(), values, fields)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def field(self, name):
+        """
+        (dates x tickers) view of one field.
+        """
+        return self.values[:, :, self.fields.index(name)]
+
+    def frame(self, ticker):
+        """
+        The OHLCV DataFrame of one ticker (its own bars only).
+        """
+        df = pd.DataFrame(self.values[:, self.tickers.index(ticker), :], index=self.dates, columns=self.fields)
+        return df[df['Close'].notna()]
+
+    def right_aligned(self):
+        """
+        Each ticker's own bars moved to the bottom of its column, oldest first, with NaN padding above.
+
+        Row -1 then holds every ticker's latest bar and row -k its k-th latest, so rolling windows
+        along axis 0 see exactly the bars the single-ticker pipeline sees, whatever the gaps and
+        history lengths in the union calendar. Returns (dates, values): a (rows x tickers)
+        datetime64 array and a (rows x tickers x fields) array.
+        """
+        present = ~np.isnan(self.field('Close'))
+        # A stable sort on the presence flag keeps the bars in date order below the missing rows
+        order = np.argsort(present, axis=0, kind='stable')
+        values = np.take_along_axis(self.values, order[:, :, None], axis=0)
+        dates = self.dates.values[order]
+        values[~np.take_along_axis(present, order, axis=0)] = np.nan
+        return dates, values
+
+
+def _wall_clock(df):
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    if df.index.tz is not None:
+        df = df.tz_localize(None)
+    return df
+
+
+def load_panel(tickers, period="1y", start=None, end=None, cache=None, provider=None, **fetcher_options):
+    """
+    Downloads (or reads from the cache) every ticker concurrently and aligns them into a Panel.
+    Tickers that fail to load or return no data are reported and left out. `fetcher_options`
+    (max_concurrency, rate, retries, ...) go to async_fetch.AsyncFetcher.
+    """
+    results = download_many(tickers, period, start, end, cache=cache, provider=provider, **fetcher_options)
+    frames = {}
+    for ticker, df in results.items():
+        if isinstance(df, Exception):
+            print(f"Skipping {ticker}: {type(df).__name__}: {df}")
+        elif df.empty:
+            print(f"Skipping {ticker}: no data")
+        else:
+            frames[ticker] = df
+    return Panel.from_frames(frames)
+
+
+def _left_aligned(values, counts):
+    """
+    Right-aligned rows rolled so each ticker's `counts` bars start at row 0, the NaN padding below.
+    """
+    rows = (np.arange(len(values))[:, None] + (len(values) - counts)[None, :]) % len(values)
+    return np.take_along_axis(values, rows, axis=0)
+
+
+def _regression_bands(close, length, sigmas=DEVIATION_SIGMAS):
+    """
+    Band levels on the latest bar of every ticker, from a regression over its last `length` closes
+    (tickers x bands), as calculate_linear_regression_and_deviations computes them per ticker.
+    """
+    window = close[-length:]
+    x = np.arange(length, dtype=float) - (length - 1) / 2
+    mean_y = window.mean(axis=0)
+    slope = (x[:, None] * (window - mean_y)).sum(axis=0) / (x * x).sum()
+    fitted = mean_y[None, :] + slope[None, :] * x[:, None]
+    std_dev = (window - fitted).std(axis=0)
+    return fitted[-1][:, None] + band_offsets(sigmas)[None, :] * std_dev[:, None]
+
+
+def screen(panel, len_regression=144, mas=TOUCH_MAS):
+    """
+    Latest-bar signals of every ticker in the panel, using the definitions of signals.py:
+
+    - Wick Touch: the wick crossed a regression deviation band (detect_wick_touches)
+    - Fib Wick Touch: the range spans a Fibonacci level of the period (detect_fib_wick_touches)
+    - MA Touch: the body spans a moving average (detect_body_ma_touches)
+    - Green/Red Star: the bar extends an up/down streak to 2+ bars (detect_consecutive_days),
+      with the streak length in `Size`
+
+    Every computation runs over all tickers at once on the right-aligned panel. Returns one row
+    per hit (Ticker, Date, Signal, Level, Price, Close, Size), tickers with the most hits first;
+    filter it for a given screen, e.g. `hits[(hits.Signal == 'Wick Touch') & (hits.Level == 'lower_2')]`.
+    """
+    dates, values = panel.right_aligned()
+    field = {name: values[:, :, i] for i, name in enumerate(panel.fields)}
+    open_, high, low, close = field['Open'], field['High'], field['Low'], field['Close']
+    n_rows, n_tickers = close.shape
+    tickers = np.array(panel.tickers, dtype=object)
+    parts = []
+
+    def add(kind, ticker_idx, level, price, size=None):
+        if len(ticker_idx) == 0:
+            return
+        parts.append(pd.DataFrame({
+            'Ticker': tickers[ticker_idx],
+            'Date': pd.DatetimeIndex(dates[-1, ticker_idx]),
+            'Signal': EVENT_NAMES[kind],
+            'Level': level,
+            'Price': price,
+            'Close': close[-1, ticker_idx],
+            'Size': np.nan if size is None else size,
+        }))
+
+    if n_rows >= 2:
+        # Regression bands (tickers with fewer than len_regression + 1 bars are skipped)
+        if n_rows > len_regression:
+            bands = _regression_bands(close, len_regression)
+            hits = band_crossings(high[-1], low[-1], high[-2], low[-2], bands)
+            hits &= ~np.isnan(close[-len_regression - 1])[:, None]
+            ticker_idx, band_idx = np.nonzero(hits)
+            names = np.array(deviation_band_names(), dtype=object)
+            add(WICK_TOUCH, ticker_idx, names[band_idx], bands[ticker_idx, band_idx])
+
+        # Fibonacci levels span each ticker's highest high and lowest low of the period
+        with np.errstate(invalid='ignore'):
+            levels = fibonacci_levels(np.nanmax(high, axis=0), np.nanmin(low, axis=0))
+        ticker_idx, level_idx = np.nonzero(fib_level_hits(high[-1], low[-1], levels))
+        # Python's round on floats, like the per-ticker detector
+        touched = [float(level) for level in levels[ticker_idx, level_idx]]
+        add(FIB_WICK_TOUCH, ticker_idx, [round(level, 3) for level in touched], [round(level, 2) for level in touched])
+
+        # Body touches of the moving averages, all computed in one pass of the MA engine over each
+        # ticker's own bars from its first one, so the averages equal the single-ticker ones
+        counts = (~np.isnan(close)).sum(axis=0)
+        volume = _left_aligned(field['Volume'], counts) if any(name.startswith('VWMA') for name in mas) else None
+        ma_values = compute_moving_averages(_left_aligned(close, counts), mas, volume)
+        latest = ma_values[counts - 1, np.arange(n_tickers)]
+        bars = pd.DataFrame({'Open': open_[-1], 'Close': close[-1]})
+        ticker_idx, ma_idx, prices, names = ma_touch_hits(bars, mas, latest)
+        add(MA_TOUCH, ticker_idx, np.array(names, dtype=object)[ma_idx], prices)
+
+        # Up/down streaks; each ticker's first bar only starts the count
+        with np.errstate(invalid='ignore'):
+            direction = np.sign(close - open_)
+        direction[np.isnan(direction)] = 0
+        first_bar = np.argmax(~np.isnan(close), axis=0)
+        direction[first_bar, np.arange(n_tickers)] = 0
+        streak = run_lengths(direction)[-1]
+        ticker_idx = np.flatnonzero(streak >= 2)
+        up = direction[-1, ticker_idx] > 0
+        for kind, keep in ((GREEN_STAR, up), (RED_STAR, ~up)):
+            add(kind, ticker_idx[keep], None, close[-1, ticker_idx[keep]], streak[ticker_idx[keep]])
+
+    hits = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(
+        columns=['Ticker', 'Date', 'Signal', 'Level', 'Price', 'Close', 'Size'])
+    hits['Hits'] = hits.groupby('Ticker')['Signal'].transform('size')
+    order = np.lexsort((hits.index.values, hits['Ticker'].values.astype(str), -hits['Hits'].values))
+    return hits.iloc[order].reset_index(drop=True)
+
+
+def main(argv=None):
+    from main_plot import parse_date_range, read_watchlist
+
+    parser = argparse.ArgumentParser(description="Screen a universe of tickers for today's signals.")
+    parser.add_argument("tickers", nargs="*", help="Tickers to screen")
+    parser.add_argument("--watchlist", help="File with one ticker per line")
+    parser.add_argument("--period", default="1y",
+                        help="Time period (e.g. '1y') or date range (e.g. '2020-01-02,2021-06-22')")
+    parser.add_argument("--len-regression", type=int, default=144)
+    parser.add_argument("--output", default=None, help="CSV path (default: data/YYYY-MM-DD/screener.csv)")
+    args = parser.parse_args(argv)
+
+    tickers = list(args.tickers)
+    if args.watchlist:
+        tickers += read_watchlist(args.watchlist)
+    if not tickers:
+        parser.error("no tickers given")
+
+    period, start_date, end_date = parse_date_range(args.period)
+    panel = load_panel(tickers, period=period, start=start_date, end=end_date, cache=OHLCVCache())
+    hits = screen(panel, len_regression=args.len_regression)
+
+    output = args.output or os.path.join('data', datetime.now().strftime('%Y-%m-%d'), 'screener.csv')
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    hits.to_csv(output, index=False)
+    print(f"{len(hits)} hits across {hits['Ticker'].nunique()} of {len(panel.tickers)} tickers saved to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
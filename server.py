@@ -0,0 +1,289 @@
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from data_retrieval import OHLCVCache, period_start
+from export import render_figure, start_renderer
+from main_plot import build_chart, compute_signals
+from memo import IndicatorCache
+from profiling import RunProfiler
+
+DEFAULT_PORT = 8765
+
+# Seconds a finished analysis is served again before the bars are looked up anew
+RESULT_TTL = 60
+
+# Analyses kept at most, the least recently used going first
+MAX_RESULTS = 64
+
+ENDPOINTS = ('/summary', '/figure', '/png')
+
+# Yahoo style symbols: AAPL, BRK-B, ^GSPC, EURUSD=X, 7203.T
+TICKER_PATTERN = re.compile(r'\^?[A-Za-z0-9][A-Za-z0-9.=-]{0,19}')
+
+
+class RequestError(ValueError):
+    """
+    A missing or malformed request parameter.
+    """
+
+
+def request_params(query):
+    """
+    The ticker and period of a parsed query string; RequestError when either is missing or malformed.
+    """
+    ticker = query.get('ticker', [''])[0].strip()
+    period = query.get('period', ['1y'])[0].strip() or '1y'
+    if not ticker:
+        raise RequestError("Missing 'ticker' parameter")
+    if not TICKER_PATTERN.fullmatch(ticker):
+        raise RequestError(f"Invalid ticker: {ticker!r}")
+
+    if ',' in period:
+        try:
+            start, end = (pd.Timestamp(bound.strip()) for bound in period.split(','))
+        except ValueError:  # Unparseable dates, or not two of them
+            start = end = pd.NaT
+        if pd.isna(start) or pd.isna(end):
+            raise RequestError(f"Invalid date range: {period!r} (expected 'YYYY-MM-DD,YYYY-MM-DD')")
+        if start >= end:
+            raise RequestError(f"Empty date range: {period!r}")
+    else:
+        try:
+            period_start(period, pd.Timestamp.now())
+        except ValueError as e:
+            raise RequestError(str(e)) from None
+    return ticker, period
+
+
+class AnalysisService:
+    """
+    The state a server keeps warm between requests: one OHLCV cache, one in-memory indicator
+    cache, and the analyses of the last `result_ttl` seconds per (ticker, period), at most
+    `max_results` of them; expired ones are dropped on every request.
+
+    Requests for the same ticker and period wait for each other, so a burst of them downloads and
+    analyzes once; different tickers run side by side. The chart is only built when a figure or an
+    image is asked for.
+    """
+
+    def __init__(self, ohlcv_cache=None, indicator_cache=None, result_ttl=RESULT_TTL, clock=time.monotonic,
+                 max_results=MAX_RESULTS):
+        self.ohlcv_cache = ohlcv_cache or OHLCVCache()
+        self.indicators = indicator_cache or IndicatorCache()
+        self.result_ttl = result_ttl
+        self.clock = clock
+        self.max_results = max_results
+        self._results = OrderedDict()
+        self._locks = {}
+        # Guards _results and _locks; the per-key locks guard the analyses themselves
+        self._locks_lock = threading.Lock()
+        # One image renderer per process: renders are taken in turn
+        self._render_lock = threading.Lock()
+
+    def _lock(self, key):
+        with self._locks_lock:
+            self._prune()
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _prune(self):
+        # Expired and least recently used analyses, then the locks of keys no longer held or analyzed
+        now = self.clock()
+        for key in [key for key, entry in self._results.items() if now - entry['created'] > self.result_ttl]:
+            del self._results[key]
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+        for key in [key for key, lock in self._locks.items() if key not in self._results and not lock.locked()]:
+            del self._locks[key]
+
+    def _analysis(self, ticker, period, profiler, chart=False):
+        key = (ticker.upper(), period)
+        with self._lock(key):
+            with self._locks_lock:
+                entry = self._results.get(key)
+                if entry is not None:
+                    self._results.move_to_end(key)
+            if entry is None or self.clock() - entry['created'] > self.result_ttl:
+                signals = compute_signals(ticker, period, profiler, self.indicators, self.ohlcv_cache)
+                entry = {'created': self.clock(), 'signals': signals, 'fig': None}
+                with self._locks_lock:
+                    self._results[key] = entry
+                    self._prune()
+            if chart and entry['fig'] is None:
+                entry['fig'] = build_chart(ticker, entry['signals'], profiler)
+            return entry
+
+    def summary(self, ticker, period, profiler):
+        """
+        The signal summary as a JSON-ready dict; `events` holds the rows of the summary CSV.
+        """
+        signals = self._analysis(ticker, period, profiler)['signals']
+        df, events = signals['df'], signals['events']
+        with profiler.stage('serialize'):
+            records = json.loads(events.to_frame().to_json(orient='records', date_format='iso'))
+            return {
+                'ticker': ticker.upper(),
+                'period': period,
+                'rows': len(df),
+                'latest_date': signals['latest_date'],
+                'close': float(signals['current_price']),
+                'events': records,
+            }
+
+    def figure(self, ticker, period, profiler):
+        """
+        The chart as plotly JSON.
+        """
+        fig = self._analysis(ticker, period, profiler, chart=True)['fig']
+        with profiler.stage('serialize'):
+            return fig.to_json()
+
+    def image(self, ticker, period, profiler, fmt='png'):
+        """
+        The chart rendered to `fmt` bytes, laid out like the saved plots.
+        """
+        fig = self._analysis(ticker, period, profiler, chart=True)['fig']
+        with self._render_lock, profiler.stage('render'):
+            return render_figure(fig, fmt)
+
+
+class AnalysisHandler(BaseHTTPRequestHandler):
+    """
+    GET endpoints, each taking `ticker` and `period` ('1y' by default, or 'YYYY-MM-DD,YYYY-MM-DD'):
+
+    - /summary: the signal summary as JSON
+    - /figure: the chart as plotly JSON
+    - /png: the chart as a PNG image
+    - /health: liveness check
+
+    A missing or malformed parameter is answered with 400, an analysis that cannot run on the bars
+    (too few of them, none at all) with 422 and any other failure with 500. Every response carries
+    a Server-Timing header with the wall time of each analysis stage and of the whole request, in
+    milliseconds.
+    """
+
+    server_version = 'tenebris'
+
+    def do_GET(self):
+        started = time.perf_counter()
+        profiler = RunProfiler(enabled=True)
+        url = urlparse(self.path)
+        service = self.server.service
+
+        try:
+            if url.path == '/health':
+                status, body, content_type = 200, _json({'status': 'ok'}), 'application/json'
+            elif url.path not in ENDPOINTS:
+                status, body, content_type = 404, _json({'error': f"Unknown endpoint: {url.path}"}), 'application/json'
+            else:
+                ticker, period = request_params(parse_qs(url.query))
+                if url.path == '/summary':
+                    status, body, content_type = 200, _json(service.summary(ticker, period, profiler)), 'application/json'
+                elif url.path == '/figure':
+                    status, body, content_type = 200, service.figure(ticker, period, profiler).encode(), 'application/json'
+                else:
+                    status, body, content_type = 200, service.image(ticker, period, profiler), 'image/png'
+        except RequestError as e:
+            status, body, content_type = 400, _json({'error': str(e)}), 'application/json'
+        except ValueError as e:
+            # Valid request the analysis cannot run on, such as a ticker with too few bars
+            status, body, content_type = 422, _json({'error': str(e)}), 'application/json'
+        except Exception as e:
+            status, body, content_type = 500, _json({'error': f"{type(e).__name__}: {e}"}), 'application/json'
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Server-Timing', server_timing(profiler.stages, time.perf_counter() - started))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def _json(value):
+    return json.dumps(value).encode()
+
+
+def server_timing(stages, total_seconds):
+    """
+    Server-Timing header value: `name;dur=milliseconds` per stage, then the request total.
+    """
+    entries = [f"{stage['stage']};dur={stage['wall_seconds'] * 1000:.1f}" for stage in stages]
+    entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ', '.join(entries)
+
+
+class AnalysisServer(HTTPServer):
+    """
+    HTTP server answering requests on a pool of `workers` threads that share one AnalysisService.
+    """
+
+    def __init__(self, address, service=None, workers=4, quiet=False):
+        super().__init__(address, AnalysisHandler)
+        self.service = service or AnalysisService()
+        self.quiet = quiet
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the analysis over HTTP from a warm process.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=4, help="Number of request threads")
+    parser.add_argument("--cache-dir", default="cache", help="OHLCV cache directory")
+    parser.add_argument("--ttl", type=float, default=RESULT_TTL, help="Seconds an analysis is reused")
+    parser.add_argument("--quiet", action="store_true", help="Do not log every request")
+    args = parser.parse_args(argv)
+
+    # The analysis imports these on first use; a warm server pays for them before the first request
+    import plot_helpers
+    import scipy.signal
+    import yfinance
+    start_renderer()
+    service = AnalysisService(
+        ohlcv_cache=OHLCVCache(directory=args.cache_dir),
+        indicator_cache=IndicatorCache(directory=os.path.join(args.cache_dir, 'indicators')),
+        result_ttl=args.ttl,
+    )
+    server = AnalysisServer((args.host, args.port), service, workers=args.workers, quiet=args.quiet)
+    print(f"Serving on http://{args.host}:{server.server_port} "
+          f"(/summary, /figure, /png?ticker=AAPL&period=1y)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+import glob
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from events import EVENT_NAMES
+
+DEFAULT_PATH = os.path.join('data', 'signals.db')
+
+_DAY_NS = 86_400 * 10 ** 9
+# Day 0 (1970-01-01) is a Thursday: shifting by 3 days starts the weeks on Mondays
+_WEEK_SHIFT = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS signals (
+    code INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS events (
+    ticker TEXT NOT NULL,
+    date INTEGER NOT NULL,    -- wall-clock time of the bar, nanoseconds since 1970-01-01
+    week INTEGER NOT NULL,    -- Monday-based week number of `date`
+    signal INTEGER NOT NULL REFERENCES signals (code),
+    level TEXT NOT NULL,      -- band, Fibonacci level or moving average; '' if the event has none
+    price REAL NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (ticker, date, signal, level)
+) WITHOUT ROWID;
+"""
+
+_INDEX = 'CREATE INDEX IF NOT EXISTS events_by_signal ON events (signal, level, week, ticker)'
+
+_UPSERT = """
+INSERT INTO events (ticker, date, week, signal, level, price, size) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (ticker, date, signal, level) DO UPDATE SET price = excluded.price, size = excluded.size
+"""
+
+
+def _wall_ns(dates):
+    dates = pd.DatetimeIndex(dates)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    return dates.values.astype('datetime64[ns]').view(np.int64)
+
+
+def _weeks(ns):
+    return (ns // _DAY_NS + _WEEK_SHIFT) // 7
+
+
+def _week_start(weeks):
+    return pd.to_datetime((np.asarray(weeks, dtype=np.int64) * 7 - _WEEK_SHIFT) * _DAY_NS)
+
+
+def _signal_code(name):
+    try:
+        return EVENT_NAMES.index(name)
+    except ValueError:
+        raise ValueError(f"Unknown signal: {name!r} (expected one of {', '.join(EVENT_NAMES)})") from None
+
+
+def _level_text(level):
+    return '' if level is None or (isinstance(level, float) and np.isnan(level)) else str(level)
+
+
+class SignalDB:
+    """
+    SQLite store of the events of every run, one row per (ticker, date, signal, level).
+
+    Ingesting a run again upserts its events, so reruns and overlapping periods never duplicate
+    rows. Dates are stored as wall-clock nanoseconds with their Monday-based week, and an index on
+    (signal, level, week, ticker) answers cross-ticker questions from the index alone, such as
+    which tickers had a lower_1.5 wick touch and an SMA_200 touch in the same week (same_week).
+    Backfills of many tickers should run inside `bulk_load`.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, timeout=60):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Batch workers write from several processes: wait for the lock instead of failing
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+            self.connection.execute(_INDEX)
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO signals (code, name) VALUES (?, ?)', enumerate(EVENT_NAMES),
+            )
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def bulk_load(self):
+        """
+        Context for large backfills: the signal index is dropped while ingesting and rebuilt in
+        one sorted pass at the end, instead of being updated at random places for every row.
+        """
+        self.connection.execute('DROP INDEX IF EXISTS events_by_signal')
+        try:
+            yield self
+        finally:
+            with self.connection:
+                self.connection.execute(_INDEX)
+
+    def ingest(self, ticker, events):
+        """
+        Upserts every event of a SignalEvents store in one transaction. Returns the number of rows.
+        """
+        levels = [_level_text(level) for level in events.level_labels()]
+        return self._upsert(ticker, _wall_ns(events.dates), events.kinds, levels, events.prices, events.sizes)
+
+    def ingest_summary(self, ticker, summary):
+        """
+        Upserts the rows of a detailed summary table (as written to the summary CSV files).
+        """
+        # The wall-clock part of the dates, whatever UTC offset they were written with
+        dates = pd.to_datetime(summary['Date'].astype(str).str.slice(0, 19))
+        kinds = np.array([_signal_code(name) for name in summary['Signal']], dtype=np.int64)
+        level = summary['Level'] if 'Level' in summary else pd.Series(np.nan, index=summary.index)
+        if 'MA' in summary:
+            level = level.where(level.notna(), summary['MA'])
+        sizes = summary['Size'].fillna(0).astype(int) if 'Size' in summary else np.zeros(len(summary), dtype=int)
+        return self._upsert(
+            ticker, _wall_ns(dates), kinds, [_level_text(value) for value in level.astype(object)],
+            summary['Price'].values, np.asarray(sizes),
+        )
+
+    def ingest_summary_files(self, root='data'):
+        """
+        Backfills the store from every `<root>/<day>/<ticker>/<ticker>_detailed_signal_summary.csv`.
+        Returns the number of files read.
+        """
+        paths = sorted(glob.glob(os.path.join(root, '*', '*', '*_detailed_signal_summary.csv*')))
+        with self.bulk_load():
+            for path in paths:
+                ticker = os.path.basename(path).split('_detailed_signal_summary')[0]
+                self.ingest_summary(ticker, pd.read_csv(path))
+        return len(paths)
+
+    def _upsert(self, ticker, ns, kinds, levels, prices, sizes):
+        ns, kinds = np.asarray(ns, dtype=np.int64), np.asarray(kinds, dtype=np.int64)
+        levels = np.asarray(levels, dtype=object)
+        # Rows in primary key order append to the table's B-tree instead of splitting pages all over it
+        order = np.lexsort((levels, kinds, ns))
+        ns = ns[order]
+        rows = zip(
+            [ticker.upper()] * len(ns), ns.tolist(), _weeks(ns).tolist(), kinds[order].tolist(),
+            levels[order].tolist(), np.asarray(prices, dtype=float)[order].tolist(),
+            np.asarray(sizes, dtype=np.int64)[order].tolist(),
+        )
+        with self.connection:
+            self.connection.executemany(_UPSERT, rows)
+        return len(ns)
+
+    def events(self, ticker=None, signal=None, level=None, start=None, end=None):
+        """
+        Stored events as a frame (Ticker, Date, Signal, Level, Price, Size), filtered by ticker,
+        signal name(s), level and a [start, end) date range; sorted by ticker and date.
+        """
+        where, params = self._filters(signal, level, start, end)
+        if ticker is not None:
+            where.append('e.ticker = ?')
+            params.append(ticker.upper())
+        query = (
+            'SELECT e.ticker AS Ticker, e.date AS Date, s.name AS Signal, e.level AS Level, '
+            'e.price AS Price, e.size AS Size FROM events e JOIN signals s ON s.code = e.signal'
+            + (' WHERE ' + ' AND '.join(where) if where else '')
+            + ' ORDER BY e.ticker, e.date, e.signal'
+        )
+        frame = pd.read_sql_query(query, self.connection, params=params)
+        frame['Date'] = pd.to_datetime(frame['Date'].astype(np.int64))
+        return frame
+
+    def same_week(self, *conditions, start=None, end=None):
+        """
+        (Ticker, Week) pairs where every condition occurred within one Monday-based week. Each
+        condition is a (signal, level) pair; a level of None matches any level. `Week` is the
+        Monday starting the week.
+        """
+        if not conditions:
+            raise ValueError("same_week needs at least one (signal, level) condition")
+        conditions = [(signal, level) for signal, level in conditions]
+        if len(conditions) > 1:
+            # The rarest condition drives the search; the others are checked with one lookup per
+            # (ticker, week) it yields, instead of building full sets to intersect
+            counts = []
+            for signal, level in conditions:
+                where, values = self._filters(signal, level, start, end)
+                counts.append(self.connection.execute(
+                    'SELECT count(*) FROM events e WHERE ' + ' AND '.join(where), values).fetchone()[0])
+            conditions = [conditions[i] for i in np.argsort(counts, kind='stable')]
+        where, params = self._filters(*conditions[0], start, end)
+        for signal, level in conditions[1:]:
+            other_where, values = self._filters(signal, level, start, end, alias='f', seek=False)
+            if level is not None:
+                # A point lookup in the signal index
+                same_week = 'f.week = e.week AND f.ticker = e.ticker'
+            else:
+                # Without a level the signal index cannot seek to the week: scan the week of the
+                # ticker in the primary key instead
+                same_week = (
+                    f'f.ticker = e.ticker AND f.date >= (e.week * 7 - {_WEEK_SHIFT}) * {_DAY_NS}'
+                    f' AND f.date < (e.week * 7 + {7 - _WEEK_SHIFT}) * {_DAY_NS}'
+                )
+            where.append(f"EXISTS (SELECT 1 FROM events f WHERE {same_week} AND {' AND '.join(other_where)})")
+            params += values
+        query = 'SELECT DISTINCT e.ticker, e.week FROM events e WHERE ' + ' AND '.join(where) + ' ORDER BY 1, 2'
+        frame = pd.DataFrame(self.connection.execute(query, params).fetchall(), columns=['Ticker', 'Week'])
+        frame['Week'] = _week_start(frame['Week'].values)
+        return frame
+
+    def count(self):
+        return self.connection.execute('SELECT count(*) FROM events').fetchone()[0]
+
+    def _filters(self, signal, level, start, end, alias='e', seek=True):
+        # With seek=False the date range only filters (no week bounds, and the unary + keeps the
+        # planner from seeking on it), for lookups that seek on the primary key instead
+        date_column = f'{alias}.date' if seek else f'+{alias}.date'
+        where, params = [], []
+        if signal is not None:
+            codes = [_signal_code(name) for name in ([signal] if isinstance(signal, str) else signal)]
+            where.append(f"{alias}.signal IN ({', '.join('?' * len(codes))})")
+            params += codes
+        if level is not None:
+            where.append(f'{alias}.level = ?')
+            params.append(_level_text(level))
+        # The week bounds let the signal index seek to the date range; the dates then trim its ends
+        if start is not None:
+            start_ns = int(_wall_ns([start])[0])
+            if seek:
+                where.append(f'{alias}.week >= ?')
+                params.append(int(_weeks(start_ns)))
+            where.append(f'{date_column} >= ?')
+            params.append(start_ns)
+        if end is not None:
+            end_ns = int(_wall_ns([end])[0])
+            if seek:
+                where.append(f'{alias}.week <= ?')
+                params.append(int(_weeks(end_ns)))
+            where.append(f'{date_column} < ?')
+            params.append(end_ns)
+        return where, params
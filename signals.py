@@ -1,12 +1,61 @@
-import pandas as pd
-import numpy as np
-from scipy.signal import argrelextrema
 
 
 import pandas as pd
 import numpy as np
 
-def detect_volume_price_spikes(df, volume_std_threshold=1.5, price_std_threshold=2, rolling_window=20):
+from events import (
+    SignalEvents, BUY, SELL, GREEN_STAR, RED_STAR, WICK_TOUCH, FIB_WICK_TOUCH, MA_TOUCH, SPIKE,
+)
+from moving_averages import ma_matrix
+
+# Moving averages whose body touches are reported
+TOUCH_MAS = ['SMA_10', 'SMA_20', 'SMA_50', 'SMA_100', 'SMA_200']
+
+# Fibonacci retracement ratios, measured down from the high
+FIB_RATIOS = [0, 0.236, 0.382, 0.5, 0.618, 0.786, 1]
+
+# Detectors detect_events can run, in the order of the detailed summary
+DETECTORS = ('buy_sell', 'stars', 'wick_touch', 'fib_wick_touch', 'ma_touch', 'spike')
+
+def _first_true(mask, axis=-1):
+    """
+    Keep only the first True value of a boolean mask along the given axis.
+    """
+    return mask & (np.cumsum(mask, axis=axis) == 1)
+
+def run_lengths(direction):
+    """
+    Length of the run of equal, non-zero values ending at each position (0 where the value is 0).
+    Runs are counted along the first axis, so a 2-D (bars x series) array is handled column by column.
+    """
+    direction = np.asarray(direction)
+    positions = np.arange(len(direction)).reshape((-1,) + (1,) * (direction.ndim - 1))
+    is_start = np.ones(direction.shape, dtype=bool)
+    is_start[1:] = direction[1:] != direction[:-1]
+    run_start = np.maximum.accumulate(np.where(is_start, positions, 0), axis=0)
+    return np.where(direction != 0, positions - run_start + 1, 0)
+
+def band_crossings(high, low, prev_high, prev_low, bands):
+    """
+    Wick crossings of a set of bands, as a (bars x bands) boolean mask.
+
+    `bands` holds one column per band, in priority order. On each bar only the first band crossed
+    from below by the High and the first band crossed from above by the Low are reported.
+    """
+    high, low = high[:, None], low[:, None]
+    prev_high, prev_low = prev_high[:, None], prev_low[:, None]
+
+    high_cross = (high >= bands) & (prev_high < bands)
+    high_hits = _first_true(high_cross, axis=1)
+    low_cross = (low <= bands) & (prev_low > bands) & ~high_hits
+    low_hits = _first_true(low_cross, axis=1)
+
+    return high_hits | low_hits
+
+def spike_positions(df, volume_std_threshold, price_std_threshold, rolling_window):
+    """
+    Bar positions of the volume/price spikes. Adds the change, rolling mean and std columns to df.
+    """
     # Calculate daily changes
     df['VolumeChange'] = df['Volume'].diff()
     df['PriceChange'] = df['High'] - df['Low']  # Or your preferred metric
@@ -17,63 +66,47 @@ def detect_volume_price_spikes(df, volume_std_threshold=1.5, price_std_threshold
     df['PriceMean'] = df['PriceChange'].rolling(window=rolling_window).mean()
     df['PriceStd'] = df['PriceChange'].rolling(window=rolling_window).std()
 
-    spike_days = []
-    for i in range(rolling_window, len(df)):
-        if (
-            abs(df['VolumeChange'].iloc[i] - df['VolumeMean'].iloc[i]) > volume_std_threshold * df['VolumeStd'].iloc[i]
-            and abs(df['PriceChange'].iloc[i] - df['PriceMean'].iloc[i]) > price_std_threshold * df['PriceStd'].iloc[i]
-        ):
-            spike_days.append((df.index[i], df['Close'].iloc[i]))  # Date and closing price
+    volume_spike = (
+        np.abs(df['VolumeChange'].values - df['VolumeMean'].values) > volume_std_threshold * df['VolumeStd'].values
+    )
+    price_spike = (
+        np.abs(df['PriceChange'].values - df['PriceMean'].values) > price_std_threshold * df['PriceStd'].values
+    )
+    spike_mask = volume_spike & price_spike
+    spike_mask[:rolling_window] = False
 
-    return spike_days
+    return np.flatnonzero(spike_mask)
 
-def detect_wick_touches(df, deviations, len_regression):
-    """Detect wick touches on standard deviation bands."""
-    wick_touches = []
-    touched_devs = set()  # Track touched deviation bands
-
-    for i in range(-len_regression, 0):
-        high_touched = False
-        low_touched = False
-        for dev, prices in deviations.items():
-            price = prices[i + len_regression]
-            if not high_touched and df['High'].iloc[i] >= price and df['High'].iloc[i - 1] < price:
-                wick_touches.append((df.index[i], (dev, price)))
-                touched_devs.add(dev)
-                high_touched = True
-            elif not low_touched and df['Low'].iloc[i] <= price and df['Low'].iloc[i - 1] > price:
-                wick_touches.append((df.index[i], (dev, price)))
-                touched_devs.add(dev)
-                low_touched = True
-
-    return wick_touches, touched_devs  # Return both wick touches and touched deviations
-
-
-def add_sequence_stars(fig, sequence_stars):
-    for color in set([star[3] for star in sequence_stars]):
-        star_x = [date for date, price, size, c in sequence_stars if c == color]
-        star_y = [price for date, price, size, c in sequence_stars if c == color]
-        star_sizes = [size for date, price, size, c in sequence_stars if c == color]
-        fig.add_trace(go.Scatter(
-            x=star_x, y=star_y, mode='markers',
-            marker=dict(symbol='star', size=star_sizes, color=color),
-            name=f'{color.capitalize()} Stars'
-        ))
-    return fig
+def detect_volume_price_spikes(df, volume_std_threshold=1.5, price_std_threshold=2, rolling_window=20):
+    idx = spike_positions(df, volume_std_threshold, price_std_threshold, rolling_window)
+    closes = df['Close'].values[idx]
+    return list(zip(df.index[idx], closes))  # Date and closing price
+
+
+def signal_positions(df):
+    """
+    Bar positions of the buy and sell signals.
+    """
+    close = df['Close'].values
+    open_ = df['Open'].values
+    if len(df) < 3:
+        return np.array([], dtype=int), np.array([], dtype=int)
 
+    # The first and the last bar never carry a signal
+    body_close, body_open, prev_close = close[1:-1], open_[1:-1], close[:-2]
+    buy_mask = (body_close > body_open) & (body_close > prev_close)
+    sell_mask = ~buy_mask & (body_close < body_open) & (body_close < prev_close)
+
+    return np.flatnonzero(buy_mask) + 1, np.flatnonzero(sell_mask) + 1
 
 def detect_signals(df):
     """
     Detect buy and sell signals based on specific conditions.
     """
-    buy_signals = []
-    sell_signals = []
-    
-    for i in range(1, len(df) - 1):
-        if df['Close'].iloc[i] > df['Open'].iloc[i] and df['Close'].iloc[i] > df['Close'].iloc[i - 1]:
-            buy_signals.append((df.index[i], df['Close'].iloc[i]))
-        elif df['Close'].iloc[i] < df['Open'].iloc[i] and df['Close'].iloc[i] < df['Close'].iloc[i - 1]:
-            sell_signals.append((df.index[i], df['Close'].iloc[i]))
+    close = df['Close'].values
+    buy_idx, sell_idx = signal_positions(df)
+    buy_signals = list(zip(df.index[buy_idx], close[buy_idx]))
+    sell_signals = list(zip(df.index[sell_idx], close[sell_idx]))
 
     return buy_signals, sell_signals
 
@@ -83,99 +116,205 @@ def calculate_fibonacci_levels(df):
     """
     high_price = df['High'].max()
     low_price = df['Low'].min()
-    diff = high_price - low_price
-    
-    levels = [high_price - diff * ratio for ratio in [0, 0.236, 0.382, 0.5, 0.618, 0.786, 1]]
+
+    levels = list(fibonacci_levels(high_price, low_price))
     fib_levels = pd.DataFrame(data=levels, columns=['Fibonacci Levels'])
     
     return fib_levels, high_price, low_price
 
+def fibonacci_levels(high_price, low_price, ratios=FIB_RATIOS):
+    """
+    Retracement levels at `ratios` of the range, measured down from the high. Arrays of highs and
+    lows (one per series) give one row of levels per series.
+    """
+    high_price = np.asarray(high_price, dtype=float)
+    diff = high_price - np.asarray(low_price, dtype=float)
+    return high_price[..., None] - diff[..., None] * np.asarray(ratios, dtype=float)
+
+def _wick_touch_hits(df, deviations, len_regression):
+    """
+    Bar positions, band indices and band prices of the wick touches, plus the band names.
+    """
+    names = list(deviations.keys())
+    if not names:
+        return np.array([], dtype=int), np.array([], dtype=int), np.array([]), names
+
+    # (bars x bands) matrix of band prices over the regression window
+    bands = np.column_stack([deviations[name][:len_regression] for name in names])
+
+    high = df['High'].values
+    low = df['Low'].values
+    start = len(df) - len_regression
+    hits = band_crossings(high[start:], low[start:], high[start - 1:-1], low[start - 1:-1], bands)
+
+    bar_idx, band_idx = np.nonzero(hits)
+    return start + bar_idx, band_idx, bands[bar_idx, band_idx], names
+
 def detect_wick_touches(df, deviations, len_regression):
     """
     Detect wick touches on standard deviation bands.
     """
-    wick_touches = []
-    touched_devs = set()
-    
-    for i in range(-len_regression, 0):
-        high_touched = False
-        low_touched = False
-        for dev, prices in deviations.items():
-            price = prices[i + len_regression]
-            if not high_touched and df['High'].iloc[i] >= price and df['High'].iloc[i - 1] < price:
-                wick_touches.append((df.index[i], (dev, price)))
-                touched_devs.add(dev)
-                high_touched = True
-            elif not low_touched and df['Low'].iloc[i] <= price and df['Low'].iloc[i - 1] > price:
-                wick_touches.append((df.index[i], (dev, price)))
-                touched_devs.add(dev)
-                low_touched = True
+    positions, band_idx, prices, names = _wick_touch_hits(df, deviations, len_regression)
+    wick_touches = [(date, (names[b], price)) for date, b, price in zip(df.index[positions], band_idx, prices)]
+    touched_devs = {names[b] for b in np.unique(band_idx)}
+
+    return wick_touches, touched_devs
+
+def detect_rolling_wick_touches(df, bands, band_names):
+    """
+    Detect wick touches over the whole history against rolling deviation bands,
+    where `bands` holds each band's level as it stood on every date (bars x bands).
+    """
+    high = df['High'].values
+    low = df['Low'].values
+    hits = band_crossings(high[1:], low[1:], high[:-1], low[:-1], bands[1:])
+
+    bar_idx, band_idx = np.nonzero(hits)
+    prices = bands[1:][bar_idx, band_idx]
+    wick_touches = [
+        (date, (band_names[b], price)) for date, b, price in zip(df.index[bar_idx + 1], band_idx, prices)
+    ]
+    touched_devs = {band_names[b] for b in np.unique(band_idx)}
 
     return wick_touches, touched_devs
 
+def _fib_touch_hits(df, fib_levels):
+    """
+    Bar positions and level indices of the Fibonacci wick touches, plus the levels themselves.
+    """
+    levels = list(fib_levels['Fibonacci Levels'])
+    if not levels:
+        return np.array([], dtype=int), np.array([], dtype=int), levels
+    hits = fib_level_hits(df['High'].values, df['Low'].values, np.asarray(levels, dtype=float))
+
+    bar_idx, level_idx = np.nonzero(hits)
+    return bar_idx, level_idx, levels
+
+def fib_level_hits(high, low, levels):
+    """
+    (bars x levels) mask of the bars whose range spans a level. `levels` is one row of levels for
+    every bar, or a (bars x levels) array.
+    """
+    return (high[:, None] >= levels) & (low[:, None] <= levels)
+
 def detect_fib_wick_touches(df, fib_levels):
     """
     Detect wick touches on Fibonacci levels.
     """
-    fib_wick_touches = []
-    touched_fibs = set()
-    
-    for i in range(len(df)):
-        for level in fib_levels['Fibonacci Levels']:
-            price = level
-            if df['High'].iloc[i] >= price and df['Low'].iloc[i] <= price:
-                fib_wick_touches.append((df.index[i], (round(level, 3), round(price, 2))))
-                touched_fibs.add(level)
+    bar_idx, level_idx, levels = _fib_touch_hits(df, fib_levels)
+    rounded = [(round(level, 3), round(level, 2)) for level in levels]
+    fib_wick_touches = [(date, rounded[l]) for date, l in zip(df.index[bar_idx], level_idx)]
+    touched_fibs = {levels[l] for l in np.unique(level_idx)}
 
     return fib_wick_touches, touched_fibs
 
-def detect_body_ma_touches(df):
+def ma_touch_hits(df, mas=TOUCH_MAS, ma_values=None):
+    """
+    Bar positions, MA indices and MA prices of the body touches, plus the MA names.
+    `ma_values` is the (bars x MAs) array of `mas`; by default it is read from df's columns and the
+    averages df lacks are computed.
+    """
+    mas = list(mas)
+    if ma_values is None:
+        ma_values = ma_matrix(df, mas)
+
+    open_ = df['Open'].values[:, None]
+    close = df['Close'].values[:, None]
+    hits = ((open_ <= ma_values) & (ma_values <= close)) | ((close <= ma_values) & (ma_values <= open_))
+
+    bar_idx, ma_idx = np.nonzero(hits)
+    return bar_idx, ma_idx, ma_values[bar_idx, ma_idx], mas
+
+def detect_body_ma_touches(df, mas=TOUCH_MAS, ma_values=None):
     """
     Detect body touches on moving averages.
     """
-    ma_touches = []
-    touched_mas = set()
-    
-    for i in range(len(df)):
-        for ma in ['SMA_10', 'SMA_20', 'SMA_50', 'SMA_100', 'SMA_200']:
-            price = df[ma].iloc[i]
-            if df['Open'].iloc[i] <= price <= df['Close'].iloc[i] or df['Close'].iloc[i] <= price <= df['Open'].iloc[i]:
-                ma_touches.append((df.index[i], (ma, price)))
-                touched_mas.add(ma)
+    bar_idx, ma_idx, prices, mas = ma_touch_hits(df, mas, ma_values)
+    ma_touches = [(date, (mas[m], price)) for date, m, price in zip(df.index[bar_idx], ma_idx, prices)]
+    touched_mas = {mas[m] for m in np.unique(ma_idx)}
 
     return ma_touches, touched_mas
 
+def _sequence_hits(df):
+    """
+    Bar positions, star sizes and up/down flags of the bars that extend a streak to 2 or more.
+    """
+    close = df['Close'].values
+    open_ = df['Open'].values
+
+    # +1 for up days, -1 for down days, 0 for neutral ones; the first bar only starts the count
+    direction = np.sign(close[1:] - open_[1:])
+    direction[np.isnan(direction)] = 0
+    sequence = run_lengths(direction)
+
+    idx = np.flatnonzero(sequence >= 2)
+    sizes = 8 + (sequence[idx] - 1) * 5  # Adjust base size and increment as needed
+    return idx + 1, sizes, direction[idx] > 0
+
 def detect_consecutive_days(df):
     """
     Detect consecutive sequences of up or down days and returns information for sequence stars.
     """
-    sequence_stars = []
-    current_sequence = 1
-    up_down = 'neutral'
+    close = df['Close'].values
+    idx, sizes, up = _sequence_hits(df)
+    colors = np.where(up, 'green', 'red')
+
+    return [
+        (date, price, int(size), str(color))
+        for date, price, size, color in zip(df.index[idx], close[idx], sizes, colors)
+    ]
+
 
-    for i in range(1, len(df)):
-        if df['Close'].iloc[i] > df['Open'].iloc[i]:
-            if up_down == 'up':
-                current_sequence += 1
-            else:
-                up_down = 'up'
-                current_sequence = 1
-        elif df['Close'].iloc[i] < df['Open'].iloc[i]:
-            if up_down == 'down':
-                current_sequence += 1
-            else:
-                up_down = 'down'
-                current_sequence = 1
-        else:
-            up_down = 'neutral'
-            current_sequence = 1
+# Columnar variants: the same detections as SignalEvents, without building a tuple per event
 
-        if current_sequence >= 2:
-            size = 8 + (current_sequence - 1) * 5  # Adjust base size and increment as needed
-            color = 'green' if up_down == 'up' else 'red'
-            sequence_stars.append((df.index[i], df['Close'].iloc[i], size, color))
+def signal_events(df):
+    close = df['Close'].values
+    buy_idx, sell_idx = signal_positions(df)
+    return SignalEvents.concat([
+        SignalEvents.of_kind(BUY, df.index[buy_idx], close[buy_idx]),
+        SignalEvents.of_kind(SELL, df.index[sell_idx], close[sell_idx]),
+    ])
 
-    return sequence_stars
+def wick_touch_events(df, deviations, len_regression):
+    positions, band_idx, prices, names = _wick_touch_hits(df, deviations, len_regression)
+    return SignalEvents.of_kind(WICK_TOUCH, df.index[positions], prices, band_idx, level_names=names)
 
+def fib_wick_touch_events(df, fib_levels):
+    bar_idx, level_idx, levels = _fib_touch_hits(df, fib_levels)
+    prices = np.array([round(level, 2) for level in levels])[level_idx]
+    return SignalEvents.of_kind(
+        FIB_WICK_TOUCH, df.index[bar_idx], prices, level_idx, level_names=[round(level, 3) for level in levels]
+    )
 
+def ma_touch_events(df, mas=TOUCH_MAS, ma_values=None):
+    bar_idx, ma_idx, prices, mas = ma_touch_hits(df, mas, ma_values)
+    return SignalEvents.of_kind(MA_TOUCH, df.index[bar_idx], prices, ma_idx, level_names=mas)
 
+def sequence_star_events(df):
+    idx, sizes, up = _sequence_hits(df)
+    kinds = np.where(up, GREEN_STAR, RED_STAR)
+    return SignalEvents(df.index[idx], kinds, df['Close'].values[idx], sizes=sizes)
+
+def spike_events(df, volume_std_threshold=1.5, price_std_threshold=2, rolling_window=20):
+    idx = spike_positions(df, volume_std_threshold, price_std_threshold, rolling_window)
+    return SignalEvents.of_kind(SPIKE, df.index[idx], df['Close'].values[idx])
+
+def detect_events(df, deviations, len_regression, fib_levels, mas=TOUCH_MAS, ma_values=None, detectors=DETECTORS,
+                  **spike_params):
+    """
+    Runs the `detectors` (all by default) and returns their events in one store, in the order of
+    the detailed summary (buy, sell, stars, wick, Fibonacci and MA touches), followed by the
+    volume/price spikes. MA touches are checked against `mas` (see ma_touch_hits for `ma_values`).
+    """
+    unknown = set(detectors) - set(DETECTORS)
+    if unknown:
+        raise ValueError(f"Unknown detectors: {', '.join(sorted(unknown))} (expected {', '.join(DETECTORS)})")
+    runs = {
+        'buy_sell': lambda: signal_events(df),
+        'stars': lambda: sequence_star_events(df),
+        'wick_touch': lambda: wick_touch_events(df, deviations, len_regression),
+        'fib_wick_touch': lambda: fib_wick_touch_events(df, fib_levels),
+        'ma_touch': lambda: ma_touch_events(df, mas, ma_values),
+        'spike': lambda: spike_events(df, **spike_params),
+    }
+    return SignalEvents.concat([runs[name]() for name in DETECTORS if name in detectors])
@@ -0,0 +1,362 @@
+import math
+from collections import deque
+
+from geometry import band_offsets, deviation_band_names
+from moving_averages import DEFAULT_MAS, parse_ma, prefix_block
+from signals import FIB_RATIOS, TOUCH_MAS
+
+
+class RollingWindow:
+    """
+    Fixed-size window over a stream of values with O(1) mean and sample standard deviation.
+
+    Running sums are rebuilt exactly from the buffer once per window length so rounding
+    errors cannot accumulate over long streams (amortized O(1) per value).
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self.nan_count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._since_rebuild = 0
+
+    def push(self, value):
+        self.values.append(value)
+        self._add(value, 1)
+        if len(self.values) > self.size:
+            self._add(self.values.popleft(), -1)
+
+        self._since_rebuild += 1
+        if self._since_rebuild >= self.size:
+            finite = [v for v in self.values if not math.isnan(v)]
+            self.total = math.fsum(finite)
+            self.total_sq = math.fsum(v * v for v in finite)
+            self._since_rebuild = 0
+
+    def _add(self, value, sign):
+        if math.isnan(value):
+            self.nan_count += sign
+        else:
+            self.total += sign * value
+            self.total_sq += sign * value * value
+
+    @property
+    def full(self):
+        # Same as pandas' rolling(window) default: every value in the window must be present
+        return len(self.values) == self.size and self.nan_count == 0
+
+    @property
+    def mean(self):
+        return self.total / self.size if self.full else math.nan
+
+    @property
+    def std(self):
+        if not self.full or self.size < 2:
+            return math.nan
+        variance = (self.total_sq - self.total * self.total / self.size) / (self.size - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+class BlockPrefix:
+    """
+    Running form of moving_averages.block_prefix: the prefix sums of a stream that restart every
+    `block` values, kept for the last `keep` positions, with the total of the last complete block.
+    """
+
+    def __init__(self, block, keep, width=1):
+        self.block = block
+        self.locals = deque(maxlen=keep)
+        self.running = [0.0] * width
+        self.total = [0.0] * width
+        self.count = 0
+
+    def push(self, *values):
+        if self.count % self.block == 0:
+            self.running = [0.0] * len(values)
+        self.locals.append(self.running)
+        self.running = [total + value for total, value in zip(self.running, values)]
+        self.count += 1
+        if self.count % self.block == 0:
+            self.total = self.running
+
+    def local(self, back):
+        # Sums before the position `back` values ago (0 for the position after the newest value)
+        if back == 0:
+            return [0.0] * len(self.running) if self.count % self.block == 0 else self.running
+        return self.locals[-back]
+
+
+class RollingMeans:
+    """
+    Simple moving averages of a stream, with the arithmetic of compute_moving_averages over the same
+    `mas`, so each value equals the batch one exactly. Windows holding a NaN are NaN.
+    """
+
+    def __init__(self, mas=DEFAULT_MAS):
+        specs = [parse_ma(name) for name in mas]
+        if any(kind != 'SMA' for kind, _ in specs):
+            raise ValueError(f"Only SMAs can be streamed: {', '.join(mas)}")
+        self.windows = {name: window for name, (_, window) in zip(mas, specs)}
+        longest = {}
+        for window in self.windows.values():
+            block = prefix_block([window])
+            longest[block] = max(longest.get(block, 0), window)
+        self.sums = {block: BlockPrefix(block, keep) for block, keep in longest.items()}
+        self.missing = deque(maxlen=max(longest.values(), default=1))
+        self.missing_count = 0
+        self.count = 0
+
+    def push(self, value):
+        missing = math.isnan(value)
+        self.missing.append(self.missing_count)
+        self.missing_count += missing
+        self.count += 1
+        for sums in self.sums.values():
+            sums.push(0.0 if missing else value)
+
+    def mean(self, name):
+        window = self.windows[name]
+        if self.count < window or self.missing_count - self.missing[-window] > 0:
+            return math.nan
+        block = prefix_block([window])
+        sums = self.sums[block]
+        crosses = (self.count - window) % block >= block - window
+        total = (sums.local(0)[0] - sums.local(window)[0]) + crosses * sums.total[0]
+        return total / window
+
+
+class RollingRegression:
+    """
+    Least-squares line over the last `length` closes, updated in O(1) per bar.
+
+    The window sums of y, x*y and y*y come from prefix sums restarted every block of bars, with y
+    centred on the first close of its block, exactly as in calculate_rolling_linear_regression, so
+    the fit equals the batch one. Windows holding a NaN close are NaN.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.block = prefix_block([length])
+        self.sums = BlockPrefix(self.block, length, width=3)
+        self.centres = deque([0.0, 0.0], maxlen=2)  # First closes of the previous and current block
+        self._centred = False
+        self.missing = deque(maxlen=length)
+        self.missing_count = 0
+
+    def push(self, value):
+        position = self.sums.count
+        if position % self.block == 0:
+            self.centres.append(0.0)
+            self._centred = False
+        missing = math.isnan(value)
+        if not missing and not self._centred:
+            self.centres[-1] = value
+            self._centred = True
+        centred = 0.0 if missing else value - self.centres[-1]
+        self.missing.append(self.missing_count)
+        self.missing_count += missing
+        self.sums.push(centred, position % self.block * centred, centred * centred)
+
+    @property
+    def full(self):
+        return self.sums.count >= self.length
+
+    def fit(self):
+        """
+        Slope, fitted price at the newest bar and population std of the residuals.
+        """
+        length, block, count = self.length, self.block, self.sums.count
+        if self.missing_count - self.missing[0] > 0:
+            return math.nan, math.nan, math.nan
+        start_offset = (count - length) % block
+        crosses = start_offset >= block - length
+        tail = count % block if crosses else 0
+        # The window starts in the current block, or in the previous one when it ends in this one
+        starts_here = (count - length) // block == (count - 1) // block
+        centre = self.centres[-1] if starts_here else self.centres[0]
+        shift = (0.0 if starts_here else self.centres[-1]) - centre
+
+        stop, first = self.sums.local(0), self.sums.local(length)
+        sum_y, sum_xy, sum_yy = [
+            stop[i] - first[i] + crosses * self.sums.total[i] for i in range(3)
+        ]
+        tail_y = crosses * stop[0]
+
+        sum_ky = (sum_xy - start_offset * sum_y + block * tail_y
+                  + shift * (tail * (tail - 1) / 2 + (block - start_offset) * tail))
+        sum_yy = sum_yy + 2 * shift * tail_y + shift * shift * tail
+        sum_y = sum_y + shift * tail
+
+        sum_k = length * (length - 1) / 2
+        sum_kk = (length - 1) * length * (2 * length - 1) / 6
+        slope = (length * sum_ky - sum_k * sum_y) / (length * sum_kk - sum_k ** 2)
+        intercept = (sum_y - slope * sum_k) / length + centre
+        centered_ky = sum_ky - sum_k * sum_y / length
+        centered_yy = sum_yy - sum_y * sum_y / length
+        std_dev = math.sqrt(max((centered_yy - slope * centered_ky) / length, 0.0))
+        return slope, slope * (length - 1) + intercept, std_dev
+
+
+class StreamingSignalEngine:
+    """
+    Stateful signal engine fed one OHLCV bar at a time.
+
+    `update` returns only the events produced by the new bar, in the tuple formats of the batch
+    detectors in signals.py. Each event equals what the batch function reports for the newest bar
+    when run over the history seen so far, so a replayed history yields the same signals. The
+    averages `mas` (SMAs only) and the regression bands are computed with the arithmetic of
+    compute_moving_averages and calculate_rolling_linear_regression, so their prices and ties match
+    the batch ones exactly; MA touches are checked against `touch_mas`, which must be among `mas`.
+    Buy and sell signals are confirmed one bar late, because the batch detector never flags the
+    last bar of the frame.
+    """
+
+    def __init__(self, len_regression=144, mas=DEFAULT_MAS, touch_mas=TOUCH_MAS,
+                 volume_std_threshold=1.5, price_std_threshold=2, rolling_window=20):
+        unknown = set(touch_mas) - set(mas)
+        if unknown:
+            raise ValueError(f"Touch averages not computed: {', '.join(sorted(unknown))}")
+        self.len_regression = len_regression
+        self.touch_mas = list(touch_mas)
+        self.volume_std_threshold = volume_std_threshold
+        self.price_std_threshold = price_std_threshold
+        self.rolling_window = rolling_window
+
+        self.mas = RollingMeans(mas)
+        self.regression = RollingRegression(len_regression)
+        self.bands = list(zip(deviation_band_names(), band_offsets().tolist()))
+        self.volume_changes = RollingWindow(rolling_window)
+        self.price_changes = RollingWindow(rolling_window)
+
+        self.bar_count = 0
+        self.previous = None  # (timestamp, open, high, low, close, volume) of the previous bar
+        self.previous_close = math.nan
+        self.high_price = math.nan
+        self.low_price = math.nan
+        self.up_down = 'neutral'
+        self.current_sequence = 1
+
+    def update(self, timestamp, open_, high, low, close, volume):
+        events = {
+            'buy_signals': [], 'sell_signals': [], 'wick_touches': [], 'fib_wick_touches': [],
+            'ma_touches': [], 'sequence_stars': [], 'spike_days': [],
+        }
+
+        self._confirm_previous_signal(events)
+        self.mas.push(close)
+        self.regression.push(close)
+
+        self._detect_wick_touches(events, timestamp, high, low)
+        self._detect_fib_wick_touches(events, timestamp, high, low)
+        self._detect_body_ma_touches(events, timestamp, open_, close)
+        self._detect_consecutive_days(events, timestamp, open_, close)
+        self._detect_volume_price_spike(events, timestamp, high, low, close, volume)
+
+        if self.previous is not None:
+            self.previous_close = self.previous[4]
+        self.previous = (timestamp, open_, high, low, close, volume)
+        self.bar_count += 1
+        return events
+
+    def indicators(self):
+        """
+        Current moving averages and regression line (slope, fitted price, residual std).
+        """
+        values = {name: self.mas.mean(name) for name in self.mas.windows}
+        values['regression'] = self.regression.fit() if self.regression.full else None
+        return values
+
+    def _confirm_previous_signal(self, events):
+        # The previous bar is no longer the last one, so its buy/sell signal is now final
+        if self.previous is None or self.bar_count < 2:
+            return
+        timestamp, open_, _, _, close, _ = self.previous
+        if close > open_ and close > self.previous_close:
+            events['buy_signals'].append((timestamp, close))
+        elif close < open_ and close < self.previous_close:
+            events['sell_signals'].append((timestamp, close))
+
+    def _detect_wick_touches(self, events, timestamp, high, low):
+        # The batch detector compares against the bar before the regression window
+        if not self.regression.full or self.bar_count < self.len_regression:
+            return
+        _, _, prev_high, prev_low, _, _ = self.previous
+        slope, fitted, std_dev = self.regression.fit()
+
+        high_touched = False
+        low_touched = False
+        for name, offset in self.bands:
+            price = fitted + offset * std_dev
+            if not high_touched and high >= price and prev_high < price:
+                events['wick_touches'].append((timestamp, (name, price)))
+                high_touched = True
+            elif not low_touched and low <= price and prev_low > price:
+                events['wick_touches'].append((timestamp, (name, price)))
+                low_touched = True
+
+    def _detect_fib_wick_touches(self, events, timestamp, high, low):
+        # Levels span the highest high and lowest low seen so far, like calculate_fibonacci_levels
+        if not math.isnan(high):
+            self.high_price = high if math.isnan(self.high_price) else max(self.high_price, high)
+        if not math.isnan(low):
+            self.low_price = low if math.isnan(self.low_price) else min(self.low_price, low)
+        diff = self.high_price - self.low_price
+
+        for ratio in FIB_RATIOS:
+            level = self.high_price - diff * ratio
+            if high >= level and low <= level:
+                events['fib_wick_touches'].append((timestamp, (round(level, 3), round(level, 2))))
+
+    def _detect_body_ma_touches(self, events, timestamp, open_, close):
+        for name in self.touch_mas:
+            price = self.mas.mean(name)
+            if open_ <= price <= close or close <= price <= open_:
+                events['ma_touches'].append((timestamp, (name, price)))
+
+    def _detect_consecutive_days(self, events, timestamp, open_, close):
+        if self.bar_count == 0:
+            return
+        if close > open_:
+            self.current_sequence = self.current_sequence + 1 if self.up_down == 'up' else 1
+            self.up_down = 'up'
+        elif close < open_:
+            self.current_sequence = self.current_sequence + 1 if self.up_down == 'down' else 1
+            self.up_down = 'down'
+        else:
+            self.up_down = 'neutral'
+            self.current_sequence = 1
+
+        if self.current_sequence >= 2:
+            size = 8 + (self.current_sequence - 1) * 5
+            color = 'green' if self.up_down == 'up' else 'red'
+            events['sequence_stars'].append((timestamp, close, size, color))
+
+    def _detect_volume_price_spike(self, events, timestamp, high, low, close, volume):
+        volume_change = volume - self.previous[5] if self.previous is not None else math.nan
+        price_change = high - low
+        self.volume_changes.push(volume_change)
+        self.price_changes.push(price_change)
+
+        if self.bar_count < self.rolling_window:
+            return
+        volume_spike = (abs(volume_change - self.volume_changes.mean)
+                        > self.volume_std_threshold * self.volume_changes.std)
+        price_spike = (abs(price_change - self.price_changes.mean)
+                       > self.price_std_threshold * self.price_changes.std)
+        if volume_spike and price_spike:
+            events['spike_days'].append((timestamp, close))
+
+
+def replay(df, engine=None):
+    """
+    Feeds every bar of `df` through a streaming engine and collects the emitted events.
+    """
+    engine = engine or StreamingSignalEngine()
+    collected = {}
+    columns = [df[column].values for column in ['Open', 'High', 'Low', 'Close', 'Volume']]
+    for timestamp, *bar in zip(df.index, *columns):
+        for kind, new_events in engine.update(timestamp, *(float(value) for value in bar)).items():
+            collected.setdefault(kind, []).extend(new_events)
+    return collected
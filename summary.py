@@ -1,7 +1,25 @@
 import pandas as pd
+import numpy as np
+import glob
 import os
+import shutil
 from datetime import datetime
 
+from data_retrieval import as_index_time
+from events import SUMMARY_KINDS
+
+# Columns of the detailed summary files, in order, and their types
+SUMMARY_COLUMNS = ['Date', 'Signal', 'Price', 'Size', 'Level', 'MA']
+SUMMARY_DTYPES = {'Signal': 'string', 'Price': 'float64', 'Size': 'Int16', 'Level': 'string', 'MA': 'string'}
+
+SUMMARY_FORMATS = ('csv', 'parquet')
+
+# File name suffixes of the compressed CSV summaries
+CSV_COMPRESSION_SUFFIXES = {'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz'}
+
+# Events converted and written at a time
+CHUNK_ROWS = 100_000
+
 def generate_summary_output(ticker, buy_signals, sell_signals, sequence_stars, wick_touches, fib_wick_touches, ma_touches, output_directory):
     summary = []
 
@@ -19,7 +37,196 @@ def generate_summary_output(ticker, buy_signals, sell_signals, sequence_stars, w
         summary.append({"Date": date, "Signal": "MA Touch", "MA": ma, "Price": price})
 
     summary_df = pd.DataFrame(summary)
+    _write_summary(ticker, summary_df, output_directory)
+
+def generate_event_summary_output(ticker, events, output_directory, writer=None):
+    """
+    Detailed summary of a SignalEvents store, written by `writer` (a plain CSV SummaryWriter by
+    default). Returns the path of the per-ticker file.
+    """
+    filename = (writer or SummaryWriter()).write(ticker, events, output_directory)
+    print(f"Detailed summary saved to {filename}")
+    return filename
+
+
+def summary_frame(events):
+    """
+    events.to_frame() with every summary column present and typed, so all chunks and files share
+    one schema.
+    """
+    return events.to_frame().reindex(columns=SUMMARY_COLUMNS).astype(SUMMARY_DTYPES)
+
+
+class SummaryWriter:
+    """
+    Writes detailed summaries as CSV (optionally gzip, bz2 or xz compressed) or Parquet (snappy
+    by default, or any Parquet `compression`), converting and writing `chunk_rows` events at a time.
+
+    With append=True only the events dated after the last date already in a ticker's file are
+    added to it, instead of rewriting the whole history; Parquet files, which cannot grow in place,
+    are rewritten from their stored row groups without re-reading them into pandas. A run on a new
+    day starts from a copy of the ticker's latest earlier file (see previous_summary).
+
+    `dataset` names a directory that also receives the events of every ticker written, as one
+    partition of a universe-wide dataset (`Ticker=<TICKER>/part-NNNNN.<fmt>`, readable with
+    read_dataset or pandas.read_parquet). Appending adds a new part with the newer events only.
+    """
+
+    def __init__(self, fmt='csv', compression=None, append=False, dataset=None, chunk_rows=CHUNK_ROWS):
+        if fmt not in SUMMARY_FORMATS:
+            raise ValueError(f"Unsupported summary format: {fmt!r}")
+        if fmt == 'csv' and compression not in (None, *CSV_COMPRESSION_SUFFIXES):
+            raise ValueError(f"Unsupported CSV compression: {compression!r}")
+        self.fmt = fmt
+        self.compression = compression if fmt == 'csv' or compression else 'snappy'
+        self.append = append
+        self.dataset = dataset
+        self.chunk_rows = chunk_rows
+
+    @property
+    def suffix(self):
+        if self.fmt == 'parquet':
+            return '.parquet'
+        return '.csv' + CSV_COMPRESSION_SUFFIXES.get(self.compression, '')
+
+    def write(self, ticker, events, output_directory):
+        """
+        Writes the per-ticker file (and the dataset partition) and returns the file's path.
+        """
+        os.makedirs(output_directory, exist_ok=True)
+        events = events.select(SUMMARY_KINDS)
+        path = os.path.join(output_directory, f"{ticker}_detailed_signal_summary{self.suffix}")
+        append = self.append and os.path.exists(path)
+        if self.append and not append:
+            previous = previous_summary(path)
+            if previous is not None:
+                shutil.copyfile(previous, path)
+                append = True
+        self._write(path, events, append=append)
+
+        if self.dataset is not None:
+            partition = os.path.join(self.dataset, f"Ticker={ticker.upper()}")
+            os.makedirs(partition, exist_ok=True)
+            parts = sorted(glob.glob(os.path.join(partition, f"part-*{self.suffix}")))
+            if not self.append:
+                for part in parts:
+                    os.remove(part)
+                parts = []
+            # Each part only holds events newer than the parts before it
+            new_events = _events_after(events, last_written_date(parts[-1])) if parts else events
+            if len(new_events) or not parts:
+                self._write(os.path.join(partition, f"part-{len(parts):05d}{self.suffix}"), new_events, append=False)
+        return path
+
+    def _write(self, path, events, append):
+        if append:
+            events = _events_after(events, last_written_date(path))
+            if not len(events):
+                return
+        if self.fmt == 'csv':
+            self._write_csv(path, events, append)
+        else:
+            self._write_parquet(path, events, append)
+
+    def _chunks(self, events):
+        if not len(events):
+            yield summary_frame(events)
+        for start in range(0, len(events), self.chunk_rows):
+            yield summary_frame(events.take(slice(start, start + self.chunk_rows)))
+
+    def _write_csv(self, path, events, append):
+        for frame in self._chunks(events):
+            frame.to_csv(path, mode='a' if append else 'w', header=not append, index=False, compression=self.compression)
+            append = True
+
+    def _write_parquet(self, path, events, append):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tmp_path = path + '.tmp'
+        writer = None
+        try:
+            if append:
+                existing = pq.ParquetFile(path)
+                writer = pq.ParquetWriter(tmp_path, existing.schema_arrow, compression=self.compression)
+                for i in range(existing.num_row_groups):
+                    writer.write_table(existing.read_row_group(i))
+            for frame in self._chunks(events):
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema, compression=self.compression)
+                writer.write_table(table.cast(writer.schema))
+        finally:
+            if writer is not None:
+                writer.close()
+        os.replace(tmp_path, path)
+
+
+def previous_summary(path):
+    """
+    The same summary file in the latest earlier day of the `data/<day>/<ticker>/` layout, or None.
+    """
+    ticker_directory = os.path.dirname(path)
+    day_directory = os.path.dirname(ticker_directory)
+    day = os.path.basename(day_directory)
+    pattern = os.path.join(
+        glob.escape(os.path.dirname(day_directory)), '*',
+        glob.escape(os.path.basename(ticker_directory)), glob.escape(os.path.basename(path)),
+    )
+    earlier = sorted(
+        candidate for candidate in glob.glob(pattern)
+        if os.path.basename(os.path.dirname(os.path.dirname(candidate))) < day
+    )
+    return earlier[-1] if earlier else None
+
+
+def last_written_date(path):
+    """
+    Latest event date in a summary file (CSV or Parquet), or None if it holds no events.
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        latest = pc.max(pq.read_table(path, columns=['Date']).column('Date')).as_py()
+        return None if latest is None else pd.Timestamp(latest)
+
+    latest = None
+    for chunk in pd.read_csv(path, usecols=['Date'], chunksize=CHUNK_ROWS):
+        # Dates written across DST changes carry mixed UTC offsets
+        chunk_latest = pd.to_datetime(chunk['Date'], utc=True).max()
+        if not pd.isna(chunk_latest) and (latest is None or chunk_latest > latest):
+            latest = chunk_latest
+    return latest
+
+
+def _events_after(events, date):
+    if date is None or not len(events):
+        return events
+    return events.take(np.flatnonzero(events.dates > as_index_time(date, events.dates)))
+
+
+def read_dataset(directory):
+    """
+    Every partition of a universe dataset written by SummaryWriter, as one frame with a Ticker column.
+    """
+    frames = []
+    for part in sorted(glob.glob(os.path.join(directory, 'Ticker=*', 'part-*'))):
+        if part.endswith('.parquet'):
+            frame = pd.read_parquet(part)
+        else:
+            frame = pd.read_csv(part, dtype=SUMMARY_DTYPES)
+            try:
+                frame['Date'] = pd.to_datetime(frame['Date'])
+            except ValueError:
+                frame['Date'] = pd.to_datetime(frame['Date'], utc=True)
+        frame.insert(0, 'Ticker', os.path.basename(os.path.dirname(part)).split('=', 1)[1])
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=['Ticker', *SUMMARY_COLUMNS])
+    return pd.concat(frames, ignore_index=True)
 
+def _write_summary(ticker, summary_df, output_directory):
     # Ensure the output directory exists
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
@@ -27,6 +234,7 @@ def generate_summary_output(ticker, buy_signals, sell_signals, sequence_stars, w
     filename = os.path.join(output_directory, f"{ticker}_detailed_signal_summary.csv")
     summary_df.to_csv(filename, index=False)
     print(f"Detailed summary saved to {filename}")
+    return filename
 
 def generate_summary_outputOLD(ticker, buy_signals, sell_signals, sequence_stars, wick_touches, fib_wick_touches, ma_touches, output_directory):
     summary = []
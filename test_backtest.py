@@ -0,0 +1,41 @@
+"""
+Trade statistics and grid runs of backtest.py on the synthetic frames of test_signals.py.
+"""
+import numpy as np
+import pytest
+
+from backtest import run_backtest, trade_statistics
+from test_signals import make_frame
+
+GRID = {'len_regression': [50], 'volume_std_threshold': [1.5], 'price_std_threshold': [2.0], 'rolling_window': [20]}
+
+
+def test_trade_statistics():
+    close = np.array([100.0, 110.0, 99.0, 99.0, 121.0])
+    stats = trade_statistics(close, np.array([0, 2]), np.array([1.0, -1.0]), horizon=2)
+    # Long 100 -> 99, then short 99 -> 121
+    returns = np.array([-0.01, -22 / 99])
+    assert stats['trades'] == 2
+    assert stats['hit_rate'] == 0
+    assert stats['mean_return'] == pytest.approx(returns.mean())
+    assert stats['total_return'] == pytest.approx(np.prod(1 + returns) - 1)
+    assert stats['max_drawdown'] == pytest.approx(1 - np.prod(1 + returns))
+
+
+def test_trade_statistics_skips_missing_closes():
+    close = np.array([100.0, 110.0, np.nan, 99.0, 121.0, 130.0])
+    # Trades at 0 and 2 exit or enter on the missing close
+    stats = trade_statistics(close, np.array([0, 1, 2, 3]), np.ones(4), horizon=2)
+    assert stats['trades'] == 2
+    assert stats['hit_rate'] == 0.5
+    assert stats['mean_return'] == pytest.approx((99 / 110 - 1 + 130 / 99 - 1) / 2)
+
+
+def test_run_backtest_with_missing_close():
+    df = make_frame(0, n=1000)
+    df.iloc[700, df.columns.get_loc('Close')] = np.nan
+    results = run_backtest(df, GRID, horizons=(5, 20), workers=1)
+    traded = results[results['trades'] > 0]
+    assert set(traded['rule']) == {'buy_sell', 'wick_touch', 'ma_touch', 'spike'}
+    for column in ['hit_rate', 'mean_return', 'total_return', 'max_drawdown']:
+        assert np.isfinite(traded[column]).all(), column
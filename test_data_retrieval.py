@@ -0,0 +1,142 @@
+"""
+OHLCVCache over recorded bars served by CSVProvider, in a temporary directory.
+"""
+import json
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from data_retrieval import OHLCV_COLUMNS, CSVProvider, OHLCVCache, period_start
+from test_signals import make_frame
+
+# make_frame's 600 business days end on 2022-04-19; the first 580 on 2022-03-22
+FULL = make_frame(0)[OHLCV_COLUMNS]
+EARLY = FULL.iloc[:580]
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = pd.Timestamp(now)
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def csv_dir(tmp_path):
+    directory = tmp_path / 'csv'
+    directory.mkdir()
+    EARLY.to_csv(directory / 'TEST.csv')
+    return directory
+
+
+@pytest.fixture
+def clock():
+    return Clock('2022-03-23')
+
+
+@pytest.fixture
+def cache(tmp_path, csv_dir, clock):
+    return OHLCVCache(directory=str(tmp_path / 'cache'), provider=CSVProvider(str(csv_dir)), clock=clock)
+
+
+def read_meta(cache, ticker):
+    with open(os.path.join(cache.directory, ticker, 'meta.json')) as f:
+        return json.load(f)
+
+
+def assert_bars_equal(df, frame):
+    # Bars read back from the store have a nanosecond index, those read from CSV may not
+    pd.testing.assert_frame_equal(df, frame, check_index_type=False, check_freq=False)
+
+
+def expected(frame, start, end=None):
+    return frame[(frame.index >= start) & (frame.index < (end or frame.index[-1] + pd.Timedelta(days=1)))]
+
+
+def test_repeat_request_served_from_disk(cache, clock):
+    first = cache.get('TEST', period='1y')
+    clock.now += pd.Timedelta(hours=1)
+    second = cache.get('TEST', period='1y')
+    assert cache.provider.calls == [('TEST', '1y', None, None)]
+    assert_bars_equal(second, first)
+    assert_bars_equal(first, expected(EARLY, pd.Timestamp('2021-03-23')))
+
+
+def test_incremental_refresh(cache, csv_dir, clock):
+    cache.get('TEST', period='1y')
+    # Twenty more bars, and the last cached one revised after it was first recorded
+    revised = FULL.copy()
+    revised.iloc[579, revised.columns.get_loc('Close')] += 1
+    revised.to_csv(csv_dir / 'TEST.csv')
+    clock.now = pd.Timestamp('2022-04-20')
+
+    df = cache.get('TEST', period='1y')
+    # Only the tail is fetched, from the last cached bar on
+    assert cache.provider.calls[1:] == [('TEST', None, EARLY.index[-1], None)]
+    assert_bars_equal(df, expected(revised, period_start('1y', clock.now)))
+
+    # A range reaching further back fetches only the missing head
+    df = cache.get('TEST', start='2020-06-01', end='2021-01-01')
+    assert cache.provider.calls[2:] == [('TEST', None, pd.Timestamp('2020-06-01'), pd.Timestamp('2021-03-23'))]
+    assert_bars_equal(df, expected(FULL, '2020-06-01', '2021-01-01'))
+    assert read_meta(cache, 'TEST')['covered_start'] == pd.Timestamp('2020-06-01').value
+
+    cache.get('TEST', start='2020-07-01', end='2020-12-01')
+    assert len(cache.provider.calls) == 3
+
+
+def test_versioned_arrays(cache, csv_dir, clock):
+    cache.get('TEST', period='1y')
+    store = os.path.join(cache.directory, 'TEST')
+    first = read_meta(cache, 'TEST')['version']
+    assert sorted(os.listdir(store)) == [f"index-{first}.npy", 'meta.json', f"ohlcv-{first}.npy"]
+
+    FULL.to_csv(csv_dir / 'TEST.csv')
+    clock.now = pd.Timestamp('2022-04-20')
+    cache.get('TEST', period='1y')
+    # The refresh writes new arrays and removes the ones it replaced
+    second = read_meta(cache, 'TEST')['version']
+    assert second != first
+    assert sorted(os.listdir(store)) == [f"index-{second}.npy", 'meta.json', f"ohlcv-{second}.npy"]
+
+
+def test_unversioned_store_is_read(cache, clock):
+    first = cache.get('TEST', period='1y')
+    # A store written before the arrays were versioned
+    store = os.path.join(cache.directory, 'TEST')
+    meta = read_meta(cache, 'TEST')
+    for name in ('index', 'ohlcv'):
+        os.rename(os.path.join(store, f"{name}-{meta['version']}.npy"), os.path.join(store, f"{name}.npy"))
+    del meta['version']
+    with open(os.path.join(store, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    assert_bars_equal(cache.get('TEST', period='1y'), first)
+    assert len(cache.provider.calls) == 1
+
+
+def test_eviction(cache, csv_dir):
+    for ticker in ('A', 'B', 'C'):
+        EARLY.to_csv(csv_dir / f"{ticker}.csv")
+    cache.max_tickers = 2
+
+    cache.get('A', period='1y')
+    cache.get('B', period='1y')
+    # A was read more recently than B
+    os.utime(os.path.join(cache.directory, 'A', 'meta.json'), (time.time() - 10,) * 2)
+    os.utime(os.path.join(cache.directory, 'B', 'meta.json'), (time.time() - 20,) * 2)
+    cache.get('C', period='1y')
+    assert sorted(os.listdir(cache.directory)) == ['A', 'C']
+
+    # Evicted stores are fetched again
+    cache.get('B', period='1y')
+    assert [call[0] for call in cache.provider.calls] == ['A', 'B', 'C', 'B']
+    assert sorted(os.listdir(cache.directory)) == ['B', 'C']
+
+    cache.max_tickers = None
+    cache.max_bytes = 1
+    assert sorted(cache.evict(keep='C')) == ['B']
+    assert os.listdir(cache.directory) == ['C']
@@ -0,0 +1,46 @@
+"""
+The rolling regression of geometry.py against the single-window fit it vectorizes.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from geometry import calculate_linear_regression_and_deviations, calculate_rolling_linear_regression
+
+
+@pytest.mark.parametrize('length', [20, 144, 233])
+def test_rolling_regression_long_history(length):
+    # A long history far from zero, where sums over the whole history would lose precision
+    rng = np.random.default_rng(length)
+    close = 50_000 + np.cumsum(rng.normal(0, 1, 1_000_000))
+    close[[length + 3, 400_000]] = np.nan
+    df = pd.DataFrame({'Close': close})
+    slope, intercept, std_dev, bands, names = calculate_rolling_linear_regression(df, length)
+
+    checked = 0
+    for last in [length - 1, length + 2, length * 2 + 5, *rng.integers(length, len(df), 40), len(df) - 1]:
+        window = close[last - length + 1:last + 1]
+        if np.isnan(window).any():
+            assert np.isnan(slope[last]) and np.isnan(bands[last]).all()
+            continue
+        expected_slope, expected_intercept, _, end_price, deviations = (
+            calculate_linear_regression_and_deviations(df.iloc[:last + 1], length)
+        )
+        residuals = window - (expected_slope * np.arange(last - length + 1, last + 1) + expected_intercept)
+        assert slope[last] == pytest.approx(expected_slope, rel=1e-7)
+        assert std_dev[last] == pytest.approx(residuals.std(), rel=1e-7)
+        assert slope[last] * last + intercept[last] == pytest.approx(end_price, abs=1e-6)
+        assert bands[last] == pytest.approx([deviations[name][-1] for name in names], abs=1e-6)
+        checked += 1
+    assert checked > 30
+
+
+def test_rolling_regression_nan_window():
+    close = np.arange(30, dtype=float) * 2 + 1
+    close[10] = np.nan
+    slope, intercept, std_dev, bands, _ = calculate_rolling_linear_regression(pd.DataFrame({'Close': close}), 5)
+    # Only the windows holding bar 10 are missing
+    assert np.isnan(slope[:4]).all() and np.isnan(slope[10:15]).all()
+    assert slope[4:10] == pytest.approx(2) and slope[15:] == pytest.approx(2)
+    assert std_dev[15:] == pytest.approx(0, abs=1e-6)
+    assert bands[29] == pytest.approx(close[29], abs=1e-5)
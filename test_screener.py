@@ -0,0 +1,47 @@
+"""
+The screener over a universe of synthetic frames, against the single-ticker detectors of signals.py.
+"""
+import pytest
+
+import signals
+from data_retrieval import add_moving_averages
+from screener import Panel, screen
+from test_signals import make_frame
+
+OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+@pytest.fixture(scope='module')
+def universe():
+    frames = {}
+    for seed in range(24):
+        df = make_frame(seed, n=300 + 37 * seed)[OHLCV].copy()
+        if seed % 4 == 0:
+            # Flat closes, where the averages land on (or one rounding step beside) the close itself
+            df.iloc[-40:, df.columns.get_loc('Close')] = 66.9
+            df.iloc[-3:, df.columns.get_loc('Open')] = 67.3
+        frames[f"T{seed}"] = df
+    panel = Panel.from_frames(frames)
+    return panel, screen(panel)
+
+
+def test_ma_touches_match_single_ticker(universe):
+    panel, hits = universe
+    touched = 0
+    for ticker in panel.tickers:
+        df = add_moving_averages(panel.frame(ticker), signals.TOUCH_MAS)
+        ma_touches, _ = signals.detect_body_ma_touches(df.iloc[-1:])
+        rows = hits[(hits.Ticker == ticker) & (hits.Signal == 'MA Touch')]
+        assert sorted(zip(rows.Level, rows.Price)) == sorted(touch for _, touch in ma_touches)
+        touched += len(ma_touches)
+    assert touched
+
+
+def test_fib_touches_match_single_ticker(universe):
+    panel, hits = universe
+    for ticker in panel.tickers:
+        df = panel.frame(ticker)
+        fib_levels, _, _ = signals.calculate_fibonacci_levels(df)
+        fib_touches, _ = signals.detect_fib_wick_touches(df.iloc[-1:], fib_levels)
+        rows = hits[(hits.Ticker == ticker) & (hits.Signal == 'Fib Wick Touch')]
+        assert sorted(zip(rows.Level, rows.Price)) == sorted(touch for _, touch in fib_touches)
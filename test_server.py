@@ -0,0 +1,92 @@
+"""
+The analysis server on a local port, serving recorded bars through CSVProvider.
+"""
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pandas as pd
+import pytest
+
+from data_retrieval import CSVProvider, OHLCVCache
+from server import AnalysisServer, AnalysisService, request_params, RequestError
+from test_signals import make_frame
+
+NOW = pd.Timestamp('2022-04-20')
+
+
+@pytest.fixture
+def server(tmp_path):
+    csv_dir = tmp_path / 'csv'
+    csv_dir.mkdir()
+    frame = make_frame(0)[['Open', 'High', 'Low', 'Close', 'Volume']]
+    frame.to_csv(csv_dir / 'TEST.csv')
+    frame.iloc[-30:].to_csv(csv_dir / 'TINY.csv')
+
+    cache = OHLCVCache(directory=str(tmp_path / 'cache'), provider=CSVProvider(str(csv_dir), now=NOW),
+                       clock=lambda: NOW)
+    server = AnalysisServer(('127.0.0.1', 0), AnalysisService(ohlcv_cache=cache), workers=2, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url):
+    try:
+        with urlopen(url) as response:
+            return response.status, response.headers, response.read()
+    except HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_summary(server):
+    status, headers, body = get(f"{server}/summary?ticker=TEST&period=1y")
+    assert status == 200
+    summary = json.loads(body)
+    assert summary['ticker'] == 'TEST'
+    assert summary['latest_date'] == '2022-04-19'
+    assert 240 <= summary['rows'] <= 262
+    assert summary['events']
+    assert 'download;dur=' in headers['Server-Timing']
+
+
+def test_figure(server):
+    status, _, body = get(f"{server}/figure?ticker=TEST&period=2020-06-01,2022-01-01")
+    assert status == 200
+    assert json.loads(body)['data']
+
+
+@pytest.mark.parametrize('query', [
+    'period=1y', 'ticker=../etc&period=1y', 'ticker=TEST&period=forever', 'ticker=TEST&period=2021-01-01,2020-01-01',
+    'ticker=TEST&period=2021-13-01,2022-01-01',
+])
+def test_bad_parameters(server, query):
+    status, _, body = get(f"{server}/summary?{query}")
+    assert status == 400
+    assert json.loads(body)['error']
+
+
+def test_too_few_bars(server):
+    status, _, body = get(f"{server}/summary?ticker=TINY&period=1y")
+    assert status == 422
+    assert '30 bars' in json.loads(body)['error']
+
+    # No bars at all in the range
+    status, _, body = get(f"{server}/figure?ticker=TEST&period=2010-01-01,2011-01-01")
+    assert status == 422
+    assert '0 bars' in json.loads(body)['error']
+
+
+def test_unknown_endpoint(server):
+    assert get(f"{server}/nothing?ticker=TEST")[0] == 404
+    assert get(f"{server}/health")[0] == 200
+
+
+def test_request_params():
+    assert request_params({'ticker': ['BRK-B']}) == ('BRK-B', '1y')
+    assert request_params({'ticker': ['^GSPC'], 'period': ['2020-01-02,2021-06-22']}) == ('^GSPC', '2020-01-02,2021-06-22')
+    with pytest.raises(RequestError):
+        request_params({'ticker': ['AAPL'], 'period': ['2020-01-02,2021-06-22,2022-01-01']})
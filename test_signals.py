@@ -0,0 +1,180 @@
+"""
+Equivalence of the vectorized detectors in signals.py with the per-bar loops they replaced.
+
+The loops below are the previous implementations, kept as the reference. They run on seeded
+synthetic frames rounded to one decimal, so closes tie with opens (doji bars), with the previous
+close, with the moving averages and with the bands, and some frames carry NaN bars.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import signals
+from geometry import calculate_linear_regression_and_deviations
+
+MAS = ['SMA_10', 'SMA_20', 'SMA_50', 'SMA_100', 'SMA_200']
+
+
+def loop_detect_volume_price_spikes(df, volume_std_threshold=1.5, price_std_threshold=2, rolling_window=20):
+    df['VolumeChange'] = df['Volume'].diff()
+    df['PriceChange'] = df['High'] - df['Low']
+    df['VolumeMean'] = df['VolumeChange'].rolling(window=rolling_window).mean()
+    df['VolumeStd'] = df['VolumeChange'].rolling(window=rolling_window).std()
+    df['PriceMean'] = df['PriceChange'].rolling(window=rolling_window).mean()
+    df['PriceStd'] = df['PriceChange'].rolling(window=rolling_window).std()
+
+    spike_days = []
+    for i in range(rolling_window, len(df)):
+        if (
+            abs(df['VolumeChange'].iloc[i] - df['VolumeMean'].iloc[i]) > volume_std_threshold * df['VolumeStd'].iloc[i]
+            and abs(df['PriceChange'].iloc[i] - df['PriceMean'].iloc[i]) > price_std_threshold * df['PriceStd'].iloc[i]
+        ):
+            spike_days.append((df.index[i], df['Close'].iloc[i]))
+    return spike_days
+
+
+def loop_detect_signals(df):
+    buy_signals = []
+    sell_signals = []
+    for i in range(1, len(df) - 1):
+        if df['Close'].iloc[i] > df['Open'].iloc[i] and df['Close'].iloc[i] > df['Close'].iloc[i - 1]:
+            buy_signals.append((df.index[i], df['Close'].iloc[i]))
+        elif df['Close'].iloc[i] < df['Open'].iloc[i] and df['Close'].iloc[i] < df['Close'].iloc[i - 1]:
+            sell_signals.append((df.index[i], df['Close'].iloc[i]))
+    return buy_signals, sell_signals
+
+
+def loop_detect_wick_touches(df, deviations, len_regression):
+    wick_touches = []
+    touched_devs = set()
+    for i in range(-len_regression, 0):
+        high_touched = False
+        low_touched = False
+        for dev, prices in deviations.items():
+            price = prices[i + len_regression]
+            if not high_touched and df['High'].iloc[i] >= price and df['High'].iloc[i - 1] < price:
+                wick_touches.append((df.index[i], (dev, price)))
+                touched_devs.add(dev)
+                high_touched = True
+            elif not low_touched and df['Low'].iloc[i] <= price and df['Low'].iloc[i - 1] > price:
+                wick_touches.append((df.index[i], (dev, price)))
+                touched_devs.add(dev)
+                low_touched = True
+    return wick_touches, touched_devs
+
+
+def loop_detect_fib_wick_touches(df, fib_levels):
+    fib_wick_touches = []
+    touched_fibs = set()
+    for i in range(len(df)):
+        for level in fib_levels['Fibonacci Levels']:
+            price = level
+            if df['High'].iloc[i] >= price and df['Low'].iloc[i] <= price:
+                fib_wick_touches.append((df.index[i], (round(level, 3), round(price, 2))))
+                touched_fibs.add(level)
+    return fib_wick_touches, touched_fibs
+
+
+def loop_detect_body_ma_touches(df):
+    ma_touches = []
+    touched_mas = set()
+    for i in range(len(df)):
+        for ma in MAS:
+            price = df[ma].iloc[i]
+            if df['Open'].iloc[i] <= price <= df['Close'].iloc[i] or df['Close'].iloc[i] <= price <= df['Open'].iloc[i]:
+                ma_touches.append((df.index[i], (ma, price)))
+                touched_mas.add(ma)
+    return ma_touches, touched_mas
+
+
+def loop_detect_consecutive_days(df):
+    sequence_stars = []
+    current_sequence = 1
+    up_down = 'neutral'
+    for i in range(1, len(df)):
+        if df['Close'].iloc[i] > df['Open'].iloc[i]:
+            if up_down == 'up':
+                current_sequence += 1
+            else:
+                up_down = 'up'
+                current_sequence = 1
+        elif df['Close'].iloc[i] < df['Open'].iloc[i]:
+            if up_down == 'down':
+                current_sequence += 1
+            else:
+                up_down = 'down'
+                current_sequence = 1
+        else:
+            up_down = 'neutral'
+            current_sequence = 1
+
+        if current_sequence >= 2:
+            size = 8 + (current_sequence - 1) * 5
+            color = 'green' if up_down == 'up' else 'red'
+            sequence_stars.append((df.index[i], df['Close'].iloc[i], size, color))
+    return sequence_stars
+
+
+def make_frame(seed, n=600, nan_bars=0):
+    rng = np.random.default_rng(seed)
+    close = np.round(100 + np.cumsum(rng.normal(0, 1, n)), 1)
+    open_ = np.round(close + rng.normal(0, 0.6, n), 1)
+    doji = rng.random(n) < 0.1
+    open_[doji] = close[doji]
+    high = np.maximum(open_, close) + np.round(rng.exponential(0.4, n), 1)
+    low = np.minimum(open_, close) - np.round(rng.exponential(0.4, n), 1)
+    volume = rng.integers(100_000, 1_000_000, n).astype(float)
+    df = pd.DataFrame(
+        {'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+        index=pd.bdate_range('2020-01-01', periods=n, name='Date'),
+    )
+    for position in rng.choice(np.arange(1, n - 1), nan_bars, replace=False):
+        df.iloc[position, rng.integers(0, 5)] = np.nan
+    for ma in MAS:
+        # Rounded like the prices, so bodies often end exactly on an average
+        df[ma] = df['Close'].rolling(int(ma.split('_')[1])).mean().round(1)
+    return df
+
+
+FRAMES = [(seed, nan_bars) for seed in range(4) for nan_bars in (0, 12)]
+
+
+@pytest.fixture(params=FRAMES, ids=[f"seed{seed}-nan{nan_bars}" for seed, nan_bars in FRAMES])
+def df(request):
+    seed, nan_bars = request.param
+    return make_frame(seed, nan_bars=nan_bars)
+
+
+def test_detect_signals(df):
+    assert signals.detect_signals(df) == loop_detect_signals(df)
+
+
+def test_detect_consecutive_days(df):
+    assert signals.detect_consecutive_days(df) == loop_detect_consecutive_days(df)
+
+
+def test_detect_body_ma_touches(df):
+    assert signals.detect_body_ma_touches(df) == loop_detect_body_ma_touches(df)
+
+
+def test_detect_fib_wick_touches(df):
+    fib_levels, _, _ = signals.calculate_fibonacci_levels(df)
+    # One level on a rounded price, which some wicks end exactly on
+    fib_levels.iloc[3] = round(fib_levels.iloc[3, 0], 1)
+    assert signals.detect_fib_wick_touches(df, fib_levels) == loop_detect_fib_wick_touches(df, fib_levels)
+
+
+@pytest.mark.parametrize('len_regression', [50, 144])
+def test_detect_wick_touches(df, len_regression):
+    *_, deviations = calculate_linear_regression_and_deviations(df, len_regression)
+    deviations = {name: np.round(prices, 1) for name, prices in deviations.items()}
+    assert signals.detect_wick_touches(df, deviations, len_regression) == (
+        loop_detect_wick_touches(df, deviations, len_regression)
+    )
+
+
+def test_detect_volume_price_spikes(df):
+    vectorized, looped = df.copy(), df.copy()
+    assert signals.detect_volume_price_spikes(vectorized) == loop_detect_volume_price_spikes(looped)
+    # Both add the same helper columns to the frame
+    pd.testing.assert_frame_equal(vectorized, looped)
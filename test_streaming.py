@@ -0,0 +1,102 @@
+"""
+Replays of the synthetic frames of test_signals.py through the streaming engine, against the batch
+detectors of signals.py.
+"""
+import numpy as np
+import pytest
+
+import signals
+from data_retrieval import add_moving_averages
+from geometry import calculate_rolling_linear_regression
+from moving_averages import DEFAULT_MAS, compute_moving_averages
+from streaming import RollingMeans, RollingRegression, StreamingSignalEngine, replay
+from test_signals import FRAMES, make_frame
+
+LEN_REGRESSION = 144
+
+
+@pytest.fixture(params=FRAMES, ids=[f"seed{seed}-nan{nan_bars}" for seed, nan_bars in FRAMES])
+def df(request):
+    seed, nan_bars = request.param
+    frame = make_frame(seed, nan_bars=nan_bars)
+    # The batch averages of the pipeline, not the rounded ones of make_frame
+    return add_moving_averages(frame[['Open', 'High', 'Low', 'Close', 'Volume']].copy(), DEFAULT_MAS)
+
+
+@pytest.fixture
+def events(df):
+    return replay(df, StreamingSignalEngine(len_regression=LEN_REGRESSION))
+
+
+def test_buy_sell_and_stars(df, events):
+    assert (events['buy_signals'], events['sell_signals']) == signals.detect_signals(df)
+    assert events['sequence_stars'] == signals.detect_consecutive_days(df)
+
+
+def test_ma_touches(df, events):
+    ma_touches, _ = signals.detect_body_ma_touches(df)
+    assert events['ma_touches'] == ma_touches
+
+
+def test_ma_touch_ties():
+    # Flat closes, where the averages land on (or one rounding step beside) the close itself
+    df = make_frame(5, n=700)[['Open', 'High', 'Low', 'Close', 'Volume']]
+    for start in (250, 298, 520):
+        df.iloc[start:start + 40, df.columns.get_loc('Close')] = 66.9
+        df.iloc[start + 30:start + 40, df.columns.get_loc('Open')] = 67.3
+    df = add_moving_averages(df, DEFAULT_MAS)
+    ma_touches, _ = signals.detect_body_ma_touches(df)
+    assert any(price == df.at[date, 'Close'] for date, (_, price) in ma_touches)
+    assert replay(df)['ma_touches'] == ma_touches
+
+
+def test_wick_touches(df, events):
+    *_, bands, names = calculate_rolling_linear_regression(df, LEN_REGRESSION)
+    wick_touches, _ = signals.detect_rolling_wick_touches(df, bands, names)
+    # Like detect_wick_touches, the engine needs the bar before the first regression window
+    assert events['wick_touches'] == [touch for touch in wick_touches if touch[0] >= df.index[LEN_REGRESSION]]
+
+
+def test_spikes(df, events):
+    assert events['spike_days'] == signals.detect_volume_price_spikes(df.copy())
+
+
+def test_fib_wick_touches(df, events):
+    # Levels span the history seen so far, so each bar is checked against the batch run up to it
+    expected = []
+    for stop in range(1, len(df) + 1):
+        history = df.iloc[:stop]
+        fib_levels, _, _ = signals.calculate_fibonacci_levels(history)
+        touches, _ = signals.detect_fib_wick_touches(history.iloc[-1:], fib_levels)
+        expected.extend(touches)
+    assert events['fib_wick_touches'] == expected
+
+
+@pytest.mark.parametrize('length', [5, 144, 300])
+def test_rolling_regression_matches_batch(length):
+    df = make_frame(length, n=1500, nan_bars=4)
+    close = df['Close'].values
+    slope, _, std_dev, bands, _ = calculate_rolling_linear_regression(df, length)
+    regression = RollingRegression(length)
+    for i, value in enumerate(close):
+        regression.push(value)
+        if i >= length - 1:
+            fitted_slope, fitted, fitted_std = regression.fit()
+            np.testing.assert_array_equal([fitted_slope, fitted, fitted_std], [slope[i], bands[i, 0], std_dev[i]])
+
+
+@pytest.mark.parametrize('mas', [DEFAULT_MAS, ['SMA_10', 'SMA_700', 'SMA_50']])
+def test_rolling_means_match_batch(mas):
+    df = make_frame(7, n=1500, nan_bars=4)
+    expected = compute_moving_averages(df['Close'].values, mas)
+    means = RollingMeans(mas)
+    for i, value in enumerate(df['Close'].values):
+        means.push(value)
+        np.testing.assert_array_equal([means.mean(name) for name in mas], expected[i])
+
+
+def test_touch_mas_must_be_computed():
+    with pytest.raises(ValueError):
+        StreamingSignalEngine(mas=['SMA_10'], touch_mas=['SMA_20'])
+    with pytest.raises(ValueError):
+        RollingMeans(['EMA_10'])
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+from data_retrieval import OHLCV_COLUMNS
+from events import FIB_WICK_TOUCH, MA_TOUCH, WICK_TOUCH, SignalEvents
+from geometry import calculate_linear_regression_and_deviations
+from signals import TOUCH_MAS, calculate_fibonacci_levels, detect_events
+
+# Rules resampled by calendar period rather than by fixed-length interval
+CALENDAR_RULES = ('W', 'M', 'Q', 'Y')
+
+# Events tied to a price level: aligned to the base bar that reached the level
+LEVEL_KINDS = (WICK_TOUCH, FIB_WICK_TOUCH, MA_TOUCH)
+
+
+def bucket_keys(index, rule):
+    """
+    int64 key of the `rule` bucket ('h', '4h', 'D', 'W', 'M', ...) every bar falls in, on the
+    wall clock of the index: the period start for calendar rules, the floored time otherwise.
+    """
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    # Calendar aliases are upper case ('M'), fixed ones lower case ('min', 'ms')
+    if rule.lstrip('0123456789')[:1] in CALENDAR_RULES:
+        starts = index.to_period(rule).start_time
+    else:
+        starts = index.floor(rule)
+    return starts.values.astype('datetime64[ns]').view(np.int64)
+
+
+def _aggregate(values, keys):
+    """
+    OHLCV rows of every run of equal keys, with the first and last base position of each run.
+    """
+    n = len(keys)
+    if n == 0:
+        empty = np.array([], dtype=np.int64)
+        return np.empty((0, len(OHLCV_COLUMNS))), empty, empty
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    ends = np.append(starts[1:], n) - 1
+    rows = np.column_stack([
+        values[starts, 0],
+        np.fmax.reduceat(values[:, 1], starts),
+        np.fmin.reduceat(values[:, 2], starts),
+        values[ends, 3],
+        np.add.reduceat(values[:, 4], starts),
+    ])
+    return rows, starts, ends
+
+
+def resample_ohlcv(df, rule):
+    """
+    OHLCV bars of a higher timeframe, each labelled by its first base bar (like aggregate_ohlc).
+    """
+    rows, starts, _ = _aggregate(df[OHLCV_COLUMNS].values.astype(float), bucket_keys(df.index, rule))
+    return pd.DataFrame(rows, index=df.index[starts], columns=OHLCV_COLUMNS)
+
+
+def detect_timeframe_events(df, len_regression=144, mas=TOUCH_MAS):
+    """
+    detect_events on one timeframe, with the Fibonacci levels and regression bands of that
+    timeframe. The regression is shortened on frames with fewer than len_regression + 1 bars.
+    """
+    fib_levels = calculate_fibonacci_levels(df)[0]
+    length = min(len_regression, len(df) - 1)
+    deviations = calculate_linear_regression_and_deviations(df, length)[4] if length >= 2 else {}
+    # The spike detector adds its work columns to the frame it is given
+    return detect_events(df.copy(), deviations, length, fib_levels, mas=mas)
+
+
+class MultiTimeframe:
+    """
+    Higher-timeframe views of one base OHLCV frame, resampled once and kept up to date.
+
+    `timeframes` are resampling rules ('h', '4h', 'D', 'W', 'M', ...). Each view keeps, per bar,
+    the first and last base position it covers, so its events can be placed back on the base chart
+    (aligned_events). `update` appends new or revised base bars and re-aggregates only the buckets
+    they fall in; the detectors run lazily, once per view and update.
+    """
+
+    def __init__(self, df, timeframes=('W',), len_regression=144, mas=TOUCH_MAS):
+        self.base = df[OHLCV_COLUMNS].astype(float)
+        self.timeframes = list(timeframes)
+        self.len_regression = len_regression
+        self.mas = mas
+        self._keys = {}
+        self._frames = {}
+        self._starts = {}
+        self._ends = {}
+        self._events = {}
+        for rule in self.timeframes:
+            self._keys[rule] = bucket_keys(self.base.index, rule)
+            self._resample(rule, 0)
+
+    def _resample(self, rule, first_bucket):
+        """
+        Rebuilds the view from the bucket with index `first_bucket` on.
+        """
+        start = self._starts[rule][first_bucket] if first_bucket else 0
+        rows, starts, ends = _aggregate(self.base.values[start:], self._keys[rule][start:])
+        kept = slice(0, first_bucket)
+        frame = pd.DataFrame(rows, index=self.base.index[start + starts], columns=OHLCV_COLUMNS)
+        if first_bucket:
+            frame = pd.concat([self._frames[rule].iloc[kept], frame])
+            starts = np.concatenate([self._starts[rule][kept], start + starts])
+            ends = np.concatenate([self._ends[rule][kept], start + ends])
+        self._frames[rule], self._starts[rule], self._ends[rule] = frame, starts, ends
+        self._events.pop(rule, None)
+
+    def frame(self, rule):
+        return self._frames[rule]
+
+    def update(self, bars):
+        """
+        Adds new base bars; bars at or before the last stored date replace the stored ones from
+        that date on. Returns {rule: number of higher-timeframe bars rebuilt}.
+        """
+        bars = bars[OHLCV_COLUMNS].astype(float).sort_index()
+        if bars.empty:
+            return {rule: 0 for rule in self.timeframes}
+        position = int(self.base.index.searchsorted(bars.index[0]))
+        self.base = pd.concat([self.base.iloc[:position], bars])
+
+        rebuilt = {}
+        for rule in self.timeframes:
+            keys = np.concatenate([self._keys[rule][:position], bucket_keys(bars.index, rule)])
+            self._keys[rule] = keys
+            # The bucket of the first new bar may already hold older bars: rebuild it whole
+            first_bucket = int(np.searchsorted(self._starts[rule], np.searchsorted(keys, keys[position]), side='right')) - 1
+            first_bucket = max(first_bucket, 0)
+            self._resample(rule, first_bucket)
+            rebuilt[rule] = len(self._starts[rule]) - first_bucket
+        return rebuilt
+
+    def events(self, rule):
+        """
+        SignalEvents of the view, dated on its own bars.
+        """
+        if rule not in self._events:
+            self._events[rule] = detect_timeframe_events(self._frames[rule], self.len_regression, self.mas)
+        return self._events[rule]
+
+    def aligned_events(self, rule, kinds=None):
+        """
+        The view's events placed on base bars, ready to overlay on the base chart: level touches
+        on the first base bar of the bucket whose range reaches the level, other events on the last
+        base bar of the bucket (where the higher-timeframe bar closed, or the latest bar so far).
+        """
+        events = self.events(rule)
+        if kinds is not None:
+            events = events.select(kinds)
+        buckets = self._frames[rule].index.get_indexer(events.dates)
+        first, last = self._starts[rule][buckets], self._ends[rule][buckets]
+        positions = last.copy()
+
+        low, high = self.base['Low'].values, self.base['High'].values
+        for i in np.flatnonzero(events.mask(LEVEL_KINDS)):
+            price = events.prices[i]
+            reached = np.flatnonzero((low[first[i]:last[i] + 1] <= price) & (price <= high[first[i]:last[i] + 1]))
+            if len(reached):
+                positions[i] = first[i] + reached[0]
+
+        return SignalEvents(
+            self.base.index[positions], events.kinds, events.prices, events.levels, events.sizes, events.level_names,
+        )
@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+
+from data_retrieval import as_index_time
+from geometry import lookback_position
+
+# Bins across the price range of a profile when no bin size is given
+DEFAULT_BINS = 50
+
+# Share of the profile's volume inside the value area
+VALUE_AREA = 0.7
+
+
+def spread_volume(low, high, volume, origin, bin_size, n_bins):
+    """
+    Volume per price bin [origin + k * bin_size, origin + (k + 1) * bin_size) of bars whose volume
+    is spread evenly over their Low-High range. The bars must lie inside the n_bins bins.
+
+    Each bar adds its volume density as a step up at its low and a step down at its high to a
+    difference array (bars inside a single bin add their volume to it directly); one cumulative
+    sum then gives every bin, in O(bars + bins).
+    """
+    a = (low - origin) / bin_size
+    b = (high - origin) / bin_size
+    first = np.clip(np.floor(a).astype(np.int64), 0, n_bins - 1)
+    last = np.clip(np.floor(b).astype(np.int64), 0, n_bins - 1)
+    profile = np.bincount(first[first == last], volume[first == last], minlength=n_bins)[:n_bins]
+
+    spans = first != last
+    if spans.any():
+        first, last = first[spans], last[spans]
+        a_frac = np.clip(a[spans] - first, 0.0, 1.0)
+        b_frac = np.clip(b[spans] - last, 0.0, 1.0)
+        density = volume[spans] / (b[spans] - a[spans])
+        steps = np.bincount(
+            np.concatenate([first, first + 1, last, last + 1]),
+            np.concatenate([density * (1 - a_frac), density * a_frac, -density * (1 - b_frac), -density * b_frac]),
+            minlength=n_bins + 1,
+        )
+        profile = profile + np.cumsum(steps)[:n_bins]
+    return profile
+
+
+def profile_bin_size(df, bins=DEFAULT_BINS):
+    """
+    Bin size dividing the Low-High range of `df` into `bins` bins.
+    """
+    low, high = np.nanmin(df['Low'].values), np.nanmax(df['High'].values)
+    span = high - low
+    return span / bins if span > 0 else max(abs(high), 1.0) * 1e-3
+
+
+class VolumeProfile:
+    """
+    Volume-at-price histogram over fixed bins of `bin_size`, aligned on multiples of it.
+
+    `add` spreads the volume of new bars over their Low-High range and widens the bin range when
+    they trade outside it, so a profile anchored at a date is kept current as its window grows in
+    time proportional to the new bars.
+    """
+
+    def __init__(self, bin_size):
+        if not bin_size > 0:
+            raise ValueError(f"Bin size must be positive, got {bin_size!r}")
+        self.bin_size = float(bin_size)
+        self.first_bin = 0
+        self.volumes = np.zeros(0)
+        self.bars = 0
+
+    @classmethod
+    def from_bars(cls, df, bins=DEFAULT_BINS, bin_size=None):
+        return cls(bin_size or profile_bin_size(df, bins)).add(df)
+
+    def add(self, bars):
+        """
+        Adds the volume of `bars` (a frame with High, Low and Volume columns). Returns the profile.
+        """
+        low, high = bars['Low'].values.astype(float), bars['High'].values.astype(float)
+        volume = bars['Volume'].values.astype(float)
+        keep = np.isfinite(low) & np.isfinite(high) & np.isfinite(volume)
+        if not keep.all():
+            low, high, volume = low[keep], high[keep], volume[keep]
+        if not len(low):
+            return self
+
+        first = int(np.floor(low.min() / self.bin_size))
+        last = int(np.floor(high.max() / self.bin_size))
+        self._extend(first, last)
+        offset = first - self.first_bin
+        self.volumes[offset:offset + last - first + 1] += spread_volume(
+            low, high, volume, first * self.bin_size, self.bin_size, last - first + 1,
+        )
+        self.bars += len(low)
+        return self
+
+    def _extend(self, first, last):
+        if not len(self.volumes):
+            self.first_bin, self.volumes = first, np.zeros(last - first + 1)
+            return
+        before = max(self.first_bin - first, 0)
+        after = max(last - (self.first_bin + len(self.volumes) - 1), 0)
+        if before or after:
+            self.volumes = np.concatenate([np.zeros(before), self.volumes, np.zeros(after)])
+            self.first_bin -= before
+
+    @property
+    def edges(self):
+        return (self.first_bin + np.arange(len(self.volumes) + 1)) * self.bin_size
+
+    @property
+    def centers(self):
+        return self.edges[:-1] + self.bin_size / 2
+
+    def point_of_control(self):
+        """
+        Center price of the bin with the most volume.
+        """
+        if not self.bars:
+            raise ValueError("The volume profile is empty.")
+        return self.centers[np.argmax(self.volumes)]
+
+    def value_area(self, fraction=VALUE_AREA):
+        """
+        (low, high) price range holding `fraction` of the volume, grown from the point of control
+        one bin at a time towards the side with the larger next bin.
+        """
+        if not self.bars:
+            raise ValueError("The volume profile is empty.")
+        volumes = self.volumes
+        lo = hi = int(np.argmax(volumes))
+        held, target = volumes[lo], fraction * volumes.sum()
+        while held < target and (lo > 0 or hi < len(volumes) - 1):
+            below = volumes[lo - 1] if lo > 0 else -1.0
+            above = volumes[hi + 1] if hi < len(volumes) - 1 else -1.0
+            if above >= below:
+                hi += 1
+                held += above
+            else:
+                lo -= 1
+                held += below
+        edges = self.edges
+        return edges[lo], edges[hi + 1]
+
+    def to_frame(self):
+        """
+        One row per bin: its Low and High price and its Volume.
+        """
+        edges = self.edges
+        return pd.DataFrame({'Low': edges[:-1], 'High': edges[1:], 'Volume': self.volumes})
+
+
+def anchored_volume_profile(df, anchor=None, period=None, bins=DEFAULT_BINS, bin_size=None):
+    """
+    VolumeProfile of the bars from the `anchor` date on, or of the last `period` (a number of bars
+    or a duration); of every bar when neither is given. Also returns the first bar position used.
+    """
+    start = 0
+    if anchor is not None:
+        start = int(df.index.searchsorted(as_index_time(anchor, df.index)))
+    elif period is not None:
+        start = lookback_position(df.index, period)
+    window = df.iloc[start:]
+    if window.empty:
+        raise ValueError("No bars in the volume profile window.")
+    return VolumeProfile.from_bars(window, bins, bin_size), start